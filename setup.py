@@ -30,9 +30,15 @@ setup(name='python-tiling',
         package_name,
     ],
     include_package_data=True,
+    entry_points={
+        'console_scripts': ['tiling = tiling.cli:main',],
+    },
     extras_require = {
         'decimal': ['dmath==0.9.1',],
+        'numpy': ['numpy',],
+        'test': ['dmath==0.9.1', 'numpy',],
     },
+    tests_require = ['dmath==0.9.1', 'numpy',],
     dependency_links=['https://github.com/SeanHayes/dmath/archive/master.zip#egg=dmath-0.9.1'],
     test_suite = '%s.tests' % package_name,
 )
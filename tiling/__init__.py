@@ -1,8 +1,11 @@
 from __future__ import division
 
 #Python imports
+# Keep these to what's needed to import the package, cold starts pay for
+# everything imported here. Anything only some methods need (array,
+# importlib, NumPy, concurrent.futures, etc.) is imported where it's used.
+from collections import deque, OrderedDict
 import itertools
-import logging
 import math
 
 VERSION = (0, 1, 0)
@@ -11,124 +14,1330 @@ __version__ = "".join([".".join(map(str, VERSION[0:3])), "".join(VERSION[3:])])
 
 #TODO: make sure to handle 0, 180, and -180 degrees
 
-class Tiler(object):
-    def __init__(self, geo_helper, max_tile_wh):
+# Tile IDs pack a tile's integer (row, col) grid address into a single signed
+# 64 bit int, 32 bits each.
+_TILE_ID_COL_BITS = 32
+_TILE_ID_COL_MASK = (1 << _TILE_ID_COL_BITS) - 1
+_TILE_ID_COL_SIGN = 1 << (_TILE_ID_COL_BITS - 1)
+_TILE_ID_MASK = (1 << 64) - 1
+
+def encode_tile_id(row, col):
+    """
+    Packs a (row, col) tile address into a single int that fits in an int64.
+    """
+    return (row << _TILE_ID_COL_BITS) | (col & _TILE_ID_COL_MASK)
+
+def decode_tile_id(tile_id):
+    """
+    Inverse of encode_tile_id, returns (row, col).
+    """
+    col = tile_id & _TILE_ID_COL_MASK
+    if col & _TILE_ID_COL_SIGN:
+        col -= 1 << _TILE_ID_COL_BITS
+    return tile_id >> _TILE_ID_COL_BITS, col
+
+def tile_key(tile_id):
+    """
+    Returns a fixed width (16 character) string for a tile ID, suitable for use
+    in cache keys. Keys are only unique per tile size, so prefix them with
+    something identifying the Tiler if you use more than one.
+    """
+    return '%016x' % (tile_id & _TILE_ID_MASK)
+
+def parse_tile_key(key):
+    """
+    Inverse of tile_key, returns a tile ID.
+    """
+    tile_id = int(key, 16)
+    if tile_id >> 63:
+        tile_id -= 1 << 64
+    return tile_id
+
+def _subtract_ranges(ranges, others):
+    """
+    Returns the parts of a list of inclusive (first, last) ranges that
+    aren't in any of the others.
+    """
+    for other_first, other_last in others:
+        new_ranges = []
+        
+        for first, last in ranges:
+            if other_last < first or last < other_first:
+                new_ranges.append((first, last))
+                continue
+            
+            if first < other_first:
+                new_ranges.append((first, other_first - 1))
+            if other_last < last:
+                new_ranges.append((other_last + 1, last))
+        
+        ranges = new_ranges
+    
+    return ranges
+
+def _import_string(path, attr=False):
+    """
+    Imports a module by name, or if attr is True, a dotted path to something
+    in a module, e.g. 'decimal.Decimal'.
+    """
+    import importlib
+    
+    if not attr:
+        return importlib.import_module(path)
+    
+    module_name, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), name)
+
+def _unpickle(cls, kwargs):
+    return cls(**kwargs)
+
+def _call_chunk(obj, method_name, chunk, args):
+    method = getattr(obj, method_name)
+    return [method(lat, lon, *args) for lat, lon in chunk]
+
+class LRUCache(object):
+    """
+    A small bounded least recently used cache, with hit/miss counters.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __contains__(self, key):
+        return key in self._data
+    
+    def get(self, key, default=None):
+        data = self._data
+        
+        try:
+            # re-inserting moves the key to the most recently used end
+            value = data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        
+        data[key] = value
+        self.hits += 1
+        return value
+    
+    def set(self, key, value):
+        data = self._data
+        
+        data.pop(key, None)
+        data[key] = value
+        
+        while len(data) > self.maxsize:
+            data.popitem(last=False)
+    
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+class TilingScheme(object):
+    """
+    The API shared by every way of splitting up the earth's surface into
+    tiles: Tiler, and the schemes in tiling.schemes. Code that only uses
+    these methods works with any of them.
+    
+    Subclasses set self.geo_helper and implement the methods that raise
+    NotImplementedError. Tile IDs are ints.
+    """
+    # see Tiler.INSTRUMENTED_METHODS
+    INSTRUMENTED_METHODS = [
+        ('get_box_centerpoint_for_coordinates', 'call'),
+        ('get_tile_id_for_coordinates', 'call'),
+        ('offset_coor_pairs', 'sized'),
+        ('offset_boxes', 'sized'),
+        ('offset_tile_ids', 'sized'),
+        ('offset_tiles', 'sized'),
+        ('cover_tile_ids', 'sized'),
+        ('cover_boxes', 'sized'),
+    ]
+    
+    def _init_kwargs(self):
+        raise NotImplementedError
+    
+    def __reduce__(self):
+        # only pickle the constructor arguments, caches are rebuilt empty
+        return _unpickle, (self.__class__, self._init_kwargs())
+    
+    def instrument(self, stats=None):
+        """
+        Starts recording call counts, timings and tiles per query for this
+        tiler's hot paths to a tiling.instrumentation.Stats, which is
+        returned (and available as self.stats). Only this instance is
+        affected, and nothing is recorded, or slowed down, until this is
+        called.
+        """
+        from . import instrumentation
+        
+        if stats is None:
+            stats = instrumentation.Stats()
+        
+        return instrumentation.instrument(self, self.INSTRUMENTED_METHODS, stats)
+    
+    def uninstrument(self):
+        from . import instrumentation
+        instrumentation.uninstrument(self)
+    
+    def tile_key(self, tile_id):
+        """
+        Returns a string for a tile ID, suitable for use in cache keys. See
+        tiling.tile_key.
+        """
+        return tile_key(tile_id)
+    
+    def parse_tile_key(self, key):
+        """
+        Inverse of tile_key, returns a tile ID.
+        """
+        return parse_tile_key(key)
+    
+    def get_tile_id_for_coordinates(self, lat, lon):
+        """
+        Returns the ID of the tile containing a location.
+        """
+        raise NotImplementedError
+    
+    def get_box_centerpoint_for_coordinates(self, lat, lon):
+        """
+        Normalizes a location to the center point of the tile containing it.
+        """
+        raise NotImplementedError
+    
+    def tile_center(self, tile_id):
+        """
+        Returns the (lat, lon) center point of a tile, the same point
+        get_box_centerpoint_for_coordinates returns for locations in it.
+        """
+        raise NotImplementedError
+    
+    def tile_box(self, tile_id):
+        """
+        Returns the box for a tile, as a (north, east, south, west) tuple.
+        """
+        raise NotImplementedError
+    
+    def tile_neighbors(self, tile_id):
+        """
+        Returns the IDs of the tiles that share an edge or a corner with a
+        tile, ordered west to east, south to north.
+        """
+        raise NotImplementedError
+    
+    def cover_tile_ids(self, latitude, longitude, height, width):
+        """
+        Returns the IDs of the tiles that intersect the height x width
+        rectangle centered on a location, ordered west to east, south to north.
+        """
+        raise NotImplementedError
+    
+    def cover_coor_pairs(self, latitude, longitude, height, width):
+        """
+        Tile center points for the tiles cover_tile_ids returns.
+        """
+        raise NotImplementedError
+    
+    def cover_boxes(self, latitude, longitude, height, width):
+        """
+        Boxes for the tiles cover_tile_ids returns, as
+        (north, east, south, west) tuples.
+        """
+        raise NotImplementedError
+    
+    # offset_* return the tiles around the tile containing a location, so
+    # every location in the same tile gets the same tiles. By default that's
+    # the cover of the rectangle centered on the tile's center point.
+    
+    def offset_tile_ids(self, latitude, longitude, height, width):
+        lat, lon = self.get_box_centerpoint_for_coordinates(latitude, longitude)
+        return self.cover_tile_ids(lat, lon, height, width)
+    
+    def offset_coor_pairs(self, latitude, longitude, height, width):
+        lat, lon = self.get_box_centerpoint_for_coordinates(latitude, longitude)
+        return self.cover_coor_pairs(lat, lon, height, width)
+    
+    def offset_boxes(self, latitude, longitude, height, width):
+        lat, lon = self.get_box_centerpoint_for_coordinates(latitude, longitude)
+        return self.cover_boxes(lat, lon, height, width)
+    
+    def offset_tiles(self, latitude, longitude, height, width):
+        """
+        Returns (tile_id, box) pairs for the tiles offset_boxes returns, in
+        the same order, for callers that need both.
+        """
+        return list(zip(
+            self.offset_tile_ids(latitude, longitude, height, width),
+            self.offset_boxes(latitude, longitude, height, width),
+        ))
+    
+    def iter_offset_coor_pairs(self, latitude, longitude, height, width):
+        return iter(self.offset_coor_pairs(latitude, longitude, height, width))
+    
+    def iter_offset_boxes(self, latitude, longitude, height, width):
+        return iter(self.offset_boxes(latitude, longitude, height, width))
+
+class Tiler(TilingScheme):
+    """
+    Tiles max_tile_wh high, in rows of equal height. Each row's tiles are as
+    close to max_tile_wh wide as they can be without going over.
+    """
+    # number of rows to keep in the row table by default
+    ROW_CACHE_SIZE = 1024
+    
+    # (method name, kind) pairs recorded by instrument(), see
+    # tiling.instrumentation.instrument. _calc_row_info counts row table
+    # misses, i.e. how often snapping needs trig.
+    INSTRUMENTED_METHODS = [
+        ('_calc_row_info', 'call'),
+        ('get_box_centerpoint_for_coordinates', 'call'),
+        ('get_tile_id_for_coordinates', 'call'),
+        ('offset_coor_pairs', 'sized'),
+        ('offset_boxes', 'sized'),
+        ('offset_tile_ids', 'sized'),
+        ('offset_tiles', 'sized'),
+        ('cover_tile_ids', 'sized'),
+        ('cover_boxes', 'sized'),
+        ('radius_tile_ids', 'sized'),
+        ('radius_boxes', 'sized'),
+    ]
+    
+    def __init__(self, geo_helper, max_tile_wh, row_cache_size=None, box_cache_size=0):
+        """
+        max_tile_wh - the max width/height of a tile
+        row_cache_size - the max number of rows to keep in the row table,
+            defaults to ROW_CACHE_SIZE. 0 disables the row table.
+        box_cache_size - the max number of offset_boxes/offset_tile_ids
+            results to cache. Disabled by default.
+        """
+        self.geo_helper = geo_helper
+        
+        self.max_tile_wh = self.geo_helper.num_class(max_tile_wh)
+        # the max_box_radius is half the height of the tile
+        self.max_tile_radius = self.max_tile_wh / 2
+        # every row of tiles is the same height in degrees
+        self.lat_width = self.geo_helper.offset_lat(2 * self.max_tile_radius)
+        
+        if row_cache_size is None:
+            row_cache_size = self.ROW_CACHE_SIZE
+        
+        # maps row index -> _calc_row_info(row), so snapping and building
+        # boxes only needs trig the first time a row is seen
+        self.row_cache = LRUCache(row_cache_size) if row_cache_size else None
+        
+        # offset_boxes/offset_tile_ids results only depend on the center tile
+        # and the height/width, so they're cached on those
+        self.box_cache = LRUCache(box_cache_size) if box_cache_size else None
+    
+    def _init_kwargs(self):
+        return {
+            'geo_helper': self.geo_helper,
+            'max_tile_wh': self.max_tile_wh,
+            'row_cache_size': self.row_cache.maxsize if self.row_cache is not None else 0,
+            'box_cache_size': self.box_cache.maxsize if self.box_cache is not None else 0,
+        }
+    
+    def _calc_row_info(self, row):
+        geo_helper = self.geo_helper
+        
+        lat = geo_helper.fix_lat((row + geo_helper.half) * self.lat_width)
+        
+        tile_width = 2 * self.max_tile_radius
+        lon_scale = geo_helper.cos(lat * geo_helper.RAD) * geo_helper._range_partial
+        
+        # Near the poles cos(lat) goes to 0 and tiles get arbitrarily wide,
+        # so rows where a tile would be wider than a hemisphere get two polar
+        # cap tiles instead, [-180, 0) and [0, 180).
+        if tile_width >= geo_helper.MAX_LON * lon_scale:
+            return lat, geo_helper.MAX_LON
+        
+        return lat, tile_width / lon_scale
+    
+    def _row_info(self, row):
+        """
+        Returns the center latitude and the longitude width of the tiles in a
+        row.
+        """
+        row_cache = self.row_cache
+        
+        if row_cache is None:
+            return self._calc_row_info(row)
+        
+        info = row_cache.get(row)
+        
+        if info is None:
+            info = self._calc_row_info(row)
+            row_cache.set(row, info)
+        
+        return info
+    
+    def warm_row_cache(self, lat_south, lat_north):
+        """
+        Fills the row table with the rows between two latitudes, so later
+        lookups for locations between them don't need any trig.
+        """
+        if self.row_cache is None:
+            return
+        
+        floor = self.geo_helper.floor
+        
+        first_row = int(floor(lat_south / self.lat_width))
+        last_row = int(floor(lat_north / self.lat_width))
+        
+        for row in range(first_row, last_row + 1):
+            self._row_info(row)
+    
+    def get_row_col_for_coordinates(self, lat, lon):
+        """
+        Returns the integer (row, col) grid address of the tile containing a
+        location. Rows count tiles north from the equator, columns count tiles
+        east from the prime meridian.
+        """
+        return self._locate(lat, lon)[:2]
+    
+    def _locate(self, lat, lon):
+        """
+        Returns (row, col, row_lat, lon_width) for the tile containing a
+        location, where row_lat and lon_width are from _row_info(row).
+        """
+        geo_helper = self.geo_helper
+        floor = geo_helper.floor
+        lat_width = self.lat_width
+        
+        row = floor(lat / lat_width)
+        
+        # the poles and the antimeridian are the edges of the last row/column,
+        # not the start of new ones
+        if lat >= geo_helper.MAX_LAT and row * lat_width >= lat:
+            row -= 1
+        
+        row = int(row)
+        row_lat, lon_width = self._row_info(row)
+        
+        col = floor(lon / lon_width)
+        
+        if lon >= geo_helper.MAX_LON and col * lon_width >= lon:
+            col -= 1
+        
+        return row, int(col), row_lat, lon_width
+    
+    def get_tile_id_for_coordinates(self, lat, lon):
+        """
+        Returns the tile ID (see encode_tile_id) of the tile containing a
+        location.
+        """
+        return encode_tile_id(*self.get_row_col_for_coordinates(lat, lon))
+    
+    def get_box_centerpoint_for_coordinates(self, lat, lon):
+        """
+        Normalizes a location to the nearest tile center point.
+        """
+        row, col, lat, lon_width = self._locate(lat, lon)
+        
+        return lat, self._col_center(col, lon_width)
+    
+    def _col_center(self, col, lon_width):
+        """
+        Returns the center longitude of a column. The tiles on either side of
+        the antimeridian are cut off by it, so their centers are the centers
+        of the part that's left.
+        """
+        geo_helper = self.geo_helper
+        
+        west = col * lon_width
+        east = (col + 1) * lon_width
+        
+        if west < geo_helper.MIN_LON or east > geo_helper.MAX_LON:
+            return (max(west, geo_helper.MIN_LON) + min(east, geo_helper.MAX_LON)) * geo_helper.half
+        
+        return geo_helper.fix_lon((col + geo_helper.half) * lon_width)
+    
+    def tile_center(self, tile_id):
+        """
+        Returns the (lat, lon) center point of a tile, the same point
+        get_box_centerpoint_for_coordinates returns for locations in it.
+        """
+        row, col = decode_tile_id(tile_id)
+        lat, lon_width = self._row_info(row)
+        
+        return lat, self._col_center(col, lon_width)
+    
+    def tile_box(self, tile_id):
+        """
+        Returns the box for a tile, in the same format as offset_boxes.
+        """
+        row, col = decode_tile_id(tile_id)
+        
+        return self._tile_box(row, col, self._row_info(row)[1])
+    
+    def tile_neighbors(self, tile_id):
+        """
+        Returns the IDs of the tiles that share an edge or a corner with a
+        tile, ordered west to east, south to north. Tiles on either side of
+        the antimeridian are neighbors, rows don't have neighbors past the
+        poles.
+        
+        Rows have different longitude widths, so the rows above and below can
+        have more or fewer than 3 neighbors. Everything comes from the row
+        table, so there's no trig once the rows are in it.
+        """
+        geo_helper = self.geo_helper
+        floor = geo_helper.floor
+        ceil = geo_helper.ceil
+        MIN_LON = geo_helper.MIN_LON
+        MAX_LON = geo_helper.MAX_LON
+        lat_width = self.lat_width
+        
+        row, col = decode_tile_id(tile_id)
+        lon_width = self._row_info(row)[1]
+        west = max(col * lon_width, MIN_LON)
+        east = min((col + 1) * lon_width, MAX_LON)
+        
+        ret = []
+        
+        for neighbor_row in (row - 1, row, row + 1):
+            if neighbor_row * lat_width >= geo_helper.MAX_LAT or (neighbor_row + 1) * lat_width <= geo_helper.MIN_LAT:
+                continue
+            
+            neighbor_width = self._row_info(neighbor_row)[1]
+            min_col = int(floor(MIN_LON / neighbor_width))
+            max_col = int(ceil(MAX_LON / neighbor_width)) - 1
+            
+            if neighbor_row == row:
+                # no division, so rounding can't lose the tiles either side
+                cols = [neighbor_col for neighbor_col in (col - 1, col + 1) if min_col <= neighbor_col <= max_col]
+            else:
+                # unlike _col_ranges, tiles that only touch an edge count,
+                # which is where the diagonal neighbors come from
+                cols = list(range(
+                    max(int(ceil(west / neighbor_width)) - 1, min_col),
+                    min(int(floor(east / neighbor_width)), max_col) + 1,
+                ))
+            
+            # and the tiles on the other side of the antimeridian
+            if east >= MAX_LON:
+                cols.append(min_col)
+            if west <= MIN_LON:
+                cols.insert(0, max_col)
+            
+            for neighbor_col in cols:
+                neighbor_id = encode_tile_id(neighbor_row, neighbor_col)
+                
+                if neighbor_id != tile_id and neighbor_id not in ret:
+                    ret.append(neighbor_id)
+        
+        return ret
+    
+    def get_box_centerpoints_for_coordinates(self, lats, lons):
+        """
+        Batch version of get_box_centerpoint_for_coordinates. lats and lons can
+        be NumPy arrays or anything else NumPy can read (lists, array('d'),
+        memoryviews). Returns two NumPy arrays of tile center points, identical
+        to calling get_box_centerpoint_for_coordinates on each pair.
+        
+        Requires NumPy.
+        """
+        from . import vectorized
+        return vectorized.get_box_centerpoints_for_coordinates(self, lats, lons)
+    
+    def get_tile_ids_for_coordinates(self, lats, lons):
+        """
+        Batch version of get_tile_id_for_coordinates. Takes the same arguments
+        as get_box_centerpoints_for_coordinates and returns a NumPy int64
+        array of tile IDs.
+        
+        Requires NumPy.
+        """
+        from . import vectorized
+        return vectorized.get_tile_ids_for_coordinates(self, lats, lons)
+    
+    def bucket(self, iterable, coor_func=None, chunk_size=10000, vectorized=False):
+        """
+        Groups a stream of items by the tile they're in. Yields
+        (tile_id, items) tuples.
+        
+        Items are read chunk_size at a time and grouped one chunk at a time, so
+        memory use stays bounded no matter how long the stream is. This means a
+        tile can be yielded more than once if its items are spread across
+        chunks.
+        
+        Like GeoHelper.filter_radius, items are (lat, lon) pairs unless
+        coor_func is given to get a (lat, lon) pair out of each item.
+        
+        vectorized - snap each chunk with get_tile_ids_for_coordinates, which
+            requires NumPy.
+        """
+        iterator = iter(iterable)
+        get_tile_id = self.get_tile_id_for_coordinates
+        
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            
+            if not chunk:
+                break
+            
+            coors = chunk if not coor_func else [coor_func(item) for item in chunk]
+            
+            if vectorized:
+                tile_ids = self.get_tile_ids_for_coordinates(
+                    [coor[0] for coor in coors],
+                    [coor[1] for coor in coors],
+                ).tolist()
+            else:
+                tile_ids = [get_tile_id(lat, lon) for lat, lon in coors]
+            
+            buckets = OrderedDict()
+            
+            for tile_id, item in zip(tile_ids, chunk):
+                try:
+                    buckets[tile_id].append(item)
+                except KeyError:
+                    buckets[tile_id] = [item]
+            
+            for bucket in buckets.items():
+                yield bucket
+    
+    def _offset_row_ranges(self, latitude, longitude, height, width):
+        """
+        Yields (row, first_col, last_col, lon_width) for the tiles offset_*
+        return, south to north, see _cover_row_ranges: the rows around the
+        tile containing a location, and in each of them the columns around
+        that tile's center longitude.
+        
+        Columns wrap around the antimeridian, so a row can have two ranges.
+        Rows never go past the poles, and rows that have fewer columns than
+        are needed, or that reach into a polar cap of the rectangle, get every
+        column once, so a query near a pole can't return the same tile twice.
+        """
+        geo_helper = self.geo_helper
+        floor = geo_helper.floor
+        ceil = geo_helper.ceil
+        row_info = self._row_info
+        max_tile_radius = self.max_tile_radius
+        max_tile_wh = self.max_tile_wh
+        lat_width = self.lat_width
+        
+        center_row, col, center_lat, lon_width = self._locate(latitude, longitude)
+        center_lon = self._col_center(col, lon_width)
+        
+        # since the tiles are centered on the center tile's center point, they
+        # include an area up to max_tile_radius further away
+        rows_needed = len(self._offset_steps((height / 2) - max_tile_radius, max_tile_wh)) // 2
+        cols_needed = len(self._offset_steps((width / 2) - max_tile_radius, max_tile_wh)) // 2
+        
+        cap_north, cap_south = geo_helper.rectangle_bounds(center_lat, center_lon, height, width)[4:]
+        
+        min_row = int(floor(geo_helper.MIN_LAT / lat_width))
+        max_row = int(ceil(geo_helper.MAX_LAT / lat_width)) - 1
+        
+        for row in range(max(center_row - rows_needed, min_row), min(center_row + rows_needed, max_row) + 1):
+            lon_width = row_info(row)[1]
+            
+            min_col, max_col = self._col_ranges(lon_width, None, None)[0]
+            num_cols = max_col - min_col + 1
+            
+            if (
+                2 * cols_needed + 1 >= num_cols
+                or (cap_north is not None and (row + 1) * lat_width > cap_north)
+                or (cap_south is not None and row * lat_width < cap_south)
+            ):
+                yield row, min_col, max_col, lon_width
+                continue
+            
+            col = int(floor(center_lon / lon_width))
+            first_col = col - cols_needed
+            last_col = col + cols_needed
+            
+            if first_col < min_col:
+                yield row, first_col + num_cols, max_col, lon_width
+                yield row, min_col, last_col, lon_width
+            elif last_col > max_col:
+                yield row, first_col, max_col, lon_width
+                yield row, min_col, last_col - num_cols, lon_width
+            else:
+                yield row, first_col, last_col, lon_width
+    
+    def _offset_steps(self, offset_needed, max_tile_wh):
+        """
+        Returns the sorted offsets, in units, from the center tile to the
+        centers of the tiles needed in one direction, up to the first one
+        that's at least offset_needed away.
+        """
+        steps = []
+        
+        tmp_offset = 0
+        
+        # offsets are built by repeated addition rather than multiplication,
+        # so they're exactly the same values as they've always been
+        while tmp_offset < offset_needed:
+            tmp_offset += max_tile_wh
+            steps.append(tmp_offset)
+        
+        return [-step for step in reversed(steps)] + [0] + steps
+    
+    def iter_offset_coor_pairs(self, latitude, longitude, height, width):
+        """
+        Generator version of offset_coor_pairs. Yields the same tile center
+        points in the same order, west to east, south to north, one at a
+        time, so callers can stop early and big areas don't need a list of
+        every tile.
+        """
+        row_info = self._row_info
+        col_center = self._col_center
+        
+        for row, first_col, last_col, lon_width in self._offset_row_ranges(latitude, longitude, height, width):
+            lat = row_info(row)[0]
+            
+            for col in range(first_col, last_col + 1):
+                yield lat, col_center(col, lon_width)
+    
+    def offset_coor_pairs(self, latitude, longitude, height, width):
+        return list(self.iter_offset_coor_pairs(latitude, longitude, height, width))
+    
+    def _cached_offsets(self, func, latitude, longitude, height, width):
+        box_cache = self.box_cache
+        
+        if box_cache is None:
+            return func(latitude, longitude, height, width)
+        
+        key = (func.__name__, self.get_row_col_for_coordinates(latitude, longitude), height, width)
+        
+        ret = box_cache.get(key)
+        
+        if ret is None:
+            ret = tuple(func(latitude, longitude, height, width))
+            box_cache.set(key, ret)
+        
+        # cached results are shared, so hand out copies
+        return list(ret)
+    
+    def offset_tile_ids(self, latitude, longitude, height, width):
+        """
+        Returns the tile IDs of the tiles offset_boxes would return, in the
+        same order, without building any boxes.
+        """
+        return self._cached_offsets(self._offset_tile_ids, latitude, longitude, height, width)
+    
+    def _offset_tile_ids(self, latitude, longitude, height, width):
+        return [
+            encode_tile_id(row, col)
+            for row, first_col, last_col, lon_width in self._offset_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def offset_pairs_num(self, latitude, longitude, height, width):
+        """
+        Returns the number of tiles offset_boxes returns, without working them
+        out. Near the poles, where rows run out or have fewer columns, it's
+        an upper bound.
+        """
+        max_tile_radius = self.max_tile_radius
+        ceil = self.geo_helper.ceil
+        # this function proceeds a little differently since it's not assembling a set
+        # (0 and -0 only gets stored once)
+        width_offset_needed = (width / 2) - max_tile_radius
+        height_offset_needed = (height / 2) - max_tile_radius
+        
+        max_box_wh = max_tile_radius * 2
+        
+        num_boxes_wide = (2*ceil((width_offset_needed / max_box_wh)) + 1)
+        num_boxes_high = (2*ceil((height_offset_needed / max_box_wh)) + 1)
+        
+        return num_boxes_wide * num_boxes_high
+    
+    def offset_boxes(self, latitude, longitude, height, width):
+        return self._cached_offsets(self._offset_boxes, latitude, longitude, height, width)
+    
+    def _offset_boxes(self, latitude, longitude, height, width):
+        return list(self.iter_offset_boxes(latitude, longitude, height, width))
+    
+    def offset_tiles(self, latitude, longitude, height, width):
+        """
+        See TilingScheme.offset_tiles. Tile IDs and boxes are worked out in
+        the same pass over the rows.
+        """
+        return self._cached_offsets(self._offset_tiles, latitude, longitude, height, width)
+    
+    def _offset_tiles(self, latitude, longitude, height, width):
+        tile_box = self._tile_box
+        
+        return [
+            (encode_tile_id(row, col), tile_box(row, col, lon_width),)
+            for row, first_col, last_col, lon_width in self._offset_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def iter_offset_boxes(self, latitude, longitude, height, width):
+        """
+        Generator version of offset_boxes, see iter_offset_coor_pairs. Doesn't
+        use the box cache.
+        """
+        tile_box = self._tile_box
+        
+        for row, first_col, last_col, lon_width in self._offset_row_ranges(latitude, longitude, height, width):
+            for col in range(first_col, last_col + 1):
+                yield tile_box(row, col, lon_width)
+    
+    def _map_chunks(self, method_name, points, args, workers, chunk_size):
+        """
+        Calls a method for each (lat, lon) point, chunk_size points at a time,
+        in a process pool. Yields results in the same order as points.
+        """
+        points = iter(points)
+        chunks = iter(lambda: list(itertools.islice(points, chunk_size)), [])
+        
+        if workers is None:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        
+        if workers == 1:
+            for chunk in chunks:
+                for result in _call_chunk(self, method_name, chunk, args):
+                    yield result
+            return
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(workers) as executor:
+            # only keep a couple of chunks per worker in flight, so neither
+            # the points nor the results have to fit in memory at once
+            max_pending = 2 * workers
+            pending = deque()
+            
+            for chunk in chunks:
+                pending.append(executor.submit(_call_chunk, self, method_name, chunk, args))
+                
+                if len(pending) >= max_pending:
+                    for result in pending.popleft().result():
+                        yield result
+            
+            while pending:
+                for result in pending.popleft().result():
+                    yield result
+    
+    def offset_boxes_many(self, points, height, width, workers=None, chunk_size=1000):
+        """
+        Calls offset_boxes for each (lat, lon) pair in points, spread over a
+        pool of worker processes. Yields one list of boxes per point, in the
+        same order as points, as soon as each chunk of points is done.
+        
+        workers - the number of worker processes, defaults to the number of
+            CPUs. 1 runs everything in this process.
+        chunk_size - the number of points sent to a worker at a time
+        """
+        return self._map_chunks('offset_boxes', points, (height, width,), workers, chunk_size)
+    
+    def _col_ranges(self, lon_width, lon_west, lon_east):
+        """
+        Returns the (first_col, last_col) ranges of the columns in a row with
+        tiles between two longitudes, as returned by
+        GeoHelper.rectangle_bounds. There are two ranges, ordered west to
+        east, if lon_west > lon_east, i.e. across the antimeridian. Columns
+        are never outside -180 to 180, so a row never has more than
+        360 / lon_width of them.
+        """
+        geo_helper = self.geo_helper
+        floor = geo_helper.floor
+        ceil = geo_helper.ceil
+        
+        min_col = int(floor(geo_helper.MIN_LON / lon_width))
+        max_col = int(ceil(geo_helper.MAX_LON / lon_width)) - 1
+        
+        if lon_west is None:
+            return [(min_col, max_col)]
+        
+        # column n covers [n * lon_width, (n + 1) * lon_width), so an edge
+        # that lands exactly on a column boundary doesn't pull in the next one
+        west_col = min(int(floor(lon_west / lon_width)), max_col)
+        east_col = max(int(ceil(lon_east / lon_width)) - 1, min_col)
+        
+        if lon_west <= lon_east:
+            return [(west_col, max(west_col, east_col))]
+        
+        # in rows with only a few columns, the two sides of the antimeridian
+        # can meet or share a column, and the row shouldn't have it twice
+        if east_col >= west_col - 1:
+            return [(min_col, max_col)]
+        
+        return [(west_col, max_col), (min_col, east_col)]
+    
+    def _rows_between(self, lat_south, lat_north):
+        floor = self.geo_helper.floor
+        ceil = self.geo_helper.ceil
+        lat_width = self.lat_width
+        
+        # row n covers [n * lat_width, (n + 1) * lat_width), so a rectangle
+        # edge that lands exactly on a row boundary doesn't pull in the next row
+        first_row = int(floor(lat_south / lat_width))
+        last_row = max(first_row, int(ceil(lat_north / lat_width)) - 1)
+        
+        return range(first_row, last_row + 1)
+    
+    def _cover_row_ranges(self, latitude, longitude, height, width):
+        """
+        Yields (row, first_col, last_col, lon_width) for each range of tiles
+        that intersects the height x width rectangle centered on a location,
+        south to north. Rows that the rectangle crosses the antimeridian in
+        have two ranges, see _col_ranges.
+        """
+        lat_width = self.lat_width
+        row_info = self._row_info
+        col_ranges = self._col_ranges
+        
+        lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = self.geo_helper.rectangle_bounds(latitude, longitude, height, width)
+        
+        for row in self._rows_between(lat_south, lat_north):
+            lon_width = row_info(row)[1]
+            
+            # rows that reach into a polar cap need every column
+            if (cap_north is not None and (row + 1) * lat_width > cap_north) or (cap_south is not None and row * lat_width < cap_south):
+                ranges = col_ranges(lon_width, None, None)
+            else:
+                ranges = col_ranges(lon_width, lon_west, lon_east)
+            
+            for first_col, last_col in ranges:
+                yield row, first_col, last_col, lon_width
+    
+    def _tile_box(self, row, col, lon_width):
+        """
+        Returns the box for a tile as (north, east, south, west), built from
+        the tile's grid edges so adjacent boxes share exactly the same edges.
+        Tiles on either side of the antimeridian are cut off at it.
+        """
+        geo_helper = self.geo_helper
+        fix_lat = geo_helper.fix_lat
+        MIN_LON = geo_helper.MIN_LON
+        MAX_LON = geo_helper.MAX_LON
+        lat_width = self.lat_width
+        
+        return (
+            fix_lat((row + 1) * lat_width),
+            min((col + 1) * lon_width, MAX_LON),
+            fix_lat(row * lat_width),
+            max(col * lon_width, MIN_LON),
+        )
+    
+    def cover_tile_ids(self, latitude, longitude, height, width):
+        """
+        Returns the IDs of the tiles that intersect the height x width
+        rectangle centered on a location, ordered west to east, south to north.
+        
+        Unlike offset_tile_ids, this works out the tiles needed for each row
+        of tiles separately, so each tile is visited once and tiles that don't
+        intersect the rectangle are never included.
+        """
+        return [
+            encode_tile_id(row, col)
+            for row, first_col, last_col, lon_width in self._cover_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def cover_coor_pairs(self, latitude, longitude, height, width):
+        """
+        Tile center points for the tiles cover_tile_ids returns.
+        """
+        row_info = self._row_info
+        col_center = self._col_center
+        
+        pairs = []
+        
+        for row, first_col, last_col, lon_width in self._cover_row_ranges(latitude, longitude, height, width):
+            lat = row_info(row)[0]
+            
+            for col in range(first_col, last_col + 1):
+                pairs.append((lat, col_center(col, lon_width),))
+        
+        return pairs
+    
+    def cover_boxes(self, latitude, longitude, height, width):
+        """
+        Boxes for the tiles cover_tile_ids returns, in the same format as
+        offset_boxes.
+        """
+        tile_box = self._tile_box
+        
+        return [
+            tile_box(row, col, lon_width)
+            for row, first_col, last_col, lon_width in self._cover_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def _radius_row_ranges(self, latitude, longitude, radius):
+        """
+        Like _cover_row_ranges, but for the tiles that intersect a circle of
+        radius around a location.
+        """
+        geo_helper = self.geo_helper
+        math_module = geo_helper.math_module
+        fix_lat = geo_helper.fix_lat
+        fix_lon = geo_helper.fix_lon
+        sin = geo_helper.sin
+        cos = geo_helper.cos
+        RAD = geo_helper.RAD
+        lat_width = self.lat_width
+        row_info = self._row_info
+        col_ranges = self._col_ranges
+        
+        # the radius as an angle, padded to cover distance_method's earth model
+        lat_range = geo_helper.offset_lat(radius * geo_helper._bounds_pad)
+        d = lat_range * RAD
+        cos_d = cos(d)
+        lat0 = latitude * RAD
+        sin_lat0 = sin(lat0)
+        cos_lat0 = cos(lat0)
+        
+        # The circle is widest at the latitude where its east and west edges
+        # run due north/south. If it includes a pole it keeps getting wider
+        # (in degrees of longitude) all the way to the pole.
+        if lat_range >= geo_helper.MAX_LAT + abs(latitude):
+            # it includes both poles, so just use every column
+            widest_lat = None
+        elif lat_range >= geo_helper.MAX_LAT - abs(latitude):
+            widest_lat = geo_helper.MAX_LAT * RAD if latitude > 0 else geo_helper.MIN_LAT * RAD
+        else:
+            widest_lat = math_module.asin(sin_lat0 / cos_d)
+        
+        full_range = geo_helper.MAX_LON
+        
+        for row in self._rows_between(fix_lat(latitude - lat_range), fix_lat(latitude + lat_range)):
+            lon_width = row_info(row)[1]
+            
+            if widest_lat is None:
+                lon_range = full_range
+            else:
+                # the latitude in this row where the circle is widest
+                lat = min(max(widest_lat, row * lat_width * RAD), (row + 1) * lat_width * RAD)
+                
+                cos_lat = cos(lat)
+                
+                if cos_lat * cos_lat0 <= 0:
+                    lon_range = full_range
+                else:
+                    x = (cos_d - sin_lat0 * sin(lat)) / (cos_lat0 * cos_lat)
+                    
+                    if x >= 1:
+                        # the circle doesn't reach this row
+                        continue
+                    
+                    lon_range = full_range if x <= -1 else math_module.acos(x) / RAD
+            
+            if lon_range >= full_range:
+                ranges = col_ranges(lon_width, None, None)
+            else:
+                ranges = col_ranges(lon_width, fix_lon(longitude - lon_range), fix_lon(longitude + lon_range))
+            
+            for first_col, last_col in ranges:
+                yield row, first_col, last_col, lon_width
+    
+    def radius_tile_ids(self, latitude, longitude, radius):
+        """
+        Returns the IDs of the tiles that intersect a circle of radius around a
+        location, ordered west to east, south to north.
+        
+        The tiles in the corners of the square around the circle that
+        cover_tile_ids would include aren't included.
+        """
+        return [
+            encode_tile_id(row, col)
+            for row, first_col, last_col, lon_width in self._radius_row_ranges(latitude, longitude, radius)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def radius_boxes(self, latitude, longitude, radius):
+        """
+        Boxes for the tiles radius_tile_ids returns, in the same format as
+        offset_boxes.
+        """
+        tile_box = self._tile_box
+        
+        return [
+            tile_box(row, col, lon_width)
+            for row, first_col, last_col, lon_width in self._radius_row_ranges(latitude, longitude, radius)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def _cover_row_range_map(self, latitude, longitude, height, width):
+        """
+        Returns a dict of row -> list of (first_col, last_col) ranges for
+        the tiles cover_tile_ids would return.
+        """
+        row_ranges = {}
+        
+        for row, first_col, last_col, lon_width in self._cover_row_ranges(latitude, longitude, height, width):
+            row_ranges.setdefault(row, []).append((first_col, last_col))
+        
+        return row_ranges
+    
+    def cover_diff(self, old_query, new_query):
+        """
+        Compares the tiles cover_tile_ids returns for two queries, each a
+        (latitude, longitude, height, width) tuple. Returns (added, removed)
+        lists of tile IDs: the tiles only needed for new_query, and the ones
+        only needed for old_query.
+        
+        Only the column ranges of each row are compared, so the tiles both
+        queries need, usually most of them for a panning map, are never
+        generated.
+        """
+        old_ranges = self._cover_row_range_map(*old_query)
+        new_ranges = self._cover_row_range_map(*new_query)
+        
+        added = []
+        removed = []
+        
+        for row in sorted(set(old_ranges) | set(new_ranges)):
+            old_row = old_ranges.get(row, [])
+            new_row = new_ranges.get(row, [])
+            
+            for ret, ranges, others in [(added, new_row, old_row), (removed, old_row, new_row)]:
+                for first_col, last_col in _subtract_ranges(ranges, others):
+                    ret.extend(encode_tile_id(row, col) for col in range(first_col, last_col + 1))
+        
+        return added, removed
+    
+    def cover_diff_tile_ids(self, old_tile_ids, new_query):
+        """
+        Like cover_diff, but compares the tiles for new_query against a set
+        of tile IDs, e.g. the tiles a client already has.
+        """
+        new_ranges = self._cover_row_range_map(*new_query)
+        
+        if not isinstance(old_tile_ids, (set, frozenset)):
+            old_tile_ids = set(old_tile_ids)
+        
+        added = [
+            tile_id
+            for row, ranges in sorted(new_ranges.items())
+            for first_col, last_col in ranges
+            for tile_id in (encode_tile_id(row, col) for col in range(first_col, last_col + 1))
+            if tile_id not in old_tile_ids
+        ]
+        
+        removed = []
+        
+        for tile_id in old_tile_ids:
+            row, col = decode_tile_id(tile_id)
+            
+            if not any(first_col <= col <= last_col for first_col, last_col in new_ranges.get(row, ())):
+                removed.append(tile_id)
+        
+        return added, removed
+    
+    def _row_ranges_box_array(self, row_ranges):
+        from array import array
+        from .boxes import BoxArray
+        
+        geo_helper = self.geo_helper
+        fix_lat = geo_helper.fix_lat
+        MIN_LON = geo_helper.MIN_LON
+        MAX_LON = geo_helper.MAX_LON
+        lat_width = self.lat_width
+        
+        box_array = BoxArray(tile_ids=array('q'))
+        coors = box_array.coors
+        tile_ids = box_array.tile_ids
+        
+        for row, first_col, last_col, lon_width in row_ranges:
+            north = fix_lat((row + 1) * lat_width)
+            south = fix_lat(row * lat_width)
+            
+            # same values as _tile_box, without building tuples
+            for col in range(first_col, last_col + 1):
+                coors.extend((north, min((col + 1) * lon_width, MAX_LON), south, max(col * lon_width, MIN_LON)))
+                tile_ids.append(encode_tile_id(row, col))
+        
+        return box_array
+    
+    def offset_boxes_array(self, latitude, longitude, height, width):
         """
-        max_tile_wh - the max width/height of a tile
+        Same boxes as offset_boxes, as a BoxArray (see tiling.boxes) with tile
+        IDs. Values are stored as floats.
         """
-        self.geo_helper = geo_helper
-        
-        self.max_tile_wh = self.geo_helper.num_class(max_tile_wh)
-        # the max_box_radius is half the height of the tile
-        self.max_tile_radius = self.max_tile_wh / 2
+        return self._row_ranges_box_array(self._offset_row_ranges(latitude, longitude, height, width))
     
-    def get_box_centerpoint_for_coordinates(self, lat, lon):
+    def cover_boxes_array(self, latitude, longitude, height, width):
         """
-        Normalizes a location to the nearest tile center point.
+        Same boxes as cover_boxes, as a BoxArray with tile IDs.
         """
-        tile_radius = self.max_tile_radius
-        geo_helper = self.geo_helper
-        floor = geo_helper.floor
-        half = geo_helper.half
-        _range_partial = geo_helper._range_partial
+        return self._row_ranges_box_array(self._cover_row_ranges(latitude, longitude, height, width))
+    
+    def radius_boxes_array(self, latitude, longitude, radius):
+        """
+        Same boxes as radius_boxes, as a BoxArray with tile IDs.
+        """
+        return self._row_ranges_box_array(self._radius_row_ranges(latitude, longitude, radius))
+
+class LevelTiler(Tiler):
+    """
+    One level of a MultiLevelTiler. Tiles are 1/2**level the height and width
+    of the base Tiler's tiles, and each one sits exactly inside one of the
+    base tiles.
+    """
+    def __init__(self, base_tiler, level, **kwargs):
+        self.base_tiler = base_tiler
+        self.level = level
+        self.scale = 2 ** level
         
-        lat_width = geo_helper.offset_lat(2 * tile_radius)
+        super(LevelTiler, self).__init__(base_tiler.geo_helper, base_tiler.max_tile_wh / self.scale, **kwargs)
         
-        lat_offset = floor(lat/lat_width) + half
+        # rows and columns are split from the base tiles' rather than being
+        # calculated from this level's tile size, so the edges line up exactly
+        self.lat_width = base_tiler.lat_width / self.scale
+    
+    def _init_kwargs(self):
+        kwargs = super(LevelTiler, self)._init_kwargs()
         
-        lat = geo_helper.fix_lat(lat_offset * lat_width)
+        del kwargs['geo_helper']
+        del kwargs['max_tile_wh']
+        kwargs.update(base_tiler=self.base_tiler, level=self.level)
         
-        lon_width = 2 * tile_radius / (geo_helper.cos(lat * geo_helper.RAD) * _range_partial)
+        return kwargs
+    
+    def _calc_row_info(self, row):
+        geo_helper = self.geo_helper
         
-        lon_offset = floor(lon/lon_width) + half
+        lat = geo_helper.fix_lat((row + geo_helper.half) * self.lat_width)
         
-        lon = geo_helper.fix_lon(lon_offset * lon_width)
+        # every row in a base row uses the base row's longitude width
+        lon_width = self.base_tiler._row_info(row >> self.level)[1] / self.scale
         
-        return lat, lon
+        return lat, lon_width
+
+class MultiLevelTiler(object):
+    """
+    A stack of Tilers where each level's tiles are split into 4 tiles on the
+    next level, quadtree style. Level 0 tiles are max_tile_wh wide and high.
     
-    def offset_coor_pairs(self, latitude, longitude, height, width):
-        # we normalize lat, lon here before calcing offsets, and then we normalize
-        # the lat, lon offset pairs later. Just doing it on the pairs should work,
-        # but at certain extreme coors tiny differences emerge that cause an offset
-        # to get nromalized to the wrong tile.
-        max_tile_radius = self.max_tile_radius
-        max_tile_wh = self.max_tile_wh
+    Tiles are identified by (level, tile_id) pairs, where tile_id is the
+    tile's ID on its level's Tiler.
+    """
+    def __init__(self, geo_helper, max_tile_wh, levels, **kwargs):
+        """
+        max_tile_wh - the max width/height of a level 0 tile
+        levels - the number of levels
+        
+        Any other keyword arguments are passed on to each level's Tiler.
+        """
+        self.geo_helper = geo_helper
         
-        latitude, longitude = self.get_box_centerpoint_for_coordinates(latitude, longitude)
+        base_tiler = Tiler(geo_helper, max_tile_wh, **kwargs)
         
-        height_offsets = set()
-        width_offsets = set()
+        self.levels = [base_tiler] + [LevelTiler(base_tiler, level, **kwargs) for level in range(1, levels)]
+        self.max_level = levels - 1
+    
+    def tile_key(self, level, tile_id):
+        """
+        Like tile_key(), but includes the level.
+        """
+        return '%d:%s' % (level, tile_key(tile_id))
+    
+    def get_tile_id_for_coordinates(self, lat, lon, level):
+        return self.levels[level].get_tile_id_for_coordinates(lat, lon)
+    
+    def ancestor(self, level, tile_id, ancestor_level):
+        """
+        Returns the ID of the tile on ancestor_level that contains a tile.
+        """
+        shift = level - ancestor_level
         
-        tmp_height_offset = 0
-        tmp_width_offset = 0
+        if shift < 0:
+            raise ValueError('ancestor_level must not be below level.')
         
-        # since the offsets represent tile center points, the boxes generated
-        # from those points will include an area up to max_tile_radius away.
-        height_offset_needed = (height / 2) - max_tile_radius
-        width_offset_needed = (width / 2) - max_tile_radius
+        row, col = decode_tile_id(tile_id)
         
-        while True:
-            height_offsets.add(tmp_height_offset)
-            height_offsets.add(-tmp_height_offset)
-            
-            if tmp_height_offset < height_offset_needed:
-                tmp_height_offset += max_tile_wh
-            else:
-                break
+        return encode_tile_id(row >> shift, col >> shift)
+    
+    def parent(self, level, tile_id):
+        """
+        Returns the ID of the tile on the previous level that contains a tile.
+        """
+        return self.ancestor(level, tile_id, level - 1)
+    
+    def children(self, level, tile_id):
+        """
+        Returns the IDs of the 4 tiles on the next level that a tile is split
+        into, ordered west to east, south to north.
+        """
+        row, col = decode_tile_id(tile_id)
         
-        while True:
-            width_offsets.add(tmp_width_offset)
-            width_offsets.add(-tmp_width_offset)
-            
-            if tmp_width_offset < width_offset_needed:
-                tmp_width_offset += max_tile_wh
-            else:
-                break
+        return [
+            encode_tile_id(child_row, child_col)
+            for child_row in (row * 2, row * 2 + 1)
+            for child_col in (col * 2, col * 2 + 1)
+        ]
+    
+    def cover(self, latitude, longitude, height, width, max_level=None):
+        """
+        Returns (level, tile_id) pairs for a set of tiles that covers the
+        height x width rectangle centered on a location. Tiles that fit
+        entirely in the rectangle are used as they are, tiles on the edge are
+        split into smaller tiles until max_level (defaults to the last level).
+        """
+        if max_level is None:
+            max_level = self.max_level
         
-        height_offsets = sorted(height_offsets)
-        width_offsets = sorted(width_offsets)
+        base_tiler = self.levels[0]
+        geo_helper = self.geo_helper
+        overlap = geo_helper.rectangle_bounds_overlap
+        MIN_LON = geo_helper.MIN_LON
+        MAX_LON = geo_helper.MAX_LON
         
-        offset_pairs = itertools.product(height_offsets, width_offsets)
-        pairs = []
+        bounds = geo_helper.rectangle_bounds(latitude, longitude, height, width)
         
-        offset = self.geo_helper.offset
+        ret = []
+        stack = [
+            (0, row, col)
+            for row, first_col, last_col, lon_width in base_tiler._cover_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+        stack.reverse()
         
-        for lat_unit_offset, lon_unit_offset in offset_pairs:
-            lat, lon = offset(latitude, longitude, lat_unit_offset, lon_unit_offset)
+        while stack:
+            level, row, col = stack.pop()
+            tiler = self.levels[level]
+            lat_width = tiler.lat_width
+            lon_width = tiler._row_info(row)[1]
             
-            # normalize coordinates. boxes north and south of center box will be slightly shifted
-            # FIXME: this hack works in most cases, but there are instances where the boxes on diff latitudes will be too drastically shifted from the center box, especially as we get further from the center box, plus we may end up fetching more boxes than are really needed. A better solution would be to get the center box for each latitude needed, then work sideways from each of those, fetching east/west adjacent boxes as needed. This will also help avoid us fetching extra boxes in cases where the original search coords are near the edge of the center box, and adjacent boxes near the opposite edge aren't needed.
-            lat, lon = self.get_box_centerpoint_for_coordinates(lat, lon)
+            tile_south = row * lat_width
+            tile_north = tile_south + lat_width
+            tile_west = max(col * lon_width, MIN_LON)
+            tile_east = min((col + 1) * lon_width, MAX_LON)
             
-            pairs.append((lat, lon,))
-        
-        return pairs
-    
-    def offset_pairs_num(self, latitude, longitude, height, width):
-        max_tile_radius = self.max_tile_radius
-        ceil = self.geo_helper.ceil
-        # this function proceeds a little differently since it's not assembling a set
-        # (0 and -0 only gets stored once)
-        width_offset_needed = (width / 2) - max_tile_radius
-        height_offset_needed = (height / 2) - max_tile_radius
-        
-        max_box_wh = max_tile_radius * 2
-        
-        num_boxes_wide = (2*ceil((width_offset_needed / max_box_wh)) + 1)
-        num_boxes_high = (2*ceil((height_offset_needed / max_box_wh)) + 1)
+            intersects, inside = overlap(bounds, tile_south, tile_north, tile_west, tile_east)
+            
+            if not intersects:
+                continue
+            
+            if inside or level >= max_level:
+                ret.append((level, encode_tile_id(row, col)))
+            else:
+                stack.extend(
+                    (level + 1, child_row, child_col)
+                    for child_row in (row * 2 + 1, row * 2)
+                    for child_col in (col * 2 + 1, col * 2)
+                )
         
-        return num_boxes_wide * num_boxes_high
+        return ret
     
-    def offset_boxes(self, latitude, longitude, height, width):
-        max_tile_radius = self.max_tile_radius
-        pairs = self.offset_coor_pairs(latitude, longitude, height, width)
-        box_func = self.geo_helper.box
-        
+    def boxes(self, tiles):
+        """
+        Returns boxes, in the same format as Tiler.offset_boxes, for a list of
+        (level, tile_id) pairs.
+        """
+        levels = self.levels
         boxes = []
         
-        for pair_latitude, pair_longitude in pairs:
-            box = box_func(pair_latitude, pair_longitude, max_tile_radius)
-            boxes.append(box)
+        for level, tile_id in tiles:
+            tiler = levels[level]
+            row, col = decode_tile_id(tile_id)
+            
+            boxes.append(tiler._tile_box(row, col, tiler._row_info(row)[1]))
         
         return boxes
 
@@ -143,14 +1352,54 @@ class GeoHelper(object):
     NM_PER_LAT = '60.00721'
     NM_PER_LON = '60.10793'
     
+    DISTANCE_HAVERSINE = 'haversine' # great circle on a sphere
+    DISTANCE_EQUIRECTANGULAR = 'equirectangular' # fast, for small distances
+    DISTANCE_VINCENTY = 'vincenty' # WGS-84 ellipsoid, accurate to about 1mm
+    DISTANCE_METHODS = (DISTANCE_HAVERSINE, DISTANCE_EQUIRECTANGULAR, DISTANCE_VINCENTY)
+    
+    # how much shorter each distance method's distances can be than the
+    # grid's spherical distances. Radii are padded by this when working out
+    # which tiles/bounding boxes a circle needs, so rounding and the
+    # different earth models can't exclude points right at the edge.
+    DISTANCE_PADS = {
+        DISTANCE_HAVERSINE: '1.001',
+        DISTANCE_EQUIRECTANGULAR: '1.01',
+        DISTANCE_VINCENTY: '1.01',
+    }
+    
+    # WGS-84 ellipsoid
+    WGS84_A = '6378137' # semi-major axis in meters
+    WGS84_INV_F = '298.257223563' # 1 / flattening
+    METERS_PER_NM = '1852'
+    # max iterations for Vincenty's formulae, and the change in lambda
+    # (radians) they stop at
+    VINCENTY_ITERATIONS = 200
+    VINCENTY_TOLERANCE = '1e-12'
+    
+    # see Tiler.INSTRUMENTED_METHODS
+    INSTRUMENTED_METHODS = [
+        ('distance', 'call'),
+        ('filter_radius', 'generator'),
+        ('filter_rectangle', 'generator'),
+        ('filter_radius_mask', 'call'),
+        ('filter_rectangle_mask', 'call'),
+    ]
     
     #TODO: allow choice between mi/km in constructor
     def __init__(self,
           unit=UNIT_MI,
           num_class=float,
           math_module=math,
-          
+          distance_method=DISTANCE_HAVERSINE,
         ):
+        # math modules can be given by name, which also lets GeoHelpers be
+        # pickled, and number classes by dotted path, so backends like
+        # Decimal/dmath are only imported when a GeoHelper uses them
+        if isinstance(math_module, str):
+            math_module = _import_string(math_module)
+        if isinstance(num_class, str):
+            num_class = _import_string(num_class, attr=True)
+        
         self.num_class = num_class
         self.math_module = math_module
         
@@ -187,12 +1436,71 @@ class GeoHelper(object):
         
         # frequently used math fragment
         self._range_partial = self.units_per_nm * num_class('60.0')
+        
+        if distance_method not in self.DISTANCE_METHODS:
+            raise ValueError('distance_method must be one of %s.' % ', '.join(self.DISTANCE_METHODS))
+        
+        self.distance_method = distance_method
+        
+        # distance() is bound to the selected method once here rather than
+        # dispatching on every call, unless a subclass has its own
+        if not self._is_overridden('distance'):
+            self.distance = getattr(self, '%s_distance' % distance_method)
+        
+        # radius bounding boxes are padded by this factor, see DISTANCE_PADS
+        self._bounds_pad = num_class(self.DISTANCE_PADS[distance_method])
+        
+        self.WGS84_A = num_class(self.WGS84_A)
+        self.WGS84_F = 1 / num_class(self.WGS84_INV_F)
+        self.WGS84_B = self.WGS84_A * (1 - self.WGS84_F)
+        self.METERS_PER_NM = num_class(self.METERS_PER_NM)
+        self.VINCENTY_TOLERANCE = num_class(self.VINCENTY_TOLERANCE)
+    
+    def _init_kwargs(self):
+        return {
+            'unit': self.unit,
+            'num_class': self.num_class,
+            'math_module': self.math_module.__name__,
+            'distance_method': self.distance_method,
+        }
     
-    def tiler(self, max_tile_wh):
+    def __reduce__(self):
+        # modules can't be pickled, so pickle the constructor arguments
+        # instead and rebuild everything else
+        return _unpickle, (self.__class__, self._init_kwargs())
+    
+    def instrument(self, stats=None):
+        """
+        See TilingScheme.instrument. Filters record how many results they
+        yielded.
+        """
+        from . import instrumentation
+        
+        if stats is None:
+            stats = instrumentation.Stats()
+        
+        return instrumentation.instrument(self, self.INSTRUMENTED_METHODS, stats)
+    
+    def uninstrument(self):
+        from . import instrumentation
+        instrumentation.uninstrument(self)
+    
+    def tiler(self, max_tile_wh, **kwargs):
         """
         max_tile_wh - the max width/height of a tile
+        
+        Any other keyword arguments are passed on to Tiler.
         """
-        return Tiler(self, max_tile_wh)
+        return Tiler(self, max_tile_wh, **kwargs)
+    
+    def multi_level_tiler(self, max_tile_wh, levels, **kwargs):
+        """
+        max_tile_wh - the max width/height of a level 0 tile
+        levels - the number of levels
+        
+        Any other keyword arguments are passed on to MultiLevelTiler.
+        """
+        return MultiLevelTiler(self, max_tile_wh, levels, **kwargs)
     
     def fix_lat(self, val):
         if val > self.MAX_LAT:
@@ -208,11 +1516,47 @@ class GeoHelper(object):
             return self.MAX_LON + (val % self.MIN_LON)
         return val
     
+    def _lon_delta(self, val):
+        """
+        Wraps a difference between two longitudes to [-180, 180), so points
+        either side of the antimeridian are close together. Unlike fix_lon,
+        a difference of 360 is 0.
+        """
+        full_lon = self.MAX_LON - self.MIN_LON
+        val = (val + self.MAX_LON) % full_lon
+        
+        # Decimal's % keeps the sign of the dividend
+        if val < 0:
+            val += full_lon
+        
+        return val - self.MAX_LON
+    
+    def _is_overridden(self, name):
+        """
+        Whether a subclass has its own version of one of GeoHelper's methods,
+        which instances mustn't replace with a faster one.
+        """
+        for cls in type(self).__mro__:
+            if name in vars(cls):
+                return cls is not GeoHelper
+        return False
+    
     def distance(self, lat1, lon1, lat2, lon2):
         """
-        Caclulate distance between two lat lons in units.
+        Distance between two lat lons in units, using distance_method.
+        
+        __init__ replaces this with the *_distance method for
+        distance_method, so this is only called by subclasses that override
+        it.
+        """
+        return getattr(self, '%s_distance' % self.distance_method)(lat1, lon1, lat2, lon2)
+    
+    def haversine_distance(self, lat1, lon1, lat2, lon2):
+        """
+        Caclulate the great circle distance between two lat lons in units, on
+        a sphere with 60 nautical miles per degree. Within about 0.5% of the
+        ellipsoidal distance.
         """
-        #WARNING: can't get a sufficiently accurate result, off by about a mile
         math = self.math_module
         sin = math.sin
         cos = math.cos
@@ -222,13 +1566,102 @@ class GeoHelper(object):
         
         # from http://williams.best.vwh.net/avform.htm#Example
         lat1 = lat1*pi/180
-        lon1 = abs(lon1*pi/180)
+        lon1 = lon1*pi/180
         lat2 = lat2*pi/180
-        lon2 = abs(lon2*pi/180)
+        lon2 = lon2*pi/180
         
-        d = 2*asin(sqrt((sin((lat1-lat2)/2))**2+cos(lat1)*cos(lat2)*(sin((lon1-lon2)/2))**2))
+        # min() guards against rounding past 1 for antipodal points
+        d = 2*asin(min(sqrt((sin((lat1-lat2)/2))**2+cos(lat1)*cos(lat2)*(sin((lon1-lon2)/2))**2), 1))
         return (d*180*60/pi) * self.units_per_nm
     
+    def equirectangular_distance(self, lat1, lon1, lat2, lon2):
+        """
+        Distance between two lat lons in units, treating the area between them
+        as flat. Cheaper than haversine_distance and within 0.1% of it for
+        points less than a few hundred miles apart, but increasingly too long
+        further apart than that.
+        """
+        RAD = self.RAD
+        
+        x = self._lon_delta(lon2 - lon1) * RAD * self.cos((lat1 + lat2) / 2 * RAD)
+        y = (lat2 - lat1) * RAD
+        
+        d = self.math_module.sqrt(x*x + y*y)
+        return (d*180*60/self.pi) * self.units_per_nm
+    
+    def vincenty_distance(self, lat1, lon1, lat2, lon2):
+        """
+        Distance between two lat lons in units on the WGS-84 ellipsoid, using
+        Vincenty's inverse formula. Falls back to haversine_distance for
+        nearly antipodal points, where the formula doesn't converge.
+        """
+        # from https://en.wikipedia.org/wiki/Vincenty%27s_formulae
+        math = self.math_module
+        sin = math.sin
+        cos = math.cos
+        sqrt = math.sqrt
+        atan = math.atan
+        atan2 = math.atan2
+        RAD = self.RAD
+        a = self.WGS84_A
+        b = self.WGS84_B
+        f = self.WGS84_F
+        
+        L = self._lon_delta(lon2 - lon1) * RAD
+        U1 = atan((1 - f) * math.tan(lat1 * RAD))
+        U2 = atan((1 - f) * math.tan(lat2 * RAD))
+        sin_U1 = sin(U1)
+        cos_U1 = cos(U1)
+        sin_U2 = sin(U2)
+        cos_U2 = cos(U2)
+        
+        lam = L
+        
+        for i in range(self.VINCENTY_ITERATIONS):
+            sin_lam = sin(lam)
+            cos_lam = cos(lam)
+            
+            sin_sigma = sqrt((cos_U2*sin_lam)**2 + (cos_U1*sin_U2 - sin_U1*cos_U2*cos_lam)**2)
+            
+            if sin_sigma == 0:
+                # same point
+                return sin_sigma
+            
+            cos_sigma = sin_U1*sin_U2 + cos_U1*cos_U2*cos_lam
+            sigma = atan2(sin_sigma, cos_sigma)
+            sin_alpha = cos_U1*cos_U2*sin_lam / sin_sigma
+            cos2_alpha = 1 - sin_alpha**2
+            # cos2_alpha is 0 for points on the equator
+            cos_2sigma_m = cos_sigma - 2*sin_U1*sin_U2/cos2_alpha if cos2_alpha else 0
+            C = f/16*cos2_alpha*(4 + f*(4 - 3*cos2_alpha))
+            
+            lam_prev = lam
+            lam = L + (1 - C)*f*sin_alpha*(sigma + C*sin_sigma*(cos_2sigma_m + C*cos_sigma*(-1 + 2*cos_2sigma_m**2)))
+            
+            if abs(lam - lam_prev) < self.VINCENTY_TOLERANCE:
+                break
+        else:
+            return self.haversine_distance(lat1, lon1, lat2, lon2)
+        
+        u2 = cos2_alpha*(a*a - b*b)/(b*b)
+        A = 1 + u2/16384*(4096 + u2*(-768 + u2*(320 - 175*u2)))
+        B = u2/1024*(256 + u2*(-128 + u2*(74 - 47*u2)))
+        delta_sigma = B*sin_sigma*(cos_2sigma_m + B/4*(cos_sigma*(-1 + 2*cos_2sigma_m**2) - B/6*cos_2sigma_m*(-3 + 4*sin_sigma**2)*(-3 + 4*cos_2sigma_m**2)))
+        
+        meters = b*A*(sigma - delta_sigma)
+        return meters / self.METERS_PER_NM * self.units_per_nm
+    
+    def distances(self, lats, lons, latitude, longitude):
+        """
+        Batch version of distance, with the same distance_method. lats and
+        lons can be NumPy arrays or anything else NumPy can read. Returns a
+        NumPy array of the distance from each point to a location.
+        
+        Requires NumPy.
+        """
+        from . import vectorized
+        return vectorized.distances(self, lats, lons, latitude, longitude)
+    
     def offset_lat(self, unit_offset=0):
         lat_range = unit_offset / self._range_partial
         return lat_range
@@ -269,6 +1702,92 @@ class GeoHelper(object):
         ret = self.fix_lat(lat + lat_range), self.fix_lon(lon + lon_range), self.fix_lat(lat - lat_range), self.fix_lon(lon - lon_range)
         return ret
     
+    def rectangle_bounds(self, lat, lon, height, width):
+        """
+        Like rectangle(), but handles rectangles that cross the antimeridian
+        or reach over a pole. Returns
+        (lat_north, lat_south, lon_west, lon_east, cap_north, cap_south):
+        
+        - lon_west > lon_east if the rectangle crosses the antimeridian.
+        - lon_west and lon_east are None if the rectangle is wide enough to
+          include every longitude.
+        - if the rectangle reaches over the north pole, points north of
+          cap_north are in it at any longitude, and the same goes for
+          cap_south and the south pole. They're None if it doesn't.
+        """
+        lat_range = self.offset_lat(unit_offset=height/2)
+        
+        lat_north = lat + lat_range
+        lat_south = lat - lat_range
+        
+        # going over a pole comes back down the other side, so the rectangle
+        # includes a cap around the pole as deep as the overshoot
+        cap_north = 2 * self.MAX_LAT - lat_north if lat_north > self.MAX_LAT else None
+        cap_south = 2 * self.MIN_LAT - lat_south if lat_south < self.MIN_LAT else None
+        
+        # same as offset_lon, but checked before dividing since cos(lat) is
+        # 0 at the poles
+        cos_lat = self.cos(lat * self.RAD)
+        lon_offset = (width/2) / self._range_partial
+        
+        if lon_offset >= self.MAX_LON * cos_lat:
+            lon_west = lon_east = None
+        else:
+            lon_range = lon_offset / cos_lat
+            lon_west = self.fix_lon(lon - lon_range)
+            lon_east = self.fix_lon(lon + lon_range)
+        
+        return self.fix_lat(lat_north), self.fix_lat(lat_south), lon_west, lon_east, cap_north, cap_south
+    
+    def in_rectangle_bounds(self, bounds, lat, lon):
+        """
+        Whether a location is in the rectangle described by
+        rectangle_bounds().
+        """
+        lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = bounds
+        
+        if not lat_south <= lat <= lat_north:
+            return False
+        
+        if lon_west is None or (cap_north is not None and lat >= cap_north) or (cap_south is not None and lat <= cap_south):
+            return True
+        
+        if lon_west <= lon_east:
+            return lon_west < lon < lon_east
+        
+        return lon > lon_west or lon < lon_east
+    
+    def rectangle_bounds_overlap(self, bounds, south, north, west, east):
+        """
+        Compares a box, with edges between -180 and 180, against the rectangle
+        described by rectangle_bounds(). Returns (intersects, inside).
+        """
+        lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = bounds
+        
+        if south >= lat_north or north <= lat_south:
+            return False, False
+        
+        lat_inside = lat_south <= south and north <= lat_north
+        
+        if lon_west is None:
+            return True, lat_inside
+        
+        if (cap_north is not None and south >= cap_north) or (cap_south is not None and north <= cap_south):
+            return True, lat_inside
+        
+        if lon_west <= lon_east:
+            intersects = west < lon_east and east > lon_west
+            lon_inside = lon_west < west and east < lon_east
+        else:
+            intersects = east > lon_west or west < lon_east
+            lon_inside = west > lon_west or east < lon_east
+        
+        # boxes partly in a polar cap intersect no matter their longitude
+        if (cap_north is not None and north > cap_north) or (cap_south is not None and south < cap_south):
+            intersects = True
+        
+        return intersects, lat_inside and lon_inside
+    
     def box(self, lat, lon, radius):
         """
         Returns two lat/lon pairs as (lat-south, lon-west, lat-north, lon-east)
@@ -278,39 +1797,335 @@ class GeoHelper(object):
         l = radius * 2
         return self.rectangle(lat, lon, l, l)
     
-    #TODO: could be useful for testing, turning center points to tiles and back
-#    def tile_center_point(point_pairs):
-#        #just averaging should be fine for now
-#        length = len(point_pairs)
-#        
-#        lat = self.num_class('0.0')
-#        lon = self.num_class('0.0')
-#        
-#        for pair in point_pairs:
-#            lat += self.num_class(pair[0])
-#            lon += self.num_class(pair[1])
-#        
-#        return lat/length, lon/length
-    
-    def filter_radius(self, iterable, latitude, longitude, radius, coor_func=None):
+    def radius_bounds(self, lat, lon, radius):
+        """
+        Returns (lat_north, lat_south, lon_range) describing a box that
+        contains every point less than radius away: points in it are between
+        the two latitudes and no more than lon_range degrees east or west of
+        lon. lon_range is None if the box includes every longitude, which
+        happens when the radius includes a pole.
+        """
+        # from http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+        lat_range = self.offset_lat(radius * self._bounds_pad)
+        
+        lat_north = lat + lat_range
+        lat_south = lat - lat_range
+        
+        if lat_north >= self.MAX_LAT or lat_south <= self.MIN_LAT:
+            return lat_north, lat_south, None
+        
+        RAD = self.RAD
+        x = self.sin(lat_range * RAD) / self.cos(lat * RAD)
+        
+        if x >= 1:
+            return lat_north, lat_south, None
+        
+        return lat_north, lat_south, self.math_module.asin(x) / RAD
+    
+    def filter_radius(self, iterable, latitude, longitude, radius, coor_func=None, return_items=False):
         """
         Filter out results not in a circular radius.
+        
+        Yields (lat, lon) pairs, or the original items if return_items is
+        True. Points outside of radius_bounds are skipped without calculating
+        their distance.
         """
+        lat_north, lat_south, lon_range = self.radius_bounds(latitude, longitude, radius)
+        
+        lon_delta = self._lon_delta
+        distance = self.distance
         
         for item in iterable:
             p_lat, p_lon = item if not coor_func else coor_func(item)
-            if self.distance(p_lat, p_lon, latitude, longitude) < radius:
-                yield p_lat, p_lon
+            
+            if not lat_south <= p_lat <= lat_north:
+                continue
+            if lon_range is not None and abs(lon_delta(p_lon - longitude)) > lon_range:
+                continue
+            
+            if distance(p_lat, p_lon, latitude, longitude) < radius:
+                yield item if return_items else (p_lat, p_lon)
     
-    def filter_rectangle(self, iterable, latitude, longitude, height, width, coor_func=None):
+    def filter_rectangle(self, iterable, latitude, longitude, height, width, coor_func=None, return_items=False):
         """
-        Filter out results not in a rectangle.
+        Filter out results not in a rectangle. Rectangles that cross the
+        antimeridian or reach a pole are handled, see rectangle_bounds().
+        
+        Yields (lat, lon) pairs, or the original items if return_items is
+        True.
         """
-        lat_north, lon_east, lat_south, lon_west = self.rectangle(latitude, longitude, height, width)
+        bounds = self.rectangle_bounds(latitude, longitude, height, width)
+        lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = bounds
+        
+        if lon_west is None or lon_west > lon_east or cap_north is not None or cap_south is not None:
+            # crosses the antimeridian or reaches a pole
+            in_bounds = self.in_rectangle_bounds
+            
+            for item in iterable:
+                p_lat, p_lon = item if not coor_func else coor_func(item)
+                
+                if in_bounds(bounds, p_lat, p_lon):
+                    yield item if return_items else (p_lat, p_lon)
+            
+            return
         
         for item in iterable:
             p_lat, p_lon = item if not coor_func else coor_func(item)
-            #TODO: handle wrap around
+            
             if lat_south <= p_lat <= lat_north and lon_west < p_lon < lon_east:
-                yield p_lat, p_lon
+                yield item if return_items else (p_lat, p_lon)
+    
+    def filter_radius_mask(self, lats, lons, latitude, longitude, radius):
+        """
+        Array version of filter_radius. lats and lons can be NumPy arrays or
+        anything else NumPy can read. Returns a boolean NumPy array that's
+        True for points in the radius; use numpy.flatnonzero on it to get
+        indexes.
+        
+        Requires NumPy.
+        """
+        from . import vectorized
+        return vectorized.filter_radius_mask(self, lats, lons, latitude, longitude, radius)
+    
+    def filter_rectangle_mask(self, lats, lons, latitude, longitude, height, width):
+        """
+        Array version of filter_rectangle, see filter_radius_mask.
+        
+        Requires NumPy.
+        """
+        from . import vectorized
+        return vectorized.filter_rectangle_mask(self, lats, lons, latitude, longitude, height, width)
+
+class FloatGeoHelper(GeoHelper):
+    """
+    GeoHelper specialized for plain floats and the math module. Returns
+    exactly the same results as GeoHelper(num_class=float, math_module=math),
+    but the hot paths are closures over precomputed constants, so they skip
+    the num_class/math_module indirection and the attribute lookups.
+    """
+    def __init__(self, unit=GeoHelper.UNIT_MI, distance_method=GeoHelper.DISTANCE_HAVERSINE):
+        super(FloatGeoHelper, self).__init__(unit=unit, num_class=float, math_module=math, distance_method=distance_method)
+        
+        self._build_fast_paths()
+    
+    def _init_kwargs(self):
+        return {'unit': self.unit, 'distance_method': self.distance_method}
+    
+    def _build_fast_paths(self):
+        MAX_LAT = self.MAX_LAT
+        MIN_LAT = self.MIN_LAT
+        MAX_LON = self.MAX_LON
+        MIN_LON = self.MIN_LON
+        RAD = self.RAD
+        pi = self.pi
+        units_per_nm = self.units_per_nm
+        range_partial = self._range_partial
+        
+        sin = math.sin
+        cos = math.cos
+        asin = math.asin
+        sqrt = math.sqrt
+        
+        # NOTE: these have to do the same operations in the same order as the
+        # generic GeoHelper methods, otherwise floating point rounding can
+        # give slightly different results.
+        def fix_lat(val):
+            if val > MAX_LAT:
+                return MAX_LAT
+            if val < MIN_LAT:
+                return MIN_LAT
+            return val
+        
+        def fix_lon(val):
+            if val > MAX_LON:
+                return MIN_LON + (val % MAX_LON)
+            if val < MIN_LON:
+                return MAX_LON + (val % MIN_LON)
+            return val
+        
+        def haversine_distance(lat1, lon1, lat2, lon2):
+            lat1 = lat1*pi/180
+            lon1 = lon1*pi/180
+            lat2 = lat2*pi/180
+            lon2 = lon2*pi/180
+            
+            d = 2*asin(min(sqrt((sin((lat1-lat2)/2))**2+cos(lat1)*cos(lat2)*(sin((lon1-lon2)/2))**2), 1))
+            return (d*180*60/pi) * units_per_nm
+        
+        def offset_lat(unit_offset=0):
+            return unit_offset / range_partial
+        
+        def offset_lon(lat, unit_offset=0):
+            return (unit_offset / range_partial) / cos(lat * RAD)
+        
+        def offset(lat, lon, lat_unit_offset=0, lon_unit_offset=0):
+            lat = lat + lat_unit_offset / range_partial
+            
+            if lat > MAX_LAT:
+                lat = MAX_LAT
+            elif lat < MIN_LAT:
+                lat = MIN_LAT
+            
+            lon = lon + (lon_unit_offset / range_partial) / cos(lat * RAD)
+            
+            if lon > MAX_LON:
+                lon = MIN_LON + (lon % MAX_LON)
+            elif lon < MIN_LON:
+                lon = MAX_LON + (lon % MIN_LON)
+            
+            return lat, lon
+        
+        def rectangle(lat, lon, height, width):
+            lat_range = (height/2) / range_partial
+            lon_range = ((width/2) / range_partial) / cos(lat * RAD)
+            
+            return fix_lat(lat + lat_range), fix_lon(lon + lon_range), fix_lat(lat - lat_range), fix_lon(lon - lon_range)
+        
+        def box(lat, lon, radius):
+            l = radius * 2
+            return rectangle(lat, lon, l, l)
+        
+        self.fix_lat = fix_lat
+        self.fix_lon = fix_lon
+        self.haversine_distance = haversine_distance
+        if self.distance_method == self.DISTANCE_HAVERSINE and not self._is_overridden('distance'):
+            self.distance = haversine_distance
+        self.offset_lat = offset_lat
+        self.offset_lon = offset_lon
+        self.offset = offset
+        self.rectangle = rectangle
+        self.box = box
+
+class _ContextMath(object):
+    """
+    Wraps a Decimal math module like dmath, so its functions run at a fixed
+    precision no matter what the current decimal context is, and cos/sin
+    results are cached.
+    """
+    # exact at any precision, so they're used as is
+    EXACT_FUNCTIONS = ('ceil', 'floor')
+    CACHED_FUNCTIONS = ('cos', 'sin')
+    
+    def __init__(self, module, context, cache_size):
+        self.module = module
+        self.context = context
+        self.cache_size = cache_size
+        self.__name__ = module.__name__
+    
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        
+        func = getattr(self.module, name)
+        
+        if callable(func) and name not in self.EXACT_FUNCTIONS:
+            func = self._wrap(func, name in self.CACHED_FUNCTIONS)
+        
+        # only looked up once, after that it's an instance attribute
+        setattr(self, name, func)
+        return func
+    
+    def _wrap(self, func, cached):
+        from decimal import localcontext
+        
+        context = self.context
+        plus = context.plus
+        
+        def wrapper(*args):
+            with localcontext(context):
+                return plus(func(*[plus(arg) for arg in args]))
+        
+        if not cached or not self.cache_size:
+            return wrapper
+        
+        cache = LRUCache(self.cache_size)
+        
+        def cached_wrapper(x):
+            # rounded first, so values that only differ past the precision
+            # share a cache entry
+            x = plus(x)
+            
+            value = cache.get(x)
+            
+            if value is None:
+                value = wrapper(x)
+                cache.set(x, value)
+            
+            return value
+        
+        cached_wrapper.cache = cache
+        return cached_wrapper
 
+class DecimalGeoHelper(GeoHelper):
+    """
+    GeoHelper for Decimal numbers, which are much slower than floats but give
+    exactly the same results on every machine.
+    
+    Trig runs at a fixed precision, PRECISION significant digits by default,
+    rather than at the decimal context's precision, so it doesn't do more
+    work than the tile size needs and doesn't change with the context.
+    Constants are worked out once at that precision, and cos/sin results are
+    cached, since the same row latitudes come up over and over. Everything
+    else, including the floor() calls that decide which tile a location is
+    in, is plain Decimal arithmetic in the current context.
+    """
+    # enough for tiles down to about a foot, see precision_for
+    PRECISION = 20
+    # digits kept past the tile size, see precision_for
+    GUARD_DIGITS = 10
+    # number of cos/sin results cached per function
+    TRIG_CACHE_SIZE = 4096
+    
+    def __init__(self,
+          unit=GeoHelper.UNIT_MI,
+          math_module='dmath',
+          distance_method=GeoHelper.DISTANCE_HAVERSINE,
+          precision=None,
+          trig_cache_size=None,
+        ):
+        """
+        precision - the number of significant digits trig and constants are
+            calculated to, defaults to PRECISION
+        trig_cache_size - the max number of cos/sin results to cache,
+            defaults to TRIG_CACHE_SIZE. 0 disables the cache.
+        """
+        import decimal
+        
+        if isinstance(math_module, str):
+            math_module = _import_string(math_module)
+        if precision is None:
+            precision = self.PRECISION
+        if trig_cache_size is None:
+            trig_cache_size = self.TRIG_CACHE_SIZE
+        
+        self.precision = precision
+        self.trig_cache_size = trig_cache_size
+        self.context = decimal.Context(prec=precision)
+        
+        with decimal.localcontext(self.context):
+            super(DecimalGeoHelper, self).__init__(
+                unit=unit,
+                num_class=decimal.Decimal,
+                math_module=_ContextMath(math_module, self.context, trig_cache_size),
+                distance_method=distance_method,
+            )
+    
+    def _init_kwargs(self):
+        return {
+            'unit': self.unit,
+            'math_module': self.math_module.__name__,
+            'distance_method': self.distance_method,
+            'precision': self.precision,
+            'trig_cache_size': self.trig_cache_size,
+        }
+    
+    @classmethod
+    def precision_for(cls, max_tile_wh, unit=GeoHelper.UNIT_MI):
+        """
+        Returns the precision needed for tiles max_tile_wh wide/high: 3 digits
+        for whole degrees, enough decimal places to get down to the tile
+        size, plus GUARD_DIGITS.
+        """
+        tile_degrees = GeoHelper(unit=unit).offset_lat(float(max_tile_wh))
+        
+        return 3 + max(0, int(math.ceil(-math.log10(tile_degrees)))) + cls.GUARD_DIGITS
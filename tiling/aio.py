@@ -0,0 +1,119 @@
+"""
+asyncio helpers for the usual "compute tiles -> fetch from cache -> fall back
+to the DB" pattern.
+
+Requires Python 3.5+, so this module is never imported by the rest of the
+package.
+"""
+
+#Python imports
+import asyncio
+import functools
+
+class InMemoryCacheBackend(object):
+    """
+    A dict backed cache backend, for tests and single process use. Cache
+    backends just need get_many and set_many coroutines.
+    """
+    def __init__(self):
+        self.data = {}
+    
+    async def get_many(self, keys):
+        """
+        Returns a dict of key -> value for the keys that are in the cache.
+        """
+        data = self.data
+        return dict((key, data[key]) for key in keys if key in data)
+    
+    async def set_many(self, mapping):
+        """
+        Stores a dict of key -> value.
+        """
+        self.data.update(mapping)
+
+class TileCacheFetcher(object):
+    """
+    Fetches the data for the tiles a Tiler's (or any other TilingScheme's)
+    offset_boxes returns. All the tiles' cache keys are looked up with one
+    get_many call, and the misses are loaded concurrently with loader. Each
+    load writes its tile to the cache with set_many as soon as it's done, so
+    a load that finishes gets cached even if another one fails or the
+    request that started it is cancelled.
+    
+    Loads are shared: if a tile is already being loaded, by this request or a
+    concurrent one, its load is awaited instead of starting another one, so a
+    popular tile falling out of the cache only gets loaded once.
+    """
+    def __init__(self, tiler, backend, loader, concurrency=10, key_func=None):
+        """
+        backend - an object with get_many(keys) and set_many(mapping)
+            coroutines, like InMemoryCacheBackend
+        loader - a coroutine function, called as loader(tile_id, box), that
+            loads the data for a tile
+        concurrency - the max number of loader calls running at once
+        key_func - turns a tile ID into a cache key, defaults to
+            tiler.tile_key
+        """
+        self.tiler = tiler
+        self.backend = backend
+        self.loader = loader
+        self.concurrency = concurrency
+        self.key_func = key_func or tiler.tile_key
+        
+        # key -> future for each load that's running
+        self.in_flight = {}
+        
+        # created on first use, so it belongs to the loop that's running
+        self._semaphore = None
+    
+    async def _load(self, key, tile_id, box):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async with self._semaphore:
+            value = await self.loader(tile_id, box)
+        
+        # still in_flight until it's cached, so nothing loads it again in
+        # between
+        await self.backend.set_many({key: value})
+        
+        return value
+    
+    def _load_done(self, key, future):
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+    
+    async def fetch(self, latitude, longitude, height, width):
+        """
+        Returns a list of (box, data) pairs for the tiles offset_boxes returns,
+        in the same order.
+        """
+        tiler = self.tiler
+        in_flight = self.in_flight
+        
+        tiles = tiler.offset_tiles(latitude, longitude, height, width)
+        keys = [self.key_func(tile_id) for tile_id, box in tiles]
+        
+        data = await self.backend.get_many(keys)
+        
+        waiting = {}
+        
+        for (tile_id, box), key in zip(tiles, keys):
+            if key in data or key in waiting:
+                continue
+            
+            future = in_flight.get(key)
+            
+            if future is None:
+                future = in_flight[key] = asyncio.ensure_future(self._load(key, tile_id, box))
+                future.add_done_callback(functools.partial(self._load_done, key))
+            
+            waiting[key] = future
+        
+        if waiting:
+            # shielded so a cancelled request doesn't cancel loads other
+            # requests are waiting on
+            values = await asyncio.gather(*[asyncio.shield(future) for future in waiting.values()])
+            data.update(zip(waiting.keys(), values))
+        
+        return [(box, data[key]) for (tile_id, box), key in zip(tiles, keys)]
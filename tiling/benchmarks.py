@@ -0,0 +1,248 @@
+"""
+Benchmarks for the tiling hot paths.
+
+Run with:
+
+    python -m tiling.benchmarks --output results.json
+
+and compare against an earlier run with:
+
+    python -m tiling.benchmarks --compare results.json
+
+--import-time also times importing the package in a fresh interpreter, which
+is what serverless cold starts pay for.
+
+Everything runs locally with no network access. The Decimal backend is only
+benchmarked if dmath is installed.
+"""
+from __future__ import division, print_function
+
+#Python imports
+import argparse
+from decimal import Decimal
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from . import __version__, DecimalGeoHelper, FloatGeoHelper, GeoHelper
+
+TILE_SIZES = ('4', '6', '8', '25', '100')
+QUERY_SIZES = ('10', '50', '200')
+LOCATIONS = (
+    ('equator', '0', '90'),
+    ('rochester', '43.1553', '-77.6090'),
+    ('london', '51.5171', '-0.1062'),
+    ('nearnorthpole', '89', '0'),
+    ('nearsouthpole', '-89', '0'),
+)
+# number of points each filter benchmark filters
+FILTER_POINTS = 1000
+# number of fresh interpreters --import-time imports tiling in
+IMPORT_REPEAT = 10
+
+def get_backends():
+    backends = [
+        ('float', GeoHelper),
+        ('fastfloat', FloatGeoHelper),
+    ]
+    
+    try:
+        import dmath
+    except ImportError:
+        pass
+    else:
+        backends.append(('decimal', lambda: GeoHelper(num_class=Decimal, math_module=dmath)))
+        backends.append(('fixeddecimal', DecimalGeoHelper))
+    
+    return backends
+
+def time_func(func, min_time):
+    """
+    Calls func until at least min_time seconds have passed, 3 times over, and
+    returns (loops, best seconds per call).
+    """
+    timer = timeit.default_timer
+    loops = 1
+    
+    # find a number of loops that takes long enough to time accurately
+    while True:
+        start = timer()
+        for i in range(loops):
+            func()
+        elapsed = timer() - start
+        
+        if elapsed >= min_time:
+            break
+        
+        loops *= 10 if elapsed < min_time / 10 else 2
+    
+    best = elapsed
+    
+    for i in range(2):
+        start = timer()
+        for i in range(loops):
+            func()
+        best = min(best, timer() - start)
+    
+    return loops, best / loops
+
+def time_import(module='tiling', repeat=IMPORT_REPEAT):
+    """
+    Imports module in repeat fresh interpreters and returns the best time in
+    seconds. Only the import is timed, not the interpreter starting up.
+    """
+    code = 'import timeit; start = timeit.default_timer(); import %s; print(timeit.default_timer() - start)' % module
+    
+    # make sure the subprocesses import this copy of the package
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_parent, os.environ.get('PYTHONPATH')])))
+    
+    return min(
+        float(subprocess.check_output([sys.executable, '-c', code], env=env).decode())
+        for i in range(repeat)
+    )
+
+def filter_points(geo_helper, lat, lon, query_size):
+    num_class = geo_helper.num_class
+    steps = int(math.sqrt(FILTER_POINTS))
+    offset = num_class(query_size)
+    
+    points = []
+    
+    for i in range(steps):
+        for j in range(steps):
+            points.append(geo_helper.offset(
+                lat,
+                lon,
+                offset * (num_class(i) / steps - geo_helper.half),
+                offset * (num_class(j) / steps - geo_helper.half),
+            ))
+    
+    return points
+
+def get_cases(backends):
+    """
+    Yields (params, func) for every benchmark. The funcs close over loop
+    variables, so each one has to be run before getting the next case.
+    """
+    for backend_name, backend in backends:
+        geo_helper = backend()
+        num_class = geo_helper.num_class
+        
+        for location_name, lat, lon in LOCATIONS:
+            lat = num_class(lat)
+            lon = num_class(lon)
+            
+            params = {
+                'backend': backend_name,
+                'location': location_name,
+            }
+            
+            lat2, lon2 = geo_helper.offset(lat, lon, num_class(30), num_class(40))
+            yield dict(params, benchmark='GeoHelper.distance'), lambda: geo_helper.distance(lat, lon, lat2, lon2)
+            
+            for query_size in QUERY_SIZES:
+                size = num_class(query_size)
+                radius = size / 2
+                points = filter_points(geo_helper, lat, lon, size)
+                
+                query_params = dict(params, query_size=query_size)
+                
+                yield dict(query_params, benchmark='GeoHelper.filter_radius'), lambda: list(geo_helper.filter_radius(points, lat, lon, radius))
+                yield dict(query_params, benchmark='GeoHelper.filter_rectangle'), lambda: list(geo_helper.filter_rectangle(points, lat, lon, size, size))
+            
+            for tile_size in TILE_SIZES:
+                tiler = geo_helper.tiler(tile_size)
+                
+                tile_params = dict(params, tile_size=tile_size)
+                
+                yield dict(tile_params, benchmark='Tiler.get_box_centerpoint_for_coordinates'), lambda: tiler.get_box_centerpoint_for_coordinates(lat, lon)
+                
+                for query_size in QUERY_SIZES:
+                    size = num_class(query_size)
+                    
+                    query_params = dict(tile_params, query_size=query_size)
+                    
+                    yield dict(query_params, benchmark='Tiler.offset_coor_pairs'), lambda: tiler.offset_coor_pairs(lat, lon, size, size)
+                    yield dict(query_params, benchmark='Tiler.offset_boxes'), lambda: tiler.offset_boxes(lat, lon, size, size)
+                    yield dict(query_params, benchmark='Tiler.cover_boxes'), lambda: tiler.cover_boxes(lat, lon, size, size)
+
+def case_key(params):
+    return tuple(sorted((key, value) for key, value in params.items() if key not in ('loops', 'seconds')))
+
+def run(backends, min_time, selected=None):
+    for params, func in get_cases(backends):
+        if selected and not any(name in params['benchmark'] for name in selected):
+            continue
+        
+        loops, seconds = time_func(func, min_time)
+        
+        params.update(loops=loops, seconds=seconds)
+        
+        yield params
+
+def format_case(params):
+    return ' '.join(
+        '%s=%s' % (key, params[key])
+        for key in ('benchmark', 'backend', 'location', 'tile_size', 'query_size')
+        if key in params
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the tiling hot paths.')
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('-c', '--compare', help='compare against the results in this JSON file')
+    parser.add_argument('-b', '--benchmark', action='append', help='only run benchmarks whose name contains this, can be given more than once')
+    parser.add_argument('--backend', action='append', help='only run this backend (float, fastfloat, decimal or fixeddecimal), can be given more than once')
+    parser.add_argument('--min-time', type=float, default=0.05, help='min seconds to spend timing each case')
+    parser.add_argument('--import-time', action='store_true', help='also time importing tiling in a fresh interpreter')
+    args = parser.parse_args(argv)
+    
+    backends = [backend for backend in get_backends() if not args.backend or backend[0] in args.backend]
+    
+    previous = {}
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = dict((case_key(params), params) for params in json.load(f)['results'])
+    
+    results = []
+    
+    cases = run(backends, args.min_time, args.benchmark)
+    
+    if args.import_time:
+        cases = itertools.chain([{
+            'benchmark': 'import tiling',
+            'loops': IMPORT_REPEAT,
+            'seconds': time_import(),
+        }], cases)
+    
+    for params in cases:
+        results.append(params)
+        
+        line = '%-100s %12.3f us' % (format_case(params), params['seconds'] * 1e6)
+        
+        old = previous.get(case_key(params))
+        if old:
+            line += ' %+7.1f%%' % ((params['seconds'] / old['seconds'] - 1) * 100)
+        
+        print(line)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'version': __version__,
+                'python': sys.version,
+                'platform': platform.platform(),
+                'time': time.time(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Compact, array backed storage for lists of boxes.
+"""
+
+#Python imports
+from array import array
+
+class BoxArray(object):
+    """
+    A list of boxes stored in a flat array('d') of
+    north, east, south, west, north, east, ... values, with an optional
+    array('q') of tile IDs alongside. Takes 32 bytes per box (40 with tile
+    IDs) instead of a tuple of 4 floats.
+    
+    Iterating over or indexing a BoxArray gives (north, east, south, west)
+    tuples, like the lists Tiler.offset_boxes returns, and slicing one gives
+    a new BoxArray. The raw arrays support the buffer protocol, so they can be
+    passed to NumPy, struct, file writes, DB drivers, etc. without copying.
+    Note that array won't let a BoxArray grow while any such views of it
+    exist.
+    """
+    FIELDS = ('north', 'east', 'south', 'west')
+    
+    def __init__(self, coors=None, tile_ids=None):
+        self.coors = coors if coors is not None else array('d')
+        self.tile_ids = tile_ids
+    
+    @classmethod
+    def from_boxes(cls, boxes, tile_ids=None):
+        coors = array('d')
+        
+        for box in boxes:
+            coors.extend(box)
+        
+        return cls(coors, array('q', tile_ids) if tile_ids is not None else None)
+    
+    def append(self, box, tile_id=None):
+        self.coors.extend(box)
+        
+        if self.tile_ids is not None:
+            self.tile_ids.append(tile_id)
+    
+    def __len__(self):
+        return len(self.coors) // 4
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._slice(i)
+        
+        length = len(self)
+        
+        if i < 0:
+            i += length
+        if not 0 <= i < length:
+            raise IndexError('BoxArray index out of range')
+        
+        return tuple(self.coors[i * 4:i * 4 + 4])
+    
+    def _slice(self, i):
+        """
+        Returns a new BoxArray with the boxes (and tile IDs) in a slice.
+        """
+        start, stop, step = i.indices(len(self))
+        tile_ids = self.tile_ids
+        
+        if step == 1:
+            return BoxArray(
+                self.coors[start * 4:max(stop, start) * 4],
+                tile_ids[start:stop] if tile_ids is not None else None,
+            )
+        
+        coors = self.coors
+        ret = BoxArray(tile_ids=array('q') if tile_ids is not None else None)
+        
+        for j in range(start, stop, step):
+            ret.append(coors[j * 4:j * 4 + 4], tile_ids[j] if tile_ids is not None else None)
+        
+        return ret
+    
+    def __iter__(self):
+        coors = self.coors
+        
+        for i in range(0, len(coors), 4):
+            yield tuple(coors[i:i + 4])
+    
+    def __eq__(self, other):
+        if isinstance(other, BoxArray):
+            return self.coors == other.coors and self.tile_ids == other.tile_ids
+        return list(self) == list(other)
+    
+    def __ne__(self, other):
+        return not self == other
+    
+    def __repr__(self):
+        return 'BoxArray(%r)' % list(self)
+    
+    def __buffer__(self, flags):
+        # Python 3.12+ buffer protocol, older versions can use memoryview()
+        return memoryview(self.coors)
+    
+    def memoryview(self):
+        """
+        A zero copy view of the coordinates.
+        """
+        return memoryview(self.coors)
+    
+    def to_numpy(self, structured=False):
+        """
+        Returns a zero copy NumPy view of the coordinates, either as an N x 4
+        float64 array or, if structured is True, as a structured array with
+        north/east/south/west fields. Use numpy.frombuffer(box_array.tile_ids,
+        dtype=numpy.int64) for the tile IDs.
+        
+        Requires NumPy.
+        """
+        import numpy
+        
+        coors = numpy.frombuffer(self.coors, dtype=numpy.float64)
+        
+        if structured:
+            return coors.view([(field, numpy.float64) for field in self.FIELDS])
+        
+        return coors.reshape(-1, 4)
@@ -0,0 +1,336 @@
+"""
+Bulk tile IDs, tile center points and offset boxes for a file of locations.
+
+Run with:
+
+    tiling tile-ids --tile-size 3 points.f64 tile_ids.i64
+    tiling centers --tile-size 3 points.csv centers.csv
+    tiling boxes --tile-size 3 --height 10 --width 10 points.f64 boxes.bin
+
+or python -m tiling.cli with the same arguments.
+
+Input files are either binary, little endian float64 (lat, lon) pairs with
+nothing else in the file, or CSV files with lat and lon in the first two
+columns and an optional header row. Files ending in .csv are CSV, anything
+else is binary, unless --format says otherwise. Binary files are memory
+mapped and everything is done chunk_size points at a time, so memory use
+doesn't depend on the size of the file.
+
+The output file is the same kind as the input file, with one record per
+input point for tile-ids and centers, and one record per box for boxes:
+
+- tile-ids: an int64 tile ID, CSV column tile_id
+- centers: float64 (lat, lon) pairs, CSV columns lat,lon
+- boxes: records of the input point's index (int64), the tile ID (int64)
+  and the box's north, east, south and west edges (float64), CSV columns
+  point,tile_id,north,east,south,west. Boxes for each point are in
+  offset_boxes order.
+
+Binary output can be read back with numpy.fromfile, using the dtypes below.
+
+With NumPy installed, each chunk is snapped in one go and offset boxes are
+only worked out once per tile rather than once per point.
+"""
+from __future__ import division, print_function
+
+#Python imports
+import argparse
+from array import array
+import csv
+import itertools
+import mmap
+import struct
+import sys
+
+from . import FloatGeoHelper, GeoHelper
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHUNK_SIZE = 100000
+# number of offset_boxes results the tiler caches, see Tiler.box_cache
+BOX_CACHE_SIZE = 10000
+
+FORMAT_BINARY = 'binary'
+FORMAT_CSV = 'csv'
+
+COMMAND_TILE_IDS = 'tile-ids'
+COMMAND_CENTERS = 'centers'
+COMMAND_BOXES = 'boxes'
+
+# binary record layouts, as NumPy dtypes and struct formats
+POINT_DTYPE = '<f8'
+TILE_ID_DTYPE = '<i8'
+BOX_DTYPE = [
+    ('point', '<i8'),
+    ('tile_id', '<i8'),
+    ('north', '<f8'),
+    ('east', '<f8'),
+    ('south', '<f8'),
+    ('west', '<f8'),
+]
+_TILE_ID_STRUCT = struct.Struct('<q')
+_CENTER_STRUCT = struct.Struct('<2d')
+_BOX_STRUCT = struct.Struct('<2q4d')
+
+CSV_HEADERS = {
+    COMMAND_TILE_IDS: ['tile_id'],
+    COMMAND_CENTERS: ['lat', 'lon'],
+    COMMAND_BOXES: [name for name, dtype in BOX_DTYPE],
+}
+
+def guess_format(path):
+    return FORMAT_CSV if path.lower().endswith('.csv') else FORMAT_BINARY
+
+def read_binary(path, chunk_size=CHUNK_SIZE, vectorized=True):
+    """
+    Yields (lats, lons) for each chunk of a binary file of float64 pairs. The
+    chunks are NumPy views of the memory mapped file if vectorized is True,
+    otherwise lists.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        
+        if size % 16:
+            raise ValueError('%s is %s bytes, which isn\'t a whole number of float64 pairs.' % (path, size))
+        
+        # empty files can't be memory mapped
+        if not size:
+            return
+        
+        if vectorized:
+            points = numpy.memmap(f, dtype=POINT_DTYPE, mode='r').reshape(-1, 2)
+            
+            for start in range(0, len(points), chunk_size):
+                chunk = points[start:start + chunk_size]
+                yield chunk[:, 0], chunk[:, 1]
+            
+            return
+        
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            for start in range(0, size, chunk_size * 16):
+                chunk = array('d')
+                raw = data[start:start + chunk_size * 16]
+                
+                if hasattr(chunk, 'frombytes'):
+                    chunk.frombytes(raw)
+                else:
+                    # Python 2
+                    chunk.fromstring(raw)
+                
+                if sys.byteorder != 'little':
+                    chunk.byteswap()
+                
+                yield chunk[0::2].tolist(), chunk[1::2].tolist()
+        finally:
+            data.close()
+
+def read_csv(path, chunk_size=CHUNK_SIZE, vectorized=True):
+    """
+    Yields (lats, lons) for each chunk of a CSV file, as NumPy arrays if
+    vectorized is True, otherwise lists. A first row that isn't numbers is
+    skipped as a header.
+    """
+    with open(path) as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        
+        if first is None:
+            return
+        
+        try:
+            float(first[0]), float(first[1])
+        except ValueError:
+            pass
+        else:
+            rows = itertools.chain([first], rows)
+        
+        while True:
+            chunk = [(float(row[0]), float(row[1])) for row in itertools.islice(rows, chunk_size)]
+            
+            if not chunk:
+                break
+            
+            lats = [lat for lat, lon in chunk]
+            lons = [lon for lat, lon in chunk]
+            
+            if vectorized:
+                yield numpy.array(lats), numpy.array(lons)
+            else:
+                yield lats, lons
+
+def tile_ids(tiler, lats, lons, vectorized=True):
+    if vectorized:
+        return tiler.get_tile_ids_for_coordinates(lats, lons)
+    
+    get_tile_id = tiler.get_tile_id_for_coordinates
+    return [get_tile_id(lat, lon) for lat, lon in zip(lats, lons)]
+
+def centers(tiler, lats, lons, vectorized=True):
+    if vectorized:
+        center_lats, center_lons = tiler.get_box_centerpoints_for_coordinates(lats, lons)
+        
+        ret = numpy.empty((len(center_lats), 2), dtype=POINT_DTYPE)
+        ret[:, 0] = center_lats
+        ret[:, 1] = center_lons
+        return ret
+    
+    get_centerpoint = tiler.get_box_centerpoint_for_coordinates
+    return [get_centerpoint(lat, lon) for lat, lon in zip(lats, lons)]
+
+def boxes(tiler, lats, lons, height, width, first_point=0, vectorized=True):
+    """
+    Returns a (point, tile_id, north, east, south, west) record for each of
+    the offset boxes of each point, numbering points from first_point. A
+    NumPy array of BOX_DTYPE if vectorized is True, otherwise a list.
+    """
+    if not vectorized:
+        records = []
+        
+        for point, (lat, lon) in enumerate(zip(lats, lons), first_point):
+            for tile_id, box in zip(tiler.offset_tile_ids(lat, lon, height, width), tiler.offset_boxes(lat, lon, height, width)):
+                records.append((point, tile_id,) + tuple(box))
+        
+        return records
+    
+    # offset boxes only depend on the tile a point's in, so they're worked
+    # out once for each tile in the chunk and copied to all of its points
+    point_tile_ids = tiler.get_tile_ids_for_coordinates(lats, lons)
+    first_indexes, inverse = numpy.unique(point_tile_ids, return_index=True, return_inverse=True)[1:]
+    
+    tile_boxes = []
+    tile_box_ids = []
+    tile_counts = []
+    
+    for index in first_indexes.tolist():
+        lat = float(lats[index])
+        lon = float(lons[index])
+        
+        box_ids = tiler.offset_tile_ids(lat, lon, height, width)
+        
+        tile_boxes.extend(tiler.offset_boxes(lat, lon, height, width))
+        tile_box_ids.extend(box_ids)
+        tile_counts.append(len(box_ids))
+    
+    tile_boxes = numpy.array(tile_boxes, dtype=POINT_DTYPE).reshape(-1, 4)
+    tile_box_ids = numpy.array(tile_box_ids, dtype=TILE_ID_DTYPE)
+    tile_counts = numpy.array(tile_counts, dtype=TILE_ID_DTYPE)
+    tile_starts = numpy.cumsum(tile_counts) - tile_counts
+    
+    # for each record, the index of its box in tile_boxes: where its point's
+    # tile's boxes start, plus how far into them it is
+    point_counts = tile_counts[inverse]
+    point_starts = numpy.cumsum(point_counts) - point_counts
+    total = int(point_counts.sum())
+    
+    box_indexes = numpy.repeat(tile_starts[inverse] - point_starts, point_counts) + numpy.arange(total)
+    
+    records = numpy.empty(total, dtype=BOX_DTYPE)
+    records['point'] = numpy.repeat(numpy.arange(first_point, first_point + len(point_tile_ids)), point_counts)
+    records['tile_id'] = tile_box_ids[box_indexes]
+    
+    for i, name in enumerate(['north', 'east', 'south', 'west']):
+        records[name] = tile_boxes[box_indexes, i]
+    
+    return records
+
+def write_binary(f, command, results, vectorized=True):
+    if vectorized:
+        if command == COMMAND_TILE_IDS:
+            results = results.astype(TILE_ID_DTYPE)
+        
+        results.tofile(f)
+        return
+    
+    pack = {
+        COMMAND_TILE_IDS: _TILE_ID_STRUCT.pack,
+        COMMAND_CENTERS: _CENTER_STRUCT.pack,
+        COMMAND_BOXES: _BOX_STRUCT.pack,
+    }[command]
+    
+    if command == COMMAND_TILE_IDS:
+        f.write(b''.join(pack(result) for result in results))
+    else:
+        f.write(b''.join(pack(*result) for result in results))
+
+def write_csv(writer, command, results, vectorized=True):
+    if vectorized:
+        results = results.tolist()
+    
+    if command == COMMAND_TILE_IDS:
+        results = [[result] for result in results]
+    
+    writer.writerows(results)
+
+def run(command, tiler, input_path, output_path, file_format=None, chunk_size=CHUNK_SIZE, height=None, width=None, vectorized=None):
+    """
+    Runs a command (see the module docstring) over every point in an input
+    file, writing the results to an output file of the same format. Returns
+    the number of points.
+    
+    file_format - FORMAT_BINARY or FORMAT_CSV, defaults to guess_format
+    height, width - the area around each point, for COMMAND_BOXES
+    vectorized - whether to use NumPy, defaults to whether it's installed
+    """
+    if vectorized is None:
+        vectorized = numpy is not None
+    
+    if file_format is None:
+        file_format = guess_format(input_path)
+    
+    is_csv = file_format == FORMAT_CSV
+    read = read_csv if is_csv else read_binary
+    
+    num_points = 0
+    
+    with open(output_path, 'w' if is_csv else 'wb') as f:
+        if is_csv:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(CSV_HEADERS[command])
+        
+        for lats, lons in read(input_path, chunk_size, vectorized):
+            if command == COMMAND_TILE_IDS:
+                results = tile_ids(tiler, lats, lons, vectorized)
+            elif command == COMMAND_CENTERS:
+                results = centers(tiler, lats, lons, vectorized)
+            else:
+                results = boxes(tiler, lats, lons, height, width, num_points, vectorized)
+            
+            if is_csv:
+                write_csv(writer, command, results, vectorized)
+            else:
+                write_binary(f, command, results, vectorized)
+            
+            num_points += len(lats)
+    
+    return num_points
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tile IDs, tile center points or offset boxes for a file of locations.')
+    parser.add_argument('command', choices=[COMMAND_TILE_IDS, COMMAND_CENTERS, COMMAND_BOXES])
+    parser.add_argument('input', help='binary file of float64 (lat, lon) pairs, or CSV file')
+    parser.add_argument('output', help='file to write the results to, in the same format as the input')
+    parser.add_argument('-t', '--tile-size', required=True, help='the max width/height of a tile')
+    parser.add_argument('-u', '--unit', choices=[GeoHelper.UNIT_MI, GeoHelper.UNIT_KM, GeoHelper.UNIT_NM], default=GeoHelper.UNIT_MI, help='the unit sizes are in, defaults to mi')
+    parser.add_argument('--height', type=float, help='the height of the area around each point, for boxes')
+    parser.add_argument('--width', type=float, help='the width of the area around each point, for boxes')
+    parser.add_argument('-f', '--format', choices=[FORMAT_BINARY, FORMAT_CSV], help='the input and output format, by default csv if the input file name ends in .csv, otherwise binary')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='the number of points to process at a time')
+    args = parser.parse_args(argv)
+    
+    if args.command == COMMAND_BOXES and (args.height is None or args.width is None):
+        parser.error('boxes needs --height and --width')
+    
+    tiler = FloatGeoHelper(unit=args.unit).tiler(args.tile_size, box_cache_size=BOX_CACHE_SIZE)
+    
+    num_points = run(args.command, tiler, args.input, args.output, args.format, args.chunk_size, args.height, args.width)
+    
+    print('%s: %s points' % (args.command, num_points), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+In memory spatial index of items, keyed by the tiles of a Tiler.
+"""
+
+#Python imports
+from array import array
+
+from . import encode_tile_id
+
+class _Bucket(object):
+    __slots__ = ('lats', 'lons', 'items')
+    
+    def __init__(self, new_seq):
+        self.lats = new_seq()
+        self.lons = new_seq()
+        self.items = []
+
+class TileIndex(object):
+    """
+    Maps tile IDs to the items in each tile, with each tile's coordinates
+    packed into arrays.
+    
+    Queries only check individual points in the tiles on the edge of the
+    query area; tiles that are entirely inside it have all their items
+    returned without looking at them.
+    """
+    def __init__(self, tiler):
+        self.tiler = tiler
+        self.geo_helper = tiler.geo_helper
+        self.buckets = {}
+        
+        # floats get packed, other number classes have to be kept as objects
+        if self.geo_helper.num_class is float:
+            self._new_seq = lambda: array('d')
+        else:
+            self._new_seq = list
+        
+        self._len = 0
+    
+    def __len__(self):
+        return self._len
+    
+    def insert(self, lat, lon, item=None):
+        """
+        Adds an item at a location. item defaults to (lat, lon).
+        """
+        if item is None:
+            item = (lat, lon,)
+        
+        tile_id = self.tiler.get_tile_id_for_coordinates(lat, lon)
+        
+        bucket = self.buckets.get(tile_id)
+        
+        if bucket is None:
+            bucket = self.buckets[tile_id] = _Bucket(self._new_seq)
+        
+        bucket.lats.append(lat)
+        bucket.lons.append(lon)
+        bucket.items.append(item)
+        
+        self._len += 1
+    
+    def extend(self, iterable, coor_func=None):
+        """
+        Adds each item in iterable. Like GeoHelper.filter_radius, items are
+        (lat, lon) pairs unless coor_func is given.
+        """
+        for item in iterable:
+            lat, lon = item if not coor_func else coor_func(item)
+            self.insert(lat, lon, item)
+    
+    def remove(self, lat, lon, item=None):
+        """
+        Removes an item that was inserted at a location. Raises ValueError if
+        it isn't there.
+        """
+        if item is None:
+            item = (lat, lon,)
+        
+        tile_id = self.tiler.get_tile_id_for_coordinates(lat, lon)
+        
+        bucket = self.buckets.get(tile_id)
+        
+        if bucket is None:
+            raise ValueError('%r is not in the index.' % (item,))
+        
+        items = bucket.items
+        i = items.index(item)
+        
+        # swap the last entry into the removed one's place, so removal doesn't
+        # have to shift the rest of the arrays
+        for seq in (bucket.lats, bucket.lons, items):
+            seq[i] = seq[-1]
+            seq.pop()
+        
+        if not items:
+            del self.buckets[tile_id]
+        
+        self._len -= 1
+    
+    def tile_items(self, tile_id):
+        """
+        Returns the items in a tile.
+        """
+        bucket = self.buckets.get(tile_id)
+        return list(bucket.items) if bucket is not None else []
+    
+    def _tiles(self, row_ranges):
+        """
+        Yields (bucket, south, north, west, east) for each non empty tile.
+        """
+        buckets = self.buckets
+        lat_width = self.tiler.lat_width
+        MIN_LAT = self.geo_helper.MIN_LAT
+        MAX_LAT = self.geo_helper.MAX_LAT
+        MIN_LON = self.geo_helper.MIN_LON
+        MAX_LON = self.geo_helper.MAX_LON
+        
+        for row, first_col, last_col, lon_width in row_ranges:
+            # the rows touching the poles are cut off at the poles
+            south = max(row * lat_width, MIN_LAT)
+            north = min((row + 1) * lat_width, MAX_LAT)
+            
+            for col in range(first_col, last_col + 1):
+                bucket = buckets.get(encode_tile_id(row, col))
+                
+                if bucket is not None:
+                    # tiles are cut off at the antimeridian
+                    yield bucket, south, north, max(col * lon_width, MIN_LON), min((col + 1) * lon_width, MAX_LON)
+    
+    def query_rectangle(self, latitude, longitude, height, width):
+        """
+        Returns the items in the height x width rectangle centered on a
+        location, the same ones GeoHelper.filter_rectangle would return.
+        """
+        geo_helper = self.geo_helper
+        overlap = geo_helper.rectangle_bounds_overlap
+        in_bounds = geo_helper.in_rectangle_bounds
+        
+        bounds = geo_helper.rectangle_bounds(latitude, longitude, height, width)
+        
+        ret = []
+        
+        for bucket, south, north, west, east in self._tiles(self.tiler._cover_row_ranges(latitude, longitude, height, width)):
+            if overlap(bounds, south, north, west, east)[1]:
+                ret.extend(bucket.items)
+                continue
+            
+            for p_lat, p_lon, item in zip(bucket.lats, bucket.lons, bucket.items):
+                if in_bounds(bounds, p_lat, p_lon):
+                    ret.append(item)
+        
+        return ret
+    
+    def query_radius(self, latitude, longitude, radius):
+        """
+        Returns the items less than radius away from a location.
+        """
+        geo_helper = self.geo_helper
+        distance = geo_helper.distance
+        lon_delta = geo_helper._lon_delta
+        quarter_lon = geo_helper.MAX_LON / 2
+        
+        ret = []
+        
+        for bucket, south, north, west, east in self._tiles(self.tiler._radius_row_ranges(latitude, longitude, radius)):
+            # the point in a tile furthest from the location is one of its
+            # corners as long as the whole tile is within 90 degrees of
+            # longitude of it. Further round, e.g. in the polar cap tiles, the
+            # furthest point can be in the middle of an edge.
+            west_delta = lon_delta(west - longitude)
+            
+            if -quarter_lon <= west_delta and west_delta + (east - west) <= quarter_lon and all(
+                distance(lat, lon, latitude, longitude) < radius
+                for lat in (south, north)
+                for lon in (west, east)
+            ):
+                ret.extend(bucket.items)
+                continue
+            
+            for p_lat, p_lon, item in zip(bucket.lats, bucket.lons, bucket.items):
+                if distance(p_lat, p_lon, latitude, longitude) < radius:
+                    ret.append(item)
+        
+        return ret
@@ -0,0 +1,185 @@
+"""
+Opt-in counters and timing histograms for the tiling hot paths.
+
+Nothing here runs unless GeoHelper.instrument() or Tiler.instrument() is
+called: instrumenting wraps the methods on that one instance, and
+uninstrument() puts the originals back, so uninstrumented instances have no
+overhead at all.
+"""
+from __future__ import division
+
+#Python imports
+import functools
+import math
+import timeit
+
+class Histogram(object):
+    """
+    Counts values in power of 2 buckets. Bucket n holds values in
+    [2 ** (n - 1), 2 ** n), and 0 holds values <= 0.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+    
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        
+        bucket = math.frexp(value)[1] if value > 0 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            # bucket upper bounds -> counts
+            'buckets': dict(
+                (2.0 ** bucket if bucket else 0, count)
+                for bucket, count in sorted(self.buckets.items())
+            ),
+        }
+
+class Stats(object):
+    """
+    Collects a call count and a timing histogram (in seconds) for each
+    instrumented method, plus a histogram of result sizes (e.g. tiles per
+    query) for methods that return lists or yield items.
+    
+    sink - optional callable, called as sink(name, seconds, size) after every
+        call, e.g. to forward to statsd. size is None for methods without
+        sized results.
+    """
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.counters = {}
+        self.timings = {}
+        self.sizes = {}
+    
+    def record(self, name, seconds, size=None):
+        self.counters[name] = self.counters.get(name, 0) + 1
+        
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Histogram()
+        timing.add(seconds)
+        
+        if size is not None:
+            sizes = self.sizes.get(name)
+            if sizes is None:
+                sizes = self.sizes[name] = Histogram()
+            sizes.add(size)
+        
+        if self.sink is not None:
+            self.sink(name, seconds, size)
+    
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+        self.sizes.clear()
+    
+    def as_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'timings': dict((name, histogram.as_dict()) for name, histogram in self.timings.items()),
+            'sizes': dict((name, histogram.as_dict()) for name, histogram in self.sizes.items()),
+        }
+
+def _wrap(func, name, stats, sized):
+    timer = timeit.default_timer
+    record = stats.record
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = timer()
+        ret = func(*args, **kwargs)
+        record(name, timer() - start, len(ret) if sized else None)
+        return ret
+    
+    return wrapper
+
+def _wrap_generator(func, name, stats):
+    timer = timeit.default_timer
+    record = stats.record
+    
+    # the time spent in the generator itself, not in whatever's consuming it
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        elapsed = 0
+        size = 0
+        
+        start = timer()
+        iterator = iter(func(*args, **kwargs))
+        elapsed += timer() - start
+        
+        try:
+            while True:
+                start = timer()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += timer() - start
+                
+                size += 1
+                yield item
+        finally:
+            record(name, elapsed, size)
+    
+    return wrapper
+
+def instrument(obj, methods, stats):
+    """
+    Replaces methods on obj with wrappers that record to stats. methods is a
+    list of (method name, kind) pairs, where kind is 'call' for plain calls,
+    'sized' for methods returning lists and 'generator' for generators.
+    Names are recorded as 'ClassName.method_name'.
+    """
+    uninstrument(obj)
+    
+    originals = {}
+    
+    for method_name, kind in methods:
+        func = getattr(obj, method_name)
+        name = '%s.%s' % (obj.__class__.__name__, method_name)
+        
+        # some methods are instance attributes already (see FloatGeoHelper)
+        originals[method_name] = obj.__dict__.get(method_name)
+        
+        if kind == 'generator':
+            wrapper = _wrap_generator(func, name, stats)
+        else:
+            wrapper = _wrap(func, name, stats, kind == 'sized')
+        
+        setattr(obj, method_name, wrapper)
+    
+    obj._instrumented = originals
+    obj.stats = stats
+    
+    return stats
+
+def uninstrument(obj):
+    originals = obj.__dict__.pop('_instrumented', None)
+    
+    if originals is None:
+        return
+    
+    for method_name, original in originals.items():
+        if original is None:
+            delattr(obj, method_name)
+        else:
+            setattr(obj, method_name, original)
+    
+    del obj.stats
@@ -0,0 +1,465 @@
+"""
+Other ways to split up the earth's surface, with the same API as Tiler (see
+TilingScheme).
+
+- GeohashTiler: geohash cells. Keys are geohash strings, which sort so that
+  a cover usually needs a few key range scans instead of a lookup per tile.
+- EqualAreaTiler: cells that all have the same area and stay roughly
+  square, so covering a rectangle needs about the same number of tiles at
+  any latitude.
+"""
+from __future__ import division
+
+#Python imports
+import bisect
+import math
+
+from . import TilingScheme, decode_tile_id, encode_tile_id
+
+class GridScheme(TilingScheme):
+    """
+    Base class for schemes with a fixed number of rows, evenly spaced in
+    _lat_to_y(lat), each split into columns evenly spaced in longitude. Row 0
+    is the southernmost row, column 0 starts at -180.
+    
+    Every row has self.cols columns unless a subclass overrides _row_cols,
+    and subclasses with unevenly spaced rows override _row and _row_y.
+    
+    Subclasses implement _lat_to_y, _y_to_lat, _encode and _decode.
+    """
+    def __init__(self, geo_helper, rows, cols):
+        self.geo_helper = geo_helper
+        self.rows = rows
+        self.cols = cols
+        
+        self._y_min = self._lat_to_y(geo_helper.MIN_LAT)
+        self.row_height = (self._lat_to_y(geo_helper.MAX_LAT) - self._y_min) / rows
+        self._full_lon = geo_helper.MAX_LON - geo_helper.MIN_LON
+    
+    def _lat_to_y(self, lat):
+        raise NotImplementedError
+    
+    def _y_to_lat(self, y):
+        raise NotImplementedError
+    
+    def _encode(self, row, col):
+        raise NotImplementedError
+    
+    def _decode(self, tile_id):
+        raise NotImplementedError
+    
+    def _row_cols(self, row):
+        """
+        Returns the number of columns in a row.
+        """
+        return self.cols
+    
+    def _row_y(self, row):
+        """
+        Returns the y of the south edge of a row (or the north edge of the
+        last row, for row == self.rows).
+        """
+        return self._y_min + row * self.row_height
+    
+    def _row(self, lat):
+        # the poles and the antimeridian are the edges of the last row/column,
+        # not the start of new ones
+        row = int(self.geo_helper.floor((self._lat_to_y(lat) - self._y_min) / self.row_height))
+        return min(max(row, 0), self.rows - 1)
+    
+    def _col(self, row, lon):
+        cols = self._row_cols(row)
+        col = int(self.geo_helper.floor((lon - self.geo_helper.MIN_LON) * cols / self._full_lon))
+        return min(max(col, 0), cols - 1)
+    
+    def _col_edge(self, col, cols):
+        # multiplying first means columns in rows with different numbers of
+        # columns that should line up get exactly the same edge
+        return self.geo_helper.MIN_LON + self._full_lon * col / cols
+    
+    def _row_edges(self, row):
+        """
+        Returns the (north, south) latitudes of a row.
+        """
+        geo_helper = self.geo_helper
+        y_to_lat = self._y_to_lat
+        fix_lat = geo_helper.fix_lat
+        
+        # the poles are exact, whatever _y_to_lat rounds them to
+        if row + 1 >= self.rows:
+            north = geo_helper.MAX_LAT
+        else:
+            north = fix_lat(y_to_lat(self._row_y(row + 1)))
+        
+        if row <= 0:
+            south = geo_helper.MIN_LAT
+        else:
+            south = fix_lat(y_to_lat(self._row_y(row)))
+        
+        return north, south
+    
+    def _row_lat(self, row):
+        return self.geo_helper.fix_lat(self._y_to_lat((self._row_y(row) + self._row_y(row + 1)) * self.geo_helper.half))
+    
+    def _col_lon(self, row, col):
+        return self._col_edge(col + self.geo_helper.half, self._row_cols(row))
+    
+    def _tile_box(self, row, col):
+        cols = self._row_cols(row)
+        north, south = self._row_edges(row)
+        
+        return (
+            north,
+            min(self._col_edge(col + 1, cols), self.geo_helper.MAX_LON),
+            south,
+            self._col_edge(col, cols),
+        )
+    
+    def get_tile_id_for_coordinates(self, lat, lon):
+        row = self._row(lat)
+        return self._encode(row, self._col(row, lon))
+    
+    def get_box_centerpoint_for_coordinates(self, lat, lon):
+        row = self._row(lat)
+        return self._row_lat(row), self._col_lon(row, self._col(row, lon))
+    
+    def tile_center(self, tile_id):
+        row, col = self._decode(tile_id)
+        return self._row_lat(row), self._col_lon(row, col)
+    
+    def tile_box(self, tile_id):
+        return self._tile_box(*self._decode(tile_id))
+    
+    def tile_neighbors(self, tile_id):
+        """
+        See TilingScheme.tile_neighbors. When the rows above and below have
+        the same columns, that's the 8 tiles around a tile, fewer in the
+        first and last rows.
+        """
+        encode = self._encode
+        row, col = self._decode(tile_id)
+        cols = self._row_cols(row)
+        
+        ret = []
+        
+        for neighbor_row in (row - 1, row, row + 1):
+            if not 0 <= neighbor_row < self.rows:
+                continue
+            
+            neighbor_cols = self._row_cols(neighbor_row)
+            
+            # the columns whose edges are within this tile's edges, or touch
+            # them. Edges are col / cols of the way around, so this is exact.
+            first_col = -(-col * neighbor_cols // cols) - 1
+            last_col = (col + 1) * neighbor_cols // cols
+            
+            for neighbor_col in range(first_col, last_col + 1):
+                neighbor_id = encode(neighbor_row, neighbor_col % neighbor_cols)
+                
+                if neighbor_id != tile_id and neighbor_id not in ret:
+                    ret.append(neighbor_id)
+        
+        return ret
+    
+    def _col_ranges(self, row, lon_west, lon_east):
+        """
+        Like Tiler._col_ranges, but columns are always 0 to the number of
+        columns in the row - 1.
+        """
+        geo_helper = self.geo_helper
+        floor = geo_helper.floor
+        ceil = geo_helper.ceil
+        cols = self._row_cols(row)
+        max_col = cols - 1
+        
+        if lon_west is None:
+            return [(0, max_col)]
+        
+        west_col = min(int(floor((lon_west - geo_helper.MIN_LON) * cols / self._full_lon)), max_col)
+        east_col = max(int(ceil((lon_east - geo_helper.MIN_LON) * cols / self._full_lon)) - 1, 0)
+        
+        if lon_west <= lon_east:
+            return [(west_col, max(west_col, east_col))]
+        
+        # see Tiler._col_ranges
+        if east_col >= west_col - 1:
+            return [(0, max_col)]
+        
+        return [(west_col, max_col), (0, east_col)]
+    
+    def _cover_row_ranges(self, latitude, longitude, height, width):
+        """
+        Yields (row, first_col, last_col) for each range of tiles that
+        intersects the height x width rectangle centered on a location, south
+        to north, see Tiler._cover_row_ranges.
+        """
+        geo_helper = self.geo_helper
+        
+        lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = geo_helper.rectangle_bounds(latitude, longitude, height, width)
+        
+        first_row = self._row(lat_south)
+        
+        # a rectangle edge that lands exactly on a row boundary doesn't pull
+        # in the next row
+        last_row = self._row(lat_north)
+        if last_row > first_row and self._row_edges(last_row)[1] >= lat_north:
+            last_row -= 1
+        
+        for row in range(first_row, last_row + 1):
+            north, south = self._row_edges(row)
+            
+            # rows that reach into a polar cap need every column
+            if (cap_north is not None and north > cap_north) or (cap_south is not None and south < cap_south):
+                ranges = self._col_ranges(row, None, None)
+            else:
+                ranges = self._col_ranges(row, lon_west, lon_east)
+            
+            for first_col, last_col in ranges:
+                yield row, first_col, last_col
+    
+    def cover_tile_ids(self, latitude, longitude, height, width):
+        encode = self._encode
+        
+        return [
+            encode(row, col)
+            for row, first_col, last_col in self._cover_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def cover_coor_pairs(self, latitude, longitude, height, width):
+        col_lon = self._col_lon
+        
+        pairs = []
+        
+        for row, first_col, last_col in self._cover_row_ranges(latitude, longitude, height, width):
+            lat = self._row_lat(row)
+            
+            for col in range(first_col, last_col + 1):
+                pairs.append((lat, col_lon(row, col),))
+        
+        return pairs
+    
+    def cover_boxes(self, latitude, longitude, height, width):
+        tile_box = self._tile_box
+        
+        return [
+            tile_box(row, col)
+            for row, first_col, last_col in self._cover_row_ranges(latitude, longitude, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+    
+    def offset_tiles(self, latitude, longitude, height, width):
+        encode = self._encode
+        tile_box = self._tile_box
+        lat, lon = self.get_box_centerpoint_for_coordinates(latitude, longitude)
+        
+        return [
+            (encode(row, col), tile_box(row, col),)
+            for row, first_col, last_col in self._cover_row_ranges(lat, lon, height, width)
+            for col in range(first_col, last_col + 1)
+        ]
+
+# interleaves the low 32 bits of an int with 0s, and back
+def _spread_bits(n):
+    n &= 0xffffffff
+    n = (n | (n << 16)) & 0x0000ffff0000ffff
+    n = (n | (n << 8)) & 0x00ff00ff00ff00ff
+    n = (n | (n << 4)) & 0x0f0f0f0f0f0f0f0f
+    n = (n | (n << 2)) & 0x3333333333333333
+    n = (n | (n << 1)) & 0x5555555555555555
+    return n
+
+def _compact_bits(n):
+    n &= 0x5555555555555555
+    n = (n | (n >> 1)) & 0x3333333333333333
+    n = (n | (n >> 2)) & 0x0f0f0f0f0f0f0f0f
+    n = (n | (n >> 4)) & 0x00ff00ff00ff00ff
+    n = (n | (n >> 8)) & 0x0000ffff0000ffff
+    n = (n | (n >> 16)) & 0x00000000ffffffff
+    return n
+
+class GeohashTiler(GridScheme):
+    """
+    Geohash cells of a fixed precision (number of characters). Tile IDs are
+    the geohash bits as an int, tile_key returns the geohash string.
+    
+    Cells are a regular grid in degrees, so like Tiler tiles they get
+    narrower towards the poles, but unlike Tiler tiles they don't get wider
+    to make up for it.
+    """
+    ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+    BITS_PER_CHAR = 5
+    MAX_PRECISION = 12
+    
+    def __init__(self, geo_helper, precision):
+        """
+        precision - the number of characters in a geohash, 1 to 12
+        """
+        if not 1 <= precision <= self.MAX_PRECISION:
+            raise ValueError('precision must be between 1 and %s.' % self.MAX_PRECISION)
+        
+        self.precision = precision
+        
+        # bits alternate between longitude and latitude, starting with
+        # longitude, so longitude gets the extra bit if there's an odd number
+        bits = precision * self.BITS_PER_CHAR
+        self._lat_bits = bits // 2
+        self._lon_bits = bits - self._lat_bits
+        
+        super(GeohashTiler, self).__init__(geo_helper, 1 << self._lat_bits, 1 << self._lon_bits)
+    
+    def _init_kwargs(self):
+        return {
+            'geo_helper': self.geo_helper,
+            'precision': self.precision,
+        }
+    
+    def _lat_to_y(self, lat):
+        return lat
+    
+    def _y_to_lat(self, y):
+        return y
+    
+    def _encode(self, row, col):
+        if self._lon_bits > self._lat_bits:
+            return _spread_bits(col) | (_spread_bits(row) << 1)
+        return (_spread_bits(col) << 1) | _spread_bits(row)
+    
+    def _decode(self, tile_id):
+        if self._lon_bits > self._lat_bits:
+            return _compact_bits(tile_id >> 1), _compact_bits(tile_id)
+        return _compact_bits(tile_id), _compact_bits(tile_id >> 1)
+    
+    def tile_key(self, tile_id):
+        """
+        Returns the geohash for a tile ID.
+        """
+        alphabet = self.ALPHABET
+        
+        return ''.join(
+            alphabet[(tile_id >> shift) & 31]
+            for shift in range((self.precision - 1) * self.BITS_PER_CHAR, -1, -self.BITS_PER_CHAR)
+        )
+    
+    def parse_tile_key(self, key):
+        """
+        Returns the tile ID for a geohash, which must have the same precision.
+        """
+        if len(key) != self.precision:
+            raise ValueError('Expected a geohash with %s characters, got %r.' % (self.precision, key))
+        
+        tile_id = 0
+        
+        for char in key:
+            tile_id = (tile_id << self.BITS_PER_CHAR) | self.ALPHABET.index(char)
+        
+        return tile_id
+    
+    def cover_tile_id_ranges(self, latitude, longitude, height, width):
+        """
+        Returns the tiles cover_tile_ids returns as a sorted list of
+        (first_tile_id, last_tile_id) inclusive ranges of consecutive IDs.
+        """
+        ranges = []
+        
+        for tile_id in sorted(self.cover_tile_ids(latitude, longitude, height, width)):
+            if ranges and ranges[-1][1] + 1 == tile_id:
+                ranges[-1][1] = tile_id
+            else:
+                ranges.append([tile_id, tile_id])
+        
+        return [tuple(tile_id_range) for tile_id_range in ranges]
+    
+    def cover_key_ranges(self, latitude, longitude, height, width):
+        """
+        Returns (first_key, last_key) inclusive ranges of the geohashes of the
+        tiles cover_tile_ids returns, sorted, for stores that can scan a range
+        of keys at once.
+        """
+        tile_key = self.tile_key
+        
+        return [
+            (tile_key(first), tile_key(last),)
+            for first, last in self.cover_tile_id_ranges(latitude, longitude, height, width)
+        ]
+
+class EqualAreaTiler(GridScheme):
+    """
+    Cells that all have the same area, about that of a max_tile_wh square,
+    and are roughly square at any latitude. Like HEALPix rings, rows have
+    fewer columns the further they are from the equator, and each row is as
+    high, in sin(latitude) (a Lambert cylindrical equal-area projection), as
+    its number of columns needs for its cells to have the same area as every
+    other row's.
+    
+    So unlike Tiler tiles and geohashes, cells don't get narrower (or
+    wider) in distance towards the poles, and the number of tiles covering a
+    rectangle stays about the same at any latitude.
+    """
+    def __init__(self, geo_helper, max_tile_wh):
+        """
+        max_tile_wh - the width/height of a tile on the equator
+        """
+        self.max_tile_wh = geo_helper.num_class(max_tile_wh)
+        
+        # in radians. The number of columns per row is only picked here, the
+        # row edges are worked out with geo_helper from these, so floats are
+        # fine.
+        tile_radians = float(geo_helper.offset_lat(self.max_tile_wh)) * math.pi / 180
+        # the sin(latitude) height of a row with one column
+        cell_y = tile_radians * tile_radians / (2 * math.pi)
+        
+        # from the equator to the north pole, each row gets as many columns
+        # as fit around the earth at about its middle
+        north_cols = []
+        y = 0
+        
+        while y < 1:
+            lat = min(math.asin(y) + tile_radians / 2, math.pi / 2)
+            row_cols = max(int(round(2 * math.pi * math.cos(lat) / tile_radians)), 1)
+            
+            north_cols.append(row_cols)
+            y += row_cols * cell_y
+        
+        # and the same south of the equator
+        self._cols = north_cols[::-1] + north_cols
+        
+        # _col_totals[row] is the number of cells south of a row, which
+        # spreads the rows over sin(latitude) so that the last one ends right
+        # at the north pole
+        self._col_totals = [0]
+        for row_cols in self._cols:
+            self._col_totals.append(self._col_totals[-1] + row_cols)
+        
+        super(EqualAreaTiler, self).__init__(geo_helper, len(self._cols), north_cols[0])
+    
+    def _init_kwargs(self):
+        return {
+            'geo_helper': self.geo_helper,
+            'max_tile_wh': self.max_tile_wh,
+        }
+    
+    def _lat_to_y(self, lat):
+        return self.geo_helper.sin(lat * self.geo_helper.RAD)
+    
+    def _y_to_lat(self, y):
+        # rounding can put y a hair outside of -1 to 1 at the poles
+        return self.geo_helper.math_module.asin(min(max(y, -1), 1)) / self.geo_helper.RAD
+    
+    def _encode(self, row, col):
+        return encode_tile_id(row, col)
+    
+    def _decode(self, tile_id):
+        return decode_tile_id(tile_id)
+    
+    def _row_cols(self, row):
+        return self._cols[row]
+    
+    def _row_y(self, row):
+        return self.geo_helper.num_class(2 * self._col_totals[row]) / self._col_totals[-1] + self._y_min
+    
+    def _row(self, lat):
+        # how far north lat is, counted in cells like _col_totals
+        cells = (self._lat_to_y(lat) - self._y_min) * self._col_totals[-1] / 2
+        row = bisect.bisect_right(self._col_totals, cells) - 1
+        return min(max(row, 0), self.rows - 1)
@@ -1,31 +1,46 @@
 #Python imports
-from decimal import Decimal
+from decimal import Decimal, localcontext
+import json
 import math
-from unittest import TestCase
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipIf
 
 try:
     import dmath
 except ImportError:
     dmath = None
 
-from . import GeoHelper
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import DecimalGeoHelper, FloatGeoHelper, GeoHelper, LRUCache, TilingScheme, decode_tile_id, encode_tile_id, parse_tile_key, tile_key
+from .schemes import EqualAreaTiler, GeohashTiler
 
 class BaseTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
         super(BaseTestCase, cls).setUpClass()
-        num_class = cls.num_class
-        cls.geo_helper = GeoHelper(num_class=num_class, math_module=cls.math_module)
+        cls.geo_helper = cls.get_geo_helper()
         cls.tiler_4 = cls.geo_helper.tiler('4')
         cls.tiler_6 = cls.geo_helper.tiler('6')
         cls.tiler_8 = cls.geo_helper.tiler('8')
     
+    @classmethod
+    def get_geo_helper(cls):
+        return GeoHelper(num_class=cls.num_class, math_module=cls.math_module)
+    
     def setUp(self):
         self.tiler = None
         
         num_class = self.num_class
         
-        #TODO: handle international date line
         self.locations = {
             'rochester': (num_class('43.1553'), num_class('-77.6090'),),
             'london'   : (num_class('51.5171'), num_class('-0.1062'),),
@@ -35,12 +50,17 @@ class BaseTestCase(TestCase):
             'equator'  : (num_class('0'), num_class('90'),),
             '0-0' : (num_class('0'), num_class('0'),),#also on the equator
             '0-1' : (num_class('0'), num_class('1'),),
-#            'intldateline'  : (num_class('180'), num_class('0'),),
-#            'intldateline2'  : (num_class('-180'), num_class('0'),),
-#            'nearnorthpole': (num_class('89.9999'), num_class('0'),),
-#            'nearsouthpole': (num_class('-89.9999'), num_class('0'),),
-#            'northpole': (num_class('90'), num_class('0'),),
-#            'southpole': (num_class('-90'), num_class('0'),),
+        }
+        
+        # tiles wrap around the antimeridian and turn into polar caps here, so
+        # tests that expect a full grid of offset boxes don't use these
+        self.edge_locations = {
+            'intldateline'  : (num_class('0'), num_class('180'),),
+            'intldateline2'  : (num_class('0'), num_class('-180'),),
+            'nearnorthpole': (num_class('89.9999'), num_class('0'),),
+            'nearsouthpole': (num_class('-89.9999'), num_class('0'),),
+            'northpole': (num_class('90'), num_class('0'),),
+            'southpole': (num_class('-90'), num_class('0'),),
         }
         
         self.precision = num_class('0.000001')
@@ -180,6 +200,1188 @@ class BaseMethods(object):
         self.assertCloseEnough(pair[0], self.num_class('-0.0434488290106')*3)
         self.assertCloseEnough(pair[1], self.num_class('-0.0434488415034')*3)
     
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__get_box_centerpoints_for_coordinates__same_as_scalar(self):
+        self.tiler = self.tiler_6
+        
+        coors = list(self.locations.values()) + [
+            (self.num_class('-0.087'), self.num_class('-0.087'),),
+            (self.num_class('-33.8688'), self.num_class('151.2093'),),
+            (self.num_class('64.1466'), self.num_class('-21.9426'),),
+        ]
+        lats = [coor[0] for coor in coors]
+        lons = [coor[1] for coor in coors]
+        
+        new_lats, new_lons = self.tiler.get_box_centerpoints_for_coordinates(lats, lons)
+        
+        self.assertEqual(len(new_lats), len(coors))
+        
+        for i, (lat, lon) in enumerate(coors):
+            pair = self.tiler.get_box_centerpoint_for_coordinates(lat, lon)
+            
+            self.assertEqual(new_lats[i], pair[0])
+            self.assertEqual(new_lons[i], pair[1])
+    
+    def test__encode_tile_id__round_trip(self):
+        for row, col in [(0, 0), (-1, -1), (5, -7), (-6000, 12000), (-2**31, 2**31-1)]:
+            tile_id = encode_tile_id(row, col)
+            
+            self.assertEqual(decode_tile_id(tile_id), (row, col))
+            self.assertTrue(-2**63 <= tile_id < 2**63)
+            
+            key = tile_key(tile_id)
+            
+            self.assertEqual(len(key), 16)
+            self.assertEqual(parse_tile_key(key), tile_id)
+    
+    def test__get_tile_id_for_coordinates__same_tile_as_centerpoint(self):
+        self.tiler = self.tiler_6
+        
+        for location_name, coors in self.locations.items():
+            tile_id = self.tiler.get_tile_id_for_coordinates(*coors)
+            pair = self.tiler.get_box_centerpoint_for_coordinates(*coors)
+            
+            self.assertEqual(tile_id, self.tiler.get_tile_id_for_coordinates(*pair))
+    
+    def test__instrument__records_calls_and_tiles_per_query(self):
+        self.tiler = self.geo_helper.tiler('4', row_cache_size=0)
+        geo_helper = self.geo_helper
+        
+        lat, lon = self.locations['rochester']
+        size = self.num_class(14)
+        radius = self.num_class(7)
+        points = self._nearby_points(lat, lon)
+        
+        boxes = self.tiler.offset_boxes(lat, lon, size, size)
+        filtered = list(geo_helper.filter_radius(points, lat, lon, radius))
+        distance = geo_helper.distance
+        
+        calls = []
+        stats = self.tiler.instrument()
+        geo_helper.instrument(stats)
+        stats.sink = lambda name, seconds, size: calls.append(name)
+        
+        try:
+            self.assertEqual(self.tiler.offset_boxes(lat, lon, size, size), boxes)
+            self.assertEqual(list(geo_helper.filter_radius(points, lat, lon, radius)), filtered)
+        finally:
+            self.tiler.uninstrument()
+            geo_helper.uninstrument()
+        
+        counters = stats.counters
+        
+        self.assertEqual(counters['Tiler.offset_boxes'], 1)
+        self.assertEqual(stats.sizes['Tiler.offset_boxes'].max, len(boxes))
+        # without a row table, one row lookup to find the center tile and one
+        # for each row of boxes
+        self.assertEqual(counters['Tiler._calc_row_info'], len(set(box[0] for box in boxes)) + 1)
+        self.assertEqual(stats.sizes['%s.filter_radius' % geo_helper.__class__.__name__].max, len(filtered))
+        self.assertGreater(counters['%s.distance' % geo_helper.__class__.__name__], len(filtered))
+        self.assertEqual(len(calls), sum(counters.values()))
+        self.assertEqual(stats.as_dict()['timings']['Tiler.offset_boxes']['count'], 1)
+        
+        # uninstrumenting puts the original methods back
+        self.assertFalse(hasattr(self.tiler, 'stats'))
+        self.assertEqual(geo_helper.distance, distance)
+        self.assertNotIn('offset_boxes', vars(self.tiler))
+    
+    def test__iter_offset_boxes__same_as_offset_boxes(self):
+        self.tiler = self.tiler_4
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in list(self.locations.items()) + list(self.edge_locations.items()):
+            args = (coors[0], coors[1], height, width,)
+            
+            self.assertEqual(list(self.tiler.iter_offset_coor_pairs(*args)), self.tiler.offset_coor_pairs(*args))
+            self.assertEqual(list(self.tiler.iter_offset_boxes(*args)), self.tiler.offset_boxes(*args))
+            
+            # stopping early gives the start of the full list
+            boxes = self.tiler.iter_offset_boxes(*args)
+            self.assertEqual([next(boxes) for i in range(3)], self.tiler.offset_boxes(*args)[:3])
+    
+    def test__offset_tile_ids__same_tiles_as_offset_coor_pairs(self):
+        self.tiler = self.tiler_4
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in list(self.locations.items()) + list(self.edge_locations.items()):
+            args = (coors[0], coors[1], height, width,)
+            
+            tile_ids = self.tiler.offset_tile_ids(*args)
+            pairs = self.tiler.offset_coor_pairs(*args)
+            
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertEqual(len(tile_ids), len(pairs))
+            self.assertEqual(tile_ids, [self.tiler.get_tile_id_for_coordinates(*pair) for pair in pairs])
+    
+    def test__offset_tile_ids__antimeridian_and_poles(self):
+        num_class = self.num_class
+        size = num_class(10)
+        
+        self.tiler = self.tiler_4
+        
+        # a polar cap row has two tiles, so the whole row is used once
+        tile_ids = self.tiler.offset_tile_ids(num_class('89.99'), num_class('0'), size, size)
+        north_row = max(decode_tile_id(tile_id)[0] for tile_id in tile_ids)
+        
+        self.assertEqual(len(set(tile_ids)), len(tile_ids))
+        self.assertEqual(
+            sorted(decode_tile_id(tile_id)[1] for tile_id in tile_ids if decode_tile_id(tile_id)[0] == north_row),
+            [-1, 0],
+        )
+        
+        # columns wrap around to the other side of the antimeridian
+        for lat, lon in [(num_class('0'), num_class('179.999')), (num_class('89.9'), num_class('179.99')), (num_class('-45'), num_class('-180'))]:
+            tile_ids = self.tiler.offset_tile_ids(lat, lon, size, size)
+            boxes = self.tiler.offset_boxes(lat, lon, size, size)
+            
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertIn(self.geo_helper.MIN_LON, [box[3] for box in boxes])
+            self.assertIn(self.geo_helper.MAX_LON, [box[1] for box in boxes])
+            self.assertEqual(boxes, [self.tiler.tile_box(tile_id) for tile_id in tile_ids])
+    
+    def test__cover_tile_ids__covers_rectangle(self):
+        self.tiler = self.tiler_4
+        
+        height = self.num_class(13)
+        width = self.num_class(5)
+        steps = 10
+        
+        for location_name, coors in self.locations.items():
+            tile_ids = self.tiler.cover_tile_ids(coors[0], coors[1], height, width)
+            
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            
+            lat_north, lon_east, lat_south, lon_west = self.geo_helper.rectangle(coors[0], coors[1], height, width)
+            
+            for i in range(steps + 1):
+                for j in range(steps + 1):
+                    lat = lat_south + (lat_north - lat_south) * i / steps
+                    lon = lon_west + (lon_east - lon_west) * j / steps
+                    
+                    self.assertIn(self.tiler.get_tile_id_for_coordinates(lat, lon), tile_ids)
+    
+    def test__cover_boxes__intersect_rectangle(self):
+        self.tiler = self.tiler_4
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in self.locations.items():
+            lat_north, lon_east, lat_south, lon_west = self.geo_helper.rectangle(coors[0], coors[1], height, width)
+            
+            boxes = self.tiler.cover_boxes(coors[0], coors[1], height, width)
+            
+            self.assertLessEqual(len(boxes), self.tiler.offset_pairs_num(coors[0], coors[1], height, width))
+            
+            for box in boxes:
+                self.assertLess(box[2], lat_north)
+                self.assertGreater(box[0], lat_south)
+                self.assertLess(box[3], lon_east)
+                self.assertGreater(box[1], lon_west)
+    
+    def test__cover_boxes__same_tiles_as_cover_coor_pairs(self):
+        self.tiler = self.tiler_6
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in self.locations.items():
+            args = (coors[0], coors[1], height, width,)
+            
+            boxes = self.tiler.cover_boxes(*args)
+            pairs = self.tiler.cover_coor_pairs(*args)
+            tile_ids = self.tiler.cover_tile_ids(*args)
+            
+            self.assertEqual(len(boxes), len(pairs))
+            
+            for box, pair, tile_id in zip(boxes, pairs, tile_ids):
+                self.assertTrue(box[2] < pair[0] < box[0])
+                self.assertTrue(box[3] < pair[1] < box[1])
+                self.assertEqual(self.tiler.get_tile_id_for_coordinates(*pair), tile_id)
+    
+    def test__row_cache__same_results_as_uncached(self):
+        self.tiler = self.geo_helper.tiler('6', row_cache_size=2)
+        uncached_tiler = self.geo_helper.tiler('6', row_cache_size=0)
+        
+        self.assertIsNone(uncached_tiler.row_cache)
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in list(self.locations.items()) + list(self.edge_locations.items()):
+            args = (coors[0], coors[1], height, width,)
+            
+            self.assertEqual(self.tiler.get_box_centerpoint_for_coordinates(*coors), uncached_tiler.get_box_centerpoint_for_coordinates(*coors))
+            self.assertEqual(self.tiler.offset_boxes(*args), uncached_tiler.offset_boxes(*args))
+            self.assertEqual(self.tiler.cover_boxes(*args), uncached_tiler.cover_boxes(*args))
+        
+        self.assertEqual(len(self.tiler.row_cache), 2)
+        self.assertGreater(self.tiler.row_cache.hits, 0)
+    
+    def test__box_cache__same_results_as_uncached(self):
+        self.tiler = self.geo_helper.tiler('6', box_cache_size=4)
+        
+        self.assertIsNone(self.tiler_6.box_cache)
+        
+        search_box_radius = self.num_class(7)
+        
+        width = height = search_box_radius * 2
+        
+        for location_name, coors in self.locations.items():
+            args = (coors[0], coors[1], height, width,)
+            
+            for i in range(2):
+                self.assertEqual(self.tiler.offset_boxes(*args), self.tiler_6.offset_boxes(*args))
+                self.assertEqual(self.tiler.offset_tile_ids(*args), self.tiler_6.offset_tile_ids(*args))
+                self.assertEqual(self.tiler.offset_tiles(*args), self.tiler_6.offset_tiles(*args))
+        
+        self.assertEqual(len(self.tiler.box_cache), 4)
+        self.assertEqual(self.tiler.box_cache.hits, 3 * len(self.locations))
+    
+    def test__box_cache__hit_for_nearby_coordinates(self):
+        size = self.num_class(14)
+        
+        self.tiler = self.geo_helper.tiler('6', box_cache_size=4)
+        
+        lat, lon = self.locations['rochester']
+        
+        boxes = self.tiler.offset_boxes(lat, lon, size, size)
+        # returned lists can be changed without affecting the cache
+        boxes.pop()
+        
+        lat2, lon2 = self.geo_helper.offset(lat, lon, self.num_class('0.1'), self.num_class('0.1'))
+        
+        self.assertEqual(self.tiler.offset_boxes(lat2, lon2, size, size), self.tiler_6.offset_boxes(lat, lon, size, size))
+        self.assertEqual((self.tiler.box_cache.hits, self.tiler.box_cache.misses), (1, 1))
+    
+    def test__warm_row_cache(self):
+        size = self.num_class(14)
+        
+        self.tiler = self.geo_helper.tiler('6')
+        
+        lat, lon = self.locations['rochester']
+        
+        self.tiler.warm_row_cache(lat - 1, lat + 1)
+        misses = self.tiler.row_cache.misses
+        
+        self.tiler.get_box_centerpoint_for_coordinates(lat, lon)
+        self.tiler.cover_boxes(lat, lon, size, size)
+        
+        self.assertEqual(self.tiler.row_cache.misses, misses)
+    
+    def test__lru_cache__evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__get_tile_ids_for_coordinates__same_as_scalar(self):
+        self.tiler = self.tiler_6
+        
+        coors = list(self.locations.values())
+        
+        tile_ids = self.tiler.get_tile_ids_for_coordinates([coor[0] for coor in coors], [coor[1] for coor in coors])
+        
+        self.assertEqual(tile_ids.tolist(), [self.tiler.get_tile_id_for_coordinates(*coor) for coor in coors])
+    
+    def test__bucket__groups_items_by_tile(self):
+        self.tiler = self.tiler_6
+        
+        lat, lon = self.locations['rochester']
+        items = [
+            {'name': 'a', 'coors': (lat, lon,)},
+            {'name': 'b', 'coors': self.geo_helper.offset(lat, lon, 10, 10)},
+            {'name': 'c', 'coors': self.geo_helper.offset(lat, lon, self.num_class('0.1'), self.num_class('0.1'))},
+        ]
+        
+        buckets = list(self.tiler.bucket(items, coor_func=lambda item: item['coors']))
+        
+        self.assertEqual(len(buckets), 2)
+        self.assertEqual(buckets[0][0], self.tiler.get_tile_id_for_coordinates(lat, lon))
+        self.assertEqual([item['name'] for item in buckets[0][1]], ['a', 'c'])
+        self.assertEqual([item['name'] for item in buckets[1][1]], ['b'])
+    
+    def test__bucket__chunks(self):
+        self.tiler = self.tiler_6
+        
+        coors = list(self.locations.values()) * 2
+        
+        buckets = list(self.tiler.bucket(iter(coors), chunk_size=len(self.locations)))
+        
+        self.assertEqual(len(buckets), 2 * len(set(self.tiler.get_tile_id_for_coordinates(*coor) for coor in coors)))
+        self.assertEqual(sum(len(items) for tile_id, items in buckets), len(coors))
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__bucket__vectorized(self):
+        self.tiler = self.tiler_6
+        
+        coors = list(self.locations.values())
+        
+        self.assertEqual(list(self.tiler.bucket(coors, vectorized=True)), list(self.tiler.bucket(coors)))
+    
+    def _nearby_points(self, lat, lon):
+        num_class = self.num_class
+        offsets = [num_class(offset) for offset in ('-9', '-4.5', '-1', '0', '0.5', '3', '6.5', '11')]
+        
+        return [self.geo_helper.offset(lat, lon, lat_offset, lon_offset) for lat_offset in offsets for lon_offset in offsets]
+    
+    def test__distance__across_prime_meridian(self):
+        num_class = self.num_class
+        
+        # 2 degrees of longitude on the equator is 120nm
+        distance = self.geo_helper.distance(num_class('0'), num_class('-1'), num_class('0'), num_class('1'))
+        
+        self.assertLess(abs(distance - 120 * self.geo_helper.MI_PER_NM), self.num_class('0.01'))
+    
+    def test__distance_methods__across_antimeridian(self):
+        num_class = self.num_class
+        
+        for distance_method in GeoHelper.DISTANCE_METHODS:
+            geo_helper = GeoHelper(num_class=num_class, math_module=self.math_module, distance_method=distance_method)
+            
+            # the same point
+            self.assertLess(geo_helper.distance(num_class('0'), num_class('-180'), num_class('0'), num_class('180')), self.precision)
+            self.assertEqual(
+                list(geo_helper.filter_radius([(num_class('0'), num_class('180'))], num_class('0'), num_class('-180'), num_class(5))),
+                [(num_class('0'), num_class('180'))],
+            )
+            
+            # 0.2 degrees of longitude apart, not 359.8
+            distance = geo_helper.distance(num_class('10'), num_class('179.9'), num_class('10'), num_class('-179.9'))
+            expected = geo_helper.haversine_distance(num_class('10'), num_class('-0.1'), num_class('10'), num_class('0.1'))
+            
+            self.assertLess(abs(distance / expected - 1), num_class('0.006'))
+            
+            if numpy is not None:
+                lats = [num_class('0'), num_class('10')]
+                lons = [num_class('180'), num_class('-179.9')]
+                
+                distances = geo_helper.distances(lats, lons, num_class('0'), num_class('-180'))
+                
+                for lat, lon, batch_distance in zip(lats, lons, distances):
+                    self.assertLess(abs(batch_distance - geo_helper.distance(lat, lon, num_class('0'), num_class('-180'))), self.precision)
+                
+                self.assertEqual(list(geo_helper.filter_radius_mask(lats, lons, num_class('0'), num_class('-180'), num_class(5))), [True, False])
+    
+    def test__distance__subclass_override(self):
+        num_class = self.num_class
+        
+        class OverridingGeoHelper(self.geo_helper.__class__):
+            def distance(self, lat1, lon1, lat2, lon2):
+                return super(OverridingGeoHelper, self).distance(lat1, lon1, lat2, lon2) * 2
+        
+        geo_helper = OverridingGeoHelper(**self.geo_helper._init_kwargs())
+        args = (num_class('43'), num_class('-77'), num_class('43.01'), num_class('-77.01'))
+        
+        self.assertEqual(geo_helper.distance(*args), self.geo_helper.distance(*args) * 2)
+        self.assertEqual(
+            list(geo_helper.filter_radius([args[2:]], args[0], args[1], self.geo_helper.distance(*args) * num_class('1.5'))),
+            [],
+        )
+    
+    def test__distance_methods__agree(self):
+        num_class = self.num_class
+        
+        geo_helpers = dict(
+            (distance_method, GeoHelper(num_class=self.num_class, math_module=self.math_module, distance_method=distance_method))
+            for distance_method in GeoHelper.DISTANCE_METHODS
+        )
+        
+        for location_name, coors in self.locations.items():
+            for lat_offset, lon_offset in [(7, 0), (0, -7), (5, 5), (-30, 40)]:
+                lat, lon = self.geo_helper.offset(coors[0], coors[1], num_class(lat_offset), num_class(lon_offset))
+                
+                haversine = geo_helpers['haversine'].distance(lat, lon, coors[0], coors[1])
+                
+                # the ellipsoid is up to about 0.5% off from the sphere, and
+                # flat earth is good to 0.1% at these distances
+                self.assertLess(abs(geo_helpers['vincenty'].distance(lat, lon, coors[0], coors[1]) / haversine - 1), num_class('0.006'))
+                self.assertLess(abs(geo_helpers['equirectangular'].distance(lat, lon, coors[0], coors[1]) / haversine - 1), num_class('0.001'))
+    
+    def test__vincenty_distance__known_distance(self):
+        num_class = self.num_class
+        geo_helper = GeoHelper(unit=GeoHelper.UNIT_NM, num_class=num_class, math_module=self.math_module, distance_method='vincenty')
+        
+        # Flinders Peak to Buninyong, 54972.271m, from Vincenty's paper
+        distance = geo_helper.distance(num_class('-37.95103342'), num_class('144.42486789'), num_class('-37.65282114'), num_class('143.92649554'))
+        
+        self.assertLess(abs(distance * geo_helper.METERS_PER_NM - num_class('54972.271')), num_class('0.01'))
+        self.assertEqual(geo_helper.distance(num_class('10'), num_class('10'), num_class('10'), num_class('10')), 0)
+        self.assertEqual(pickle.loads(pickle.dumps(geo_helper)).distance_method, 'vincenty')
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__distances__same_as_distance(self):
+        for distance_method in GeoHelper.DISTANCE_METHODS:
+            geo_helper = GeoHelper(num_class=self.num_class, math_module=self.math_module, distance_method=distance_method)
+            
+            for location_name, coors in self.locations.items():
+                points = self._nearby_points(*coors) + [(self.num_class('-10'), self.num_class('-179'))]
+                
+                distances = geo_helper.distances([point[0] for point in points], [point[1] for point in points], coors[0], coors[1])
+                
+                for point, distance in zip(points, distances):
+                    self.assertLess(abs(distance - geo_helper.distance(point[0], point[1], coors[0], coors[1])), self.precision)
+    
+    def test__filter_radius__return_items(self):
+        lat, lon = self.locations['rochester']
+        radius = self.num_class(7)
+        
+        points = self._nearby_points(lat, lon)
+        items = [{'id': i, 'coors': point} for i, point in enumerate(points)]
+        
+        expected = [point for point in points if self.geo_helper.distance(point[0], point[1], lat, lon) < radius]
+        
+        self.assertEqual(list(self.geo_helper.filter_radius(points, lat, lon, radius)), expected)
+        
+        filtered = list(self.geo_helper.filter_radius(items, lat, lon, radius, coor_func=lambda item: item['coors'], return_items=True))
+        
+        self.assertEqual([item['coors'] for item in filtered], expected)
+    
+    def test__radius_bounds__contains_radius(self):
+        radius = self.num_class(7)
+        
+        for location_name, coors in self.locations.items():
+            lat_north, lat_south, lon_range = self.geo_helper.radius_bounds(coors[0], coors[1], radius)
+            
+            for lat_offset, lon_offset in [(7, 0), (-7, 0), (0, 7), (0, -7), (5, 5), (-5, -5)]:
+                lat, lon = self.geo_helper.offset(coors[0], coors[1], self.num_class(lat_offset), self.num_class(lon_offset))
+                
+                self.assertTrue(lat_south <= lat <= lat_north)
+                self.assertLessEqual(abs(lon - coors[1]), lon_range)
+    
+    def test__radius_bounds__includes_pole(self):
+        lat_north, lat_south, lon_range = self.geo_helper.radius_bounds(self.num_class('89.99'), self.num_class('0'), self.num_class(7))
+        
+        self.assertIsNone(lon_range)
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__filter_radius_mask__same_as_filter_radius(self):
+        radius = self.num_class(7)
+        
+        for location_name, coors in self.locations.items():
+            points = self._nearby_points(*coors)
+            
+            mask = self.geo_helper.filter_radius_mask([point[0] for point in points], [point[1] for point in points], coors[0], coors[1], radius)
+            
+            self.assertEqual(
+                [point for point, match in zip(points, mask) if match],
+                list(self.geo_helper.filter_radius(points, coors[0], coors[1], radius)),
+            )
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__filter_rectangle_mask__same_as_filter_rectangle(self):
+        height = self.num_class(13)
+        width = self.num_class(5)
+        
+        locations = list(self.locations.values()) + [
+            (self.num_class('10'), self.num_class('179.99')),
+            (self.num_class('89.95'), self.num_class('0')),
+        ]
+        
+        for coors in locations:
+            points = self._nearby_points(*coors)
+            
+            mask = self.geo_helper.filter_rectangle_mask([point[0] for point in points], [point[1] for point in points], coors[0], coors[1], height, width)
+            
+            self.assertEqual(
+                [point for point, match in zip(points, mask) if match],
+                list(self.geo_helper.filter_rectangle(points, coors[0], coors[1], height, width)),
+            )
+    
+    def test__radius_tile_ids__covers_circle(self):
+        self.tiler = self.geo_helper.tiler('2')
+        
+        radius = self.num_class(20)
+        
+        for location_name, coors in self.locations.items():
+            tile_ids = self.tiler.radius_tile_ids(coors[0], coors[1], radius)
+            # the circle's padded a little, see GeoHelper.DISTANCE_PADS
+            square_tile_ids = self.tiler.cover_tile_ids(coors[0], coors[1], radius * 2 + 1, radius * 2 + 1)
+            
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertTrue(set(tile_ids) < set(square_tile_ids))
+            self.assertEqual(len(self.tiler.radius_boxes(coors[0], coors[1], radius)), len(tile_ids))
+            
+            for lat_offset in range(-20, 21, 2):
+                for lon_offset in range(-20, 21, 2):
+                    lat, lon = self.geo_helper.offset(coors[0], coors[1], self.num_class(lat_offset), self.num_class(lon_offset))
+                    
+                    if self.geo_helper.distance(lat, lon, coors[0], coors[1]) < radius:
+                        self.assertIn(self.tiler.get_tile_id_for_coordinates(lat, lon), tile_ids)
+    
+    def test__radius_tile_ids__drops_corners(self):
+        self.tiler = self.geo_helper.tiler('2')
+        
+        radius = self.num_class(50)
+        
+        lat, lon = self.locations['rochester']
+        
+        num = len(self.tiler.radius_tile_ids(lat, lon, radius))
+        square_num = len(self.tiler.cover_tile_ids(lat, lon, radius * 2, radius * 2))
+        
+        # a circle covers pi/4 of the square around it
+        self.assertLess(num, square_num * self.num_class('0.8'))
+    
+    def test__get_row_col_for_coordinates__edges(self):
+        self.tiler = self.tiler_4
+        num_class = self.num_class
+        
+        # the antimeridian and the poles belong to the last column/row
+        self.assertEqual(
+            self.tiler.get_row_col_for_coordinates(num_class('10'), num_class('180')),
+            self.tiler.get_row_col_for_coordinates(num_class('10'), num_class('179.9999')),
+        )
+        self.assertEqual(
+            self.tiler.get_row_col_for_coordinates(num_class('90'), num_class('10')),
+            self.tiler.get_row_col_for_coordinates(num_class('89.9999'), num_class('10')),
+        )
+    
+    def test__cover_tile_ids__across_antimeridian(self):
+        self.tiler = self.tiler_4
+        
+        height = self.num_class(13)
+        width = self.num_class(25)
+        steps = 10
+        
+        for lat, lon in [('10', '179.9'), ('-45', '-179.8'), ('0', '180')]:
+            lat = self.num_class(lat)
+            lon = self.num_class(lon)
+            
+            tile_ids = self.tiler.cover_tile_ids(lat, lon, height, width)
+            boxes = self.tiler.cover_boxes(lat, lon, height, width)
+            pairs = self.tiler.cover_coor_pairs(lat, lon, height, width)
+            
+            # at most (13 / 4 + 1) rows of (25 / 4 + 1) tiles
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertLessEqual(len(tile_ids), 5 * 8)
+            
+            for box, pair, tile_id in zip(boxes, pairs, tile_ids):
+                self.assertTrue(self.geo_helper.MIN_LON <= box[3] < pair[1] < box[1] <= self.geo_helper.MAX_LON)
+                self.assertEqual(self.tiler.get_tile_id_for_coordinates(*pair), tile_id)
+            
+            for i in range(steps + 1):
+                for j in range(steps + 1):
+                    point = self.geo_helper.offset(lat, lon, height * (self.num_class(i) / steps - self.geo_helper.half), width * (self.num_class(j) / steps - self.geo_helper.half))
+                    
+                    self.assertIn(self.tiler.get_tile_id_for_coordinates(*point), tile_ids)
+    
+    def test__cover_tile_ids__near_poles(self):
+        self.tiler = self.tiler_4
+        
+        size = self.num_class(50)
+        
+        for lat in ('89.99', '-89.99', '90'):
+            lat = self.num_class(lat)
+            lon = self.num_class('0')
+            
+            tile_ids = self.tiler.cover_tile_ids(lat, lon, size, size)
+            
+            # every tile within 25 units of the pole, and no more tiles than
+            # offset_boxes would have generated
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertLessEqual(len(tile_ids), self.tiler.offset_pairs_num(lat, lon, size, size))
+            
+            for lon_offset in range(-180, 180, 15):
+                point = self.geo_helper.offset(lat, self.num_class(lon_offset), self.num_class('-20') if lat > 0 else self.num_class('20'))
+                
+                self.assertIn(self.tiler.get_tile_id_for_coordinates(*point), tile_ids)
+        
+        # the rows touching the poles are split into two polar cap tiles
+        for lat in ('90', '-90'):
+            north, east, south, west = self.tiler.cover_boxes(self.num_class(lat), self.num_class('0'), self.num_class(1), self.num_class(1))[0]
+            
+            self.assertEqual((west, east), (self.geo_helper.MIN_LON, self.num_class('0')))
+    
+    def test__cover_and_radius__no_duplicates_near_poles(self):
+        num_class = self.num_class
+        tiler = self.geo_helper.tiler('50')
+        
+        # rows this close to a pole only have a few columns, so both sides of
+        # the antimeridian can land in the same one
+        for lat, lon, radius in [
+            ('86.5065', '-75.938', '457'),
+            ('87.68', '-80', '500'),
+            ('88.61', '160.19', '300'),
+            ('83.68', '-133.22', '500'),
+            ('88.02', '-94.49', '200'),
+            ('89.47', '35.79', '100'),
+            ('-87.3', '-174.79', '400'),
+        ]:
+            lat, lon, radius = num_class(lat), num_class(lon), num_class(radius)
+            size = radius * 2
+            
+            tile_ids = tiler.cover_tile_ids(lat, lon, size, size)
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertEqual(len(tiler.cover_boxes(lat, lon, size, size)), len(tile_ids))
+            self.assertEqual(len(tiler.cover_coor_pairs(lat, lon, size, size)), len(tile_ids))
+            
+            tile_ids = tiler.radius_tile_ids(lat, lon, radius)
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertEqual(len(tiler.radius_boxes(lat, lon, radius)), len(tile_ids))        
+        tile_ids = tiler.cover_tile_ids(num_class('86.5065'), num_class('-75.938'), num_class('462.02'), num_class('914.98'))
+        self.assertEqual(len(set(tile_ids)), len(tile_ids))
+    
+    def get_schemes(self):
+        return [self.tiler_4, GeohashTiler(self.geo_helper, 4), EqualAreaTiler(self.geo_helper, '16')]
+    
+    def test__schemes__cover_tile_ids__covers_rectangle(self):
+        num_class = self.num_class
+        geo_helper = self.geo_helper
+        
+        height = num_class(13)
+        width = num_class(25)
+        steps = 10
+        
+        locations = list(self.locations.values()) + [
+            (num_class('10'), num_class('179.9')),
+            (num_class('-45'), num_class('-180')),
+            (num_class('89.99'), num_class('0')),
+            (num_class('-90'), num_class('0')),
+        ]
+        
+        for scheme in self.get_schemes():
+            self.assertTrue(isinstance(scheme, TilingScheme))
+            
+            for lat, lon in locations:
+                tile_ids = scheme.cover_tile_ids(lat, lon, height, width)
+                boxes = scheme.cover_boxes(lat, lon, height, width)
+                pairs = scheme.cover_coor_pairs(lat, lon, height, width)
+                
+                tile_id_set = set(tile_ids)
+                
+                self.assertEqual(len(tile_id_set), len(tile_ids))
+                self.assertEqual(len(boxes), len(tile_ids))
+                
+                for box, pair, tile_id in zip(boxes, pairs, tile_ids):
+                    self.assertTrue(box[2] <= pair[0] <= box[0])
+                    self.assertTrue(geo_helper.MIN_LON <= box[3] < pair[1] < box[1] <= geo_helper.MAX_LON)
+                    self.assertEqual(scheme.get_tile_id_for_coordinates(*pair), tile_id)
+                    self.assertEqual(scheme.parse_tile_key(scheme.tile_key(tile_id)), tile_id)
+                
+                for i in range(steps + 1):
+                    for j in range(steps + 1):
+                        point = geo_helper.offset(lat, lon, height * (num_class(i) / steps - geo_helper.half), width * (num_class(j) / steps - geo_helper.half))
+                        
+                        self.assertIn(scheme.get_tile_id_for_coordinates(*point), tile_id_set)
+    
+    def test__schemes__offset_boxes__same_for_nearby_coordinates(self):
+        size = self.num_class(14)
+        
+        lat, lon = self.locations['rochester']
+        
+        for scheme in self.get_schemes():
+            center_lat, center_lon = scheme.get_box_centerpoint_for_coordinates(lat, lon)
+            
+            self.assertEqual(scheme.get_tile_id_for_coordinates(center_lat, center_lon), scheme.get_tile_id_for_coordinates(lat, lon))
+            self.assertEqual(scheme.offset_boxes(lat, lon, size, size), scheme.offset_boxes(center_lat, center_lon, size, size))
+            self.assertEqual(scheme.offset_tile_ids(lat, lon, size, size), scheme.offset_tile_ids(center_lat, center_lon, size, size))
+            self.assertEqual(list(scheme.iter_offset_boxes(lat, lon, size, size)), scheme.offset_boxes(lat, lon, size, size))
+            self.assertEqual(
+                scheme.offset_tiles(lat, lon, size, size),
+                list(zip(scheme.offset_tile_ids(lat, lon, size, size), scheme.offset_boxes(lat, lon, size, size))),
+            )
+            self.assertEqual(
+                [scheme.get_tile_id_for_coordinates(*pair) for pair in scheme.offset_coor_pairs(lat, lon, size, size)],
+                scheme.offset_tile_ids(lat, lon, size, size),
+            )
+    
+    def get_tile_locations(self):
+        num_class = self.num_class
+        
+        return list(self.locations.values()) + [
+            (num_class('10'), num_class('179.99')),
+            (num_class('-45'), num_class('-180')),
+            (num_class('89.99'), num_class('0')),
+            (num_class('-90'), num_class('0')),
+        ]
+    
+    def test__schemes__tile_center_and_box(self):
+        size = self.num_class(10)
+        
+        for scheme in self.get_schemes():
+            for lat, lon in self.get_tile_locations():
+                tile_id = scheme.get_tile_id_for_coordinates(lat, lon)
+                north, east, south, west = box = scheme.tile_box(tile_id)
+                
+                self.assertEqual(scheme.tile_center(tile_id), scheme.get_box_centerpoint_for_coordinates(lat, lon))
+                self.assertTrue(south <= lat <= north)
+                self.assertTrue(west <= lon <= east)
+                self.assertEqual(box, scheme.cover_boxes(lat, lon, size, size)[scheme.cover_tile_ids(lat, lon, size, size).index(tile_id)])
+    
+    def test__schemes__tile_neighbors__surround_tile(self):
+        geo_helper = self.geo_helper
+        num_class = self.num_class
+        epsilon = num_class('0.000001')
+        steps = 8
+        
+        for scheme in self.get_schemes():
+            for lat, lon in self.get_tile_locations():
+                tile_id = scheme.get_tile_id_for_coordinates(lat, lon)
+                north, east, south, west = scheme.tile_box(tile_id)
+                neighbors = scheme.tile_neighbors(tile_id)
+                
+                def touches(other_id):
+                    other_north, other_east, other_south, other_west = scheme.tile_box(other_id)
+                    
+                    return other_south <= north and south <= other_north and (
+                        (other_west <= east and west <= other_east)
+                        or (west == geo_helper.MIN_LON and other_east == geo_helper.MAX_LON)
+                        or (east == geo_helper.MAX_LON and other_west == geo_helper.MIN_LON)
+                    )
+                
+                self.assertNotIn(tile_id, neighbors)
+                self.assertEqual(len(set(neighbors)), len(neighbors))
+                
+                for neighbor_id in neighbors:
+                    self.assertTrue(touches(neighbor_id))
+                
+                # the tiles just outside the box are neighbors, as long as
+                # they actually touch it. Rows have different widths, so a
+                # point just past a corner can be in a tile that doesn't.
+                for i in range(steps + 1):
+                    point_lat = south + (north - south) * i / steps
+                    point_lon = west + (east - west) * i / steps
+                    
+                    points = [
+                        (point_lat, west - epsilon),
+                        (point_lat, east + epsilon),
+                        (south - epsilon, point_lon),
+                        (north + epsilon, point_lon),
+                        (south - epsilon, west - epsilon),
+                        (south - epsilon, east + epsilon),
+                        (north + epsilon, west - epsilon),
+                        (north + epsilon, east + epsilon),
+                    ]
+                    
+                    for point_lat, point_lon in points:
+                        if not geo_helper.MIN_LAT <= point_lat <= geo_helper.MAX_LAT:
+                            continue
+                        
+                        other_id = scheme.get_tile_id_for_coordinates(point_lat, geo_helper.fix_lon(point_lon))
+                        
+                        if other_id != tile_id and touches(other_id):
+                            self.assertIn(other_id, neighbors)
+    
+    def test__tile_neighbors__uses_row_table(self):
+        tiler = self.geo_helper.tiler('4')
+        tile_id = tiler.get_tile_id_for_coordinates(*self.locations['rochester'])
+        
+        neighbors = tiler.tile_neighbors(tile_id)
+        
+        stats = tiler.instrument()
+        
+        self.assertEqual(tiler.tile_neighbors(tile_id), neighbors)
+        self.assertEqual(tiler.tile_box(tile_id), tiler.tile_box(tile_id))
+        self.assertEqual(stats.counters.get('Tiler._calc_row_info', 0), 0)
+    
+    def test__geohash_tiler__geohashes(self):
+        num_class = self.num_class
+        
+        lat, lon = num_class('57.64911'), num_class('10.40744')
+        
+        for precision in range(1, 12):
+            scheme = GeohashTiler(self.geo_helper, precision)
+            
+            self.assertEqual(scheme.tile_key(scheme.get_tile_id_for_coordinates(lat, lon)), 'u4pruydqqvj'[:precision])
+        
+        with self.assertRaises(ValueError):
+            GeohashTiler(self.geo_helper, 13)
+        with self.assertRaises(ValueError):
+            scheme.parse_tile_key('u4pr')
+    
+    def test__geohash_tiler__cover_key_ranges(self):
+        size = self.num_class(5)
+        
+        scheme = GeohashTiler(self.geo_helper, 6)
+        lat, lon = self.locations['rochester']
+        
+        tile_ids = scheme.cover_tile_ids(lat, lon, size, size)
+        keys = set(scheme.tile_key(tile_id) for tile_id in tile_ids)
+        key_ranges = scheme.cover_key_ranges(lat, lon, size, size)
+        
+        # geohashes sort in the same order as their tile IDs
+        self.assertLess(len(key_ranges), len(tile_ids))
+        self.assertEqual(key_ranges, sorted(key_ranges))
+        self.assertEqual(
+            sum(last - first + 1 for first, last in scheme.cover_tile_id_ranges(lat, lon, size, size)),
+            len(tile_ids),
+        )
+        
+        for key in keys:
+            self.assertTrue(any(first <= key <= last for first, last in key_ranges))
+    
+    def test__equal_area_tiler__tiles_per_query(self):
+        num_class = self.num_class
+        geo_helper = self.geo_helper
+        scheme = EqualAreaTiler(geo_helper, '4')
+        size = num_class(40)
+        lats = ('0', '45', '-60', '80', '89', '89.9')
+        
+        def area(box):
+            north, east, south, west = box
+            return (geo_helper.sin(north * geo_helper.RAD) - geo_helper.sin(south * geo_helper.RAD)) * (east - west)
+        
+        equator_box = scheme.cover_boxes(num_class('0'), num_class('0'), num_class(1), num_class(1))[0]
+        
+        # every cell has the same area, and is about 4mi X 4mi, even next to
+        # the poles where rows only have a few columns
+        for lat in lats:
+            north, east, south, west = box = scheme.cover_boxes(num_class(lat), num_class('0'), num_class(1), num_class(1))[0]
+            mid_lat = (north + south) / 2
+            
+            self.assertCloseEnough(area(box) / area(equator_box), num_class(1))
+            self.assertLess(abs(geo_helper.distance(north, west, south, west) - num_class(4)), num_class(1))
+            self.assertLess(abs(geo_helper.distance(mid_lat, west, mid_lat, east) - num_class(4)), num_class(1))
+        
+        # unlike geohashes, which need more and more cells as they get
+        # narrower, the number of tiles doesn't blow up away from the equator
+        equator = len(scheme.cover_tile_ids(num_class('0'), num_class('0'), size, size))
+        
+        for lat in lats[1:]:
+            self.assertLessEqual(len(scheme.cover_tile_ids(num_class(lat), num_class('0'), size, size)), equator * 3 // 2)
+        
+        # same for a query only a couple of tiles across
+        scheme = EqualAreaTiler(geo_helper, '3')
+        size = num_class(6)
+        
+        for lat in lats:
+            self.assertLessEqual(len(scheme.cover_tile_ids(num_class(lat), num_class('0'), size, size)), 16)
+    
+    def test__equal_area_tiler__cover_near_poles(self):
+        num_class = self.num_class
+        scheme = EqualAreaTiler(self.geo_helper, '50')
+        
+        # rows next to the poles only have a few columns, so both sides of the
+        # antimeridian can land in the same one
+        for lat, lon, size in [
+            ('89.56', '161.22', '50'),
+            ('87.63', '-146.78', '300'),
+            ('88.53', '-127.57', '200'),
+            ('-89.18', '177.58', '100'),
+        ]:
+            lat, lon, size = num_class(lat), num_class(lon), num_class(size)
+            
+            tile_ids = scheme.cover_tile_ids(lat, lon, size, size)
+            
+            self.assertEqual(len(set(tile_ids)), len(tile_ids))
+            self.assertEqual(len(scheme.cover_boxes(lat, lon, size, size)), len(tile_ids))
+    
+    def test__pickle__schemes(self):
+        size = self.num_class(14)
+        
+        for scheme in self.get_schemes()[1:]:
+            new_scheme = pickle.loads(pickle.dumps(scheme))
+            
+            self.assertEqual((new_scheme.rows, new_scheme.cols), (scheme.rows, scheme.cols))
+            
+            for location_name, coors in self.locations.items():
+                self.assertEqual(new_scheme.offset_boxes(coors[0], coors[1], size, size), scheme.offset_boxes(coors[0], coors[1], size, size))
+    
+    def test__filter_rectangle__across_antimeridian_and_poles(self):
+        geo_helper = self.geo_helper
+        num_class = self.num_class
+        
+        points = [
+            (num_class('10'), num_class('179.99')),
+            (num_class('10'), num_class('-179.99')),
+            (num_class('10'), num_class('0')),
+            (num_class('89.99'), num_class('90')),
+            (num_class('89.5'), num_class('-90')),
+        ]
+        
+        self.assertEqual(list(geo_helper.filter_rectangle(points, num_class('10'), num_class('180'), num_class(10), num_class(10))), points[:2])
+        self.assertEqual(list(geo_helper.filter_rectangle(points, num_class('10'), num_class('-179.99'), num_class(10), num_class(10))), points[:2])
+        self.assertEqual(list(geo_helper.filter_rectangle(points, num_class('89.9'), num_class('90'), num_class(20), num_class(20))), points[3:4])
+        self.assertEqual(list(geo_helper.filter_rectangle(points, num_class('89.9'), num_class('0'), num_class(100), num_class(20))), points[3:])
+    
+    def test__boxes_array__same_boxes(self):
+        self.tiler = self.tiler_4
+        
+        height = self.num_class(13)
+        width = self.num_class(5)
+        
+        for location_name, coors in self.locations.items():
+            args = (coors[0], coors[1], height, width,)
+            
+            for boxes, tile_ids, box_array in [
+                (self.tiler.offset_boxes(*args), self.tiler.offset_tile_ids(*args), self.tiler.offset_boxes_array(*args)),
+                (self.tiler.cover_boxes(*args), self.tiler.cover_tile_ids(*args), self.tiler.cover_boxes_array(*args)),
+                (self.tiler.radius_boxes(coors[0], coors[1], width), self.tiler.radius_tile_ids(coors[0], coors[1], width), self.tiler.radius_boxes_array(coors[0], coors[1], width)),
+            ]:
+                self.assertEqual(len(box_array), len(boxes))
+                self.assertEqual(list(box_array.tile_ids), tile_ids)
+                self.assertEqual(box_array[0], tuple(float(val) for val in boxes[0]))
+                self.assertEqual(box_array[-1], tuple(float(val) for val in boxes[-1]))
+                self.assertEqual(list(box_array), [tuple(float(val) for val in box) for box in boxes])
+    
+    def test__boxes_array__slice(self):
+        from .boxes import BoxArray
+        
+        self.tiler = self.tiler_4
+        
+        lat, lon = self.locations['rochester']
+        
+        box_array = self.tiler.offset_boxes_array(lat, lon, self.num_class(13), self.num_class(13))
+        boxes = list(box_array)
+        tile_ids = list(box_array.tile_ids)
+        
+        for i in [slice(0, 2), slice(-3, None), slice(None, None, 2), slice(None, None, -1), slice(5, 2)]:
+            sliced = box_array[i]
+            
+            self.assertTrue(isinstance(sliced, BoxArray))
+            self.assertEqual(list(sliced), boxes[i])
+            self.assertEqual(list(sliced.tile_ids), tile_ids[i])
+        
+        self.assertEqual(list(BoxArray.from_boxes(boxes)[1:3]), boxes[1:3])
+        self.assertIsNone(BoxArray.from_boxes(boxes)[1:3].tile_ids)
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__boxes_array__to_numpy(self):
+        self.tiler = self.tiler_4
+        
+        lat, lon = self.locations['rochester']
+        
+        box_array = self.tiler.cover_boxes_array(lat, lon, self.num_class(13), self.num_class(5))
+        
+        coors = box_array.to_numpy()
+        
+        self.assertEqual(coors.shape, (len(box_array), 4))
+        self.assertEqual(tuple(coors[1]), box_array[1])
+        
+        fields = box_array.to_numpy(structured=True)
+        
+        self.assertEqual(fields['west'][2], box_array[2][3])
+        
+        # no copies, changes show up in the BoxArray
+        coors[0, 0] = 1
+        
+        self.assertEqual(box_array[0][0], 1)
+    
+    def test__tile_index__queries(self):
+        from .index import TileIndex
+        
+        self.tiler = self.geo_helper.tiler('2')
+        
+        lat, lon = self.locations['rochester']
+        radius = self.num_class(7)
+        height = self.num_class(13)
+        width = self.num_class(5)
+        
+        points = self._nearby_points(lat, lon)
+        items = [{'id': i, 'coors': point} for i, point in enumerate(points)]
+        coor_func = lambda item: item['coors']
+        
+        index = TileIndex(self.tiler)
+        index.extend(items, coor_func=coor_func)
+        
+        self.assertEqual(len(index), len(items))
+        
+        self.assertEqual(
+            sorted(item['id'] for item in index.query_radius(lat, lon, radius)),
+            sorted(item['id'] for item in self.geo_helper.filter_radius(items, lat, lon, radius, coor_func=coor_func, return_items=True)),
+        )
+        self.assertEqual(
+            sorted(item['id'] for item in index.query_rectangle(lat, lon, height, width)),
+            sorted(item['id'] for item in self.geo_helper.filter_rectangle(items, lat, lon, height, width, coor_func=coor_func, return_items=True)),
+        )
+    
+    def test__tile_index__remove(self):
+        from .index import TileIndex
+        
+        self.tiler = self.tiler_4
+        
+        lat, lon = self.locations['rochester']
+        points = self._nearby_points(lat, lon)
+        
+        index = TileIndex(self.tiler)
+        index.extend(points)
+        
+        index.remove(*points[0])
+        
+        self.assertEqual(len(index), len(points) - 1)
+        self.assertNotIn(points[0], index.tile_items(self.tiler.get_tile_id_for_coordinates(*points[0])))
+        self.assertNotIn(points[0], index.query_radius(lat, lon, 20))
+        self.assertIn(points[1], index.query_radius(lat, lon, 20))
+        
+        self.assertRaises(ValueError, index.remove, *points[0])
+    
+    def test__tile_index__query_radius__polar_cap(self):
+        from .index import TileIndex
+        
+        num_class = self.num_class
+        geo_helper = self.geo_helper
+        tiler = geo_helper.tiler('50')
+        
+        lat, lon = num_class('89.9'), num_class('45')
+        point = (num_class('-89.9'), num_class('179.9'))
+        
+        # the south polar cap tile from 0 to 180 is more than 90 degrees of
+        # longitude round from the location, and the point, in the middle of
+        # its east edge, is further away than any of its corners
+        north, east, south, west = tiler.tile_box(tiler.get_tile_id_for_coordinates(*point))
+        corners = max(geo_helper.distance(corner_lat, corner_lon, lat, lon) for corner_lat in (south, north) for corner_lon in (west, east))
+        radius = (corners + geo_helper.distance(point[0], point[1], lat, lon)) / 2
+        
+        index = TileIndex(tiler)
+        index.insert(*point)
+        index.insert(num_class('-90'), num_class('90'))
+        
+        self.assertEqual(index.query_radius(lat, lon, radius), [(num_class('-90'), num_class('90'))])
+        
+        # rows near the poles with only a few columns don't return items
+        # twice. The first point is in a tile the circle reaches from both
+        # sides.
+        lat, lon, radius = num_class('88.02'), num_class('-94.49'), num_class(200)
+        points = [(num_class('89.06'), num_class('64.3'))] + [
+            geo_helper.offset(lat, lon, num_class(lat_offset), num_class(lon_offset))
+            for lat_offset in range(-150, 151, 50)
+            for lon_offset in range(-150, 151, 50)
+        ]
+        
+        index = TileIndex(tiler)
+        index.extend(points)
+        
+        self.assertEqual(
+            sorted(index.query_radius(lat, lon, radius)),
+            sorted(geo_helper.filter_radius(points, lat, lon, radius)),
+        )
+    
+    def test__cover_diff(self):
+        self.tiler = self.tiler_4
+        
+        height = self.num_class(13)
+        width = self.num_class(21)
+        
+        for location_name, coors in self.locations.items():
+            old_query = (coors[0], coors[1], height, width,)
+            new_query = self.geo_helper.offset(coors[0], coors[1], 3, -5) + (height, width,)
+            
+            old_tile_ids = set(self.tiler.cover_tile_ids(*old_query))
+            new_tile_ids = set(self.tiler.cover_tile_ids(*new_query))
+            
+            added, removed = self.tiler.cover_diff(old_query, new_query)
+            
+            self.assertEqual(sorted(added), sorted(new_tile_ids - old_tile_ids))
+            self.assertEqual(sorted(removed), sorted(old_tile_ids - new_tile_ids))
+            
+            added, removed = self.tiler.cover_diff_tile_ids(old_tile_ids, new_query)
+            
+            self.assertEqual(sorted(added), sorted(new_tile_ids - old_tile_ids))
+            self.assertEqual(sorted(removed), sorted(old_tile_ids - new_tile_ids))
+    
+    def test__cover_diff__no_change(self):
+        self.tiler = self.tiler_4
+        
+        query = self.locations['rochester'] + (self.num_class(13), self.num_class(21),)
+        
+        self.assertEqual(self.tiler.cover_diff(query, query), ([], []))
+    
+    def test__multi_level_tiler__tiles_nest(self):
+        multi_level_tiler = self.geo_helper.multi_level_tiler('32', 4)
+        
+        for location_name, coors in self.locations.items():
+            tile_ids = [multi_level_tiler.get_tile_id_for_coordinates(coors[0], coors[1], level) for level in range(4)]
+            
+            self.assertEqual(multi_level_tiler.levels[0].get_tile_id_for_coordinates(*coors), self.geo_helper.tiler('32').get_tile_id_for_coordinates(*coors))
+            self.assertEqual(multi_level_tiler.ancestor(3, tile_ids[3], 0), tile_ids[0])
+            
+            for level in range(1, 4):
+                self.assertEqual(multi_level_tiler.parent(level, tile_ids[level]), tile_ids[level - 1])
+                self.assertIn(tile_ids[level], multi_level_tiler.children(level - 1, tile_ids[level - 1]))
+            
+            # child boxes sit inside the parent box
+            parent_box = multi_level_tiler.boxes([(0, tile_ids[0])])[0]
+            
+            # give or take rounding in the last digit with Decimal
+            north, east, south, west = [val + sign * self.precision for val, sign in zip(parent_box, (1, 1, -1, -1))]
+            
+            for box in multi_level_tiler.boxes([(1, tile_id) for tile_id in multi_level_tiler.children(0, tile_ids[0])]):
+                self.assertTrue(south <= box[2] < box[0] <= north)
+                self.assertTrue(west <= box[3] < box[1] <= east)
+    
+    def test__multi_level_tiler__cover(self):
+        multi_level_tiler = self.geo_helper.multi_level_tiler('16', 4)
+        
+        height = width = self.num_class(100)
+        steps = 10
+        
+        lat, lon = self.locations['rochester']
+        
+        tiles = set(multi_level_tiler.cover(lat, lon, height, width))
+        
+        self.assertLess(len(tiles), len(multi_level_tiler.levels[3].cover_tile_ids(lat, lon, height, width)))
+        self.assertGreater(len(set(level for level, tile_id in tiles)), 1)
+        
+        lat_north, lon_east, lat_south, lon_west = self.geo_helper.rectangle(lat, lon, height, width)
+        
+        for i in range(steps + 1):
+            for j in range(steps + 1):
+                p_lat = lat_south + (lat_north - lat_south) * i / steps
+                p_lon = lon_west + (lon_east - lon_west) * j / steps
+                
+                self.assertTrue(any(
+                    (level, multi_level_tiler.get_tile_id_for_coordinates(p_lat, p_lon, level)) in tiles
+                    for level in range(4)
+                ))
+    
+    def test__pickle__geo_helper_and_tiler(self):
+        size = self.num_class(14)
+        
+        tiler = self.geo_helper.tiler('6', box_cache_size=4)
+        tiler.offset_boxes(self.locations['rochester'][0], self.locations['rochester'][1], size, size)
+        
+        new_tiler = pickle.loads(pickle.dumps(tiler))
+        
+        self.assertIs(new_tiler.geo_helper.__class__, self.geo_helper.__class__)
+        self.assertIs(new_tiler.geo_helper.num_class, self.num_class)
+        self.assertIs(new_tiler.geo_helper.math_module, self.math_module)
+        self.assertEqual(new_tiler.max_tile_wh, tiler.max_tile_wh)
+        self.assertEqual(new_tiler.box_cache.maxsize, 4)
+        self.assertEqual(len(new_tiler.box_cache), 0)
+        
+        for location_name, coors in self.locations.items():
+            self.assertEqual(new_tiler.offset_boxes(coors[0], coors[1], size, size), tiler.offset_boxes(coors[0], coors[1], size, size))
+    
+    def test__pickle__level_tiler(self):
+        level_tiler = self.geo_helper.multi_level_tiler('32', 3).levels[2]
+        
+        new_level_tiler = pickle.loads(pickle.dumps(level_tiler))
+        
+        self.assertEqual(new_level_tiler.level, 2)
+        self.assertEqual(new_level_tiler.lat_width, level_tiler.lat_width)
+        self.assertEqual(
+            new_level_tiler.get_tile_id_for_coordinates(*self.locations['rochester']),
+            level_tiler.get_tile_id_for_coordinates(*self.locations['rochester']),
+        )
+    
+    def test__offset_boxes_many(self):
+        size = self.num_class(14)
+        
+        self.tiler = self.tiler_6
+        
+        points = list(self.locations.values())
+        expected = [self.tiler.offset_boxes(lat, lon, size, size) for lat, lon in points]
+        
+        self.assertEqual(list(self.tiler.offset_boxes_many(iter(points), size, size, workers=1, chunk_size=3)), expected)
+        self.assertEqual(list(self.tiler.offset_boxes_many(iter(points), size, size, workers=2, chunk_size=3)), expected)
+    
     def test__offset__returns_same_vals(self):
         self.tiler = self.tiler_4
         
@@ -352,12 +1554,436 @@ class BaseMethods(object):
             
             self.assertBoxesTouch(boxes, 3, 5)
 
-if dmath:
-    class DecimalTestCase(BaseTestCase, BaseMethods):
-        num_class = Decimal
-        math_module = dmath
+@skipIf(dmath is None, 'dmath not installed')
+class DecimalTestCase(BaseTestCase, BaseMethods):
+    num_class = Decimal
+    math_module = dmath
+    
+    @classmethod
+    def get_geo_helper(cls):
+        # backends can be given by name, so they're only imported when used
+        return GeoHelper(num_class='decimal.Decimal', math_module='dmath')
+
+@skipIf(dmath is None, 'dmath not installed')
+class DecimalGeoHelperTestCase(BaseTestCase, BaseMethods):
+    num_class = Decimal
+    math_module = dmath
+    
+    @classmethod
+    def get_geo_helper(cls):
+        return DecimalGeoHelper()
+    
+    def test__same_tiles_as_geo_helper(self):
+        tiler = GeoHelper(num_class=Decimal, math_module=dmath).tiler('4')
+        
+        for location_name, coors in self.locations.items():
+            for lat, lon in self._nearby_points(*coors):
+                self.assertEqual(self.tiler_4.get_tile_id_for_coordinates(lat, lon), tiler.get_tile_id_for_coordinates(lat, lon))
+    
+    def test__fixed_precision(self):
+        lat, lon = self.locations['rochester']
+        size = Decimal(14)
+        
+        cos = self.geo_helper.cos(lat)
+        tile_ids = self.tiler_4.offset_tile_ids(lat, lon, size, size)
+        
+        # trig doesn't depend on the current context
+        with localcontext() as context:
+            context.prec = 50
+            
+            self.assertEqual(self.geo_helper.math_module.cos(lat), cos)
+            self.assertEqual(len(self.geo_helper.sin(lat).as_tuple().digits), self.geo_helper.precision)
+            self.assertEqual(self.geo_helper.tiler('4').offset_tile_ids(lat, lon, size, size), tile_ids)
+    
+    def test__trig_cache(self):
+        geo_helper = DecimalGeoHelper()
+        tiler = geo_helper.tiler('4')
+        lat, lon = self.locations['rochester']
+        size = Decimal(14)
+        
+        boxes = tiler.offset_boxes(lat, lon, size, size)
+        cache_misses = geo_helper.math_module.cos.cache.misses
+        
+        self.assertEqual(geo_helper.tiler('4').offset_boxes(lat, lon, size, size), boxes)
+        self.assertEqual(geo_helper.math_module.cos.cache.misses, cache_misses)
+        
+        uncached_tiler = DecimalGeoHelper(trig_cache_size=0).tiler('4')
+        
+        self.assertEqual(uncached_tiler.offset_boxes(lat, lon, size, size), boxes)
+    
+    def test__pickle__geo_helper_and_tiler(self):
+        tiler = DecimalGeoHelper(unit=GeoHelper.UNIT_KM, precision=15, trig_cache_size=10).tiler('6')
+        geo_helper = tiler.geo_helper
+        size = Decimal(14)
+        
+        new_tiler = pickle.loads(pickle.dumps(tiler))
+        new_geo_helper = new_tiler.geo_helper
+        
+        # the math module is wrapped to run at the fixed precision
+        self.assertIs(new_geo_helper.math_module.module, dmath)
+        self.assertEqual((new_geo_helper.unit, new_geo_helper.precision, new_geo_helper.trig_cache_size), (GeoHelper.UNIT_KM, 15, 10))
+        self.assertEqual(new_geo_helper.RAD, geo_helper.RAD)
+        
+        for location_name, coors in self.locations.items():
+            self.assertEqual(new_tiler.offset_boxes(coors[0], coors[1], size, size), tiler.offset_boxes(coors[0], coors[1], size, size))
 
 class FloatTestCase(BaseTestCase, BaseMethods):
     num_class = float
     math_module = math
 
+class FloatGeoHelperTestCase(BaseTestCase, BaseMethods):
+    num_class = float
+    math_module = math
+    
+    @classmethod
+    def get_geo_helper(cls):
+        return FloatGeoHelper()
+    
+    def test__same_results_as_geo_helper(self):
+        geo_helper = GeoHelper()
+        
+        values = [-200.5, -180.0001, -91, -77.609, -0.087, 0, 1, 6, 43.1553, 90.0001, 179.9999, 200.5]
+        
+        for lat in values:
+            for lon in values:
+                self.assertEqual(self.geo_helper.fix_lat(lat), geo_helper.fix_lat(lat))
+                self.assertEqual(self.geo_helper.fix_lon(lon), geo_helper.fix_lon(lon))
+                self.assertEqual(self.geo_helper.offset_lon(lat, lon), geo_helper.offset_lon(lat, lon))
+                self.assertEqual(self.geo_helper.offset(lat, lon, lon, lat), geo_helper.offset(lat, lon, lon, lat))
+                self.assertEqual(self.geo_helper.rectangle(lat, lon, 13, 5), geo_helper.rectangle(lat, lon, 13, 5))
+                self.assertEqual(self.geo_helper.box(lat, lon, 7), geo_helper.box(lat, lon, 7))
+                self.assertEqual(self.geo_helper.distance(lat, lon, lon, lat), geo_helper.distance(lat, lon, lon, lat))
+
+class DistanceMethodTestCase(TestCase):
+    def test__unknown_distance_method(self):
+        with self.assertRaises(ValueError):
+            GeoHelper(distance_method='manhattan')
+
+class DecimalGeoHelperPrecisionTestCase(TestCase):
+    def test__precision_for(self):
+        # smaller tiles need more digits
+        self.assertEqual(DecimalGeoHelper.precision_for(1), 3 + 2 + DecimalGeoHelper.GUARD_DIGITS)
+        self.assertEqual(DecimalGeoHelper.precision_for(1, unit=GeoHelper.UNIT_KM), 3 + 3 + DecimalGeoHelper.GUARD_DIGITS)
+        self.assertEqual(DecimalGeoHelper.precision_for('0.01'), 3 + 4 + DecimalGeoHelper.GUARD_DIGITS)
+        self.assertEqual(DecimalGeoHelper.precision_for(1000), 3 + DecimalGeoHelper.GUARD_DIGITS)
+
+class ImportTestCase(TestCase):
+    def test__import__doesnt_load_optional_backends(self):
+        code = 'import sys; before = set(sys.modules); import tiling; print(" ".join(set(sys.modules) - before))'
+        
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=package_parent)
+        
+        imported = subprocess.check_output([sys.executable, '-c', code], env=env).decode().split()
+        
+        self.assertIn('tiling', imported)
+        
+        for module in ['asyncio', 'concurrent.futures', 'decimal', 'dmath', 'logging', 'multiprocessing', 'numpy', 'tiling.vectorized']:
+            self.assertNotIn(module, imported)
+    
+    def test__geo_helper__backends_by_name(self):
+        from fractions import Fraction
+        
+        geo_helper = GeoHelper(num_class='fractions.Fraction', math_module='math')
+        
+        self.assertIs(geo_helper.num_class, Fraction)
+        self.assertIs(geo_helper.math_module, math)
+        self.assertEqual(geo_helper.half, Fraction(1, 2))
+
+@skipIf(sys.version_info < (3, 5), 'tiling.aio requires Python 3.5+')
+class TileCacheFetcherTestCase(TestCase):
+    def setUp(self):
+        import asyncio
+        from .aio import InMemoryCacheBackend, TileCacheFetcher
+        
+        self.asyncio = asyncio
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        
+        self.tiler = GeoHelper().tiler('4')
+        self.backend = InMemoryCacheBackend()
+        
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        
+        self.fetcher = TileCacheFetcher(self.tiler, self.backend, self.loader, concurrency=3)
+    
+    def tearDown(self):
+        self.asyncio.set_event_loop(None)
+        self.loop.close()
+    
+    def loader(self, tile_id, box):
+        self.calls.append(tile_id)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        
+        future = self.asyncio.ensure_future(self.asyncio.sleep(0.001, result=('data', tile_id)))
+        future.add_done_callback(self.loader_done)
+        return future
+    
+    def loader_done(self, future):
+        self.running -= 1
+    
+    def run_all(self, *coroutines):
+        return self.loop.run_until_complete(self.asyncio.gather(*coroutines))
+    
+    def wait_for_loads(self):
+        self.loop.run_until_complete(self.asyncio.gather(*self.fetcher.in_flight.values(), return_exceptions=True))
+    
+    def test__fetch__loads_misses_then_uses_cache(self):
+        args = (43.1553, -77.6090, 14, 14,)
+        
+        results = self.run_all(self.fetcher.fetch(*args))[0]
+        tile_ids = self.tiler.offset_tile_ids(*args)
+        
+        self.assertEqual([box for box, data in results], self.tiler.offset_boxes(*args))
+        self.assertEqual([data for box, data in results], [('data', tile_id) for tile_id in tile_ids])
+        self.assertEqual(sorted(self.calls), sorted(tile_ids))
+        self.assertEqual(len(self.backend.data), len(tile_ids))
+        self.assertLessEqual(self.max_running, 3)
+        self.assertEqual(self.fetcher.in_flight, {})
+        
+        self.calls = []
+        
+        self.assertEqual(self.run_all(self.fetcher.fetch(*args))[0], results)
+        self.assertEqual(self.calls, [])
+    
+    def test__fetch__one_pass_over_tiles(self):
+        args = (43.1553, -77.6090, 14, 14,)
+        
+        stats = self.tiler.instrument()
+        
+        self.run_all(self.fetcher.fetch(*args))
+        
+        self.assertEqual(stats.counters['Tiler.offset_tiles'], 1)
+        self.assertNotIn('Tiler.offset_tile_ids', stats.counters)
+        self.assertNotIn('Tiler.offset_boxes', stats.counters)
+    
+    def test__fetch__collapses_concurrent_loads(self):
+        # overlapping areas share most of their tiles
+        results = self.run_all(
+            self.fetcher.fetch(43.1553, -77.6090, 14, 14),
+            self.fetcher.fetch(43.1553, -77.6090, 14, 14),
+            self.fetcher.fetch(43.1553, -77.5, 14, 14),
+        )
+        
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(self.calls), len(set(self.calls)))
+        self.assertEqual(sorted(self.calls), sorted(set(tile_id for box, (name, tile_id) in results[0] + results[2])))
+    
+    def test__fetch__caches_loads_when_another_fails(self):
+        args = (43.1553, -77.6090, 14, 14,)
+        tile_ids = self.tiler.offset_tile_ids(*args)
+        failing_tile_id = tile_ids[0]
+        
+        def loader(tile_id, box):
+            if tile_id == failing_tile_id:
+                raise ValueError(tile_id)
+            return self.loader(tile_id, box)
+        
+        self.fetcher.loader = loader
+        
+        with self.assertRaises(ValueError):
+            self.run_all(self.fetcher.fetch(*args))
+        
+        # let the other loads finish
+        self.wait_for_loads()
+        
+        self.assertEqual(sorted(self.backend.data), sorted(self.tiler.tile_key(tile_id) for tile_id in tile_ids[1:]))
+        self.assertEqual(self.fetcher.in_flight, {})
+    
+    def test__fetch__caches_loads_when_cancelled(self):
+        args = (43.1553, -77.6090, 14, 14,)
+        
+        task = self.loop.create_task(self.fetcher.fetch(*args))
+        
+        # start the loads, then cancel the request that started them
+        self.run_all(self.asyncio.sleep(0))
+        task.cancel()
+        self.run_all(self.asyncio.sleep(0))
+        self.wait_for_loads()
+        
+        self.assertTrue(task.cancelled())
+        self.assertEqual(sorted(self.backend.data), sorted(self.tiler.tile_key(tile_id) for tile_id in self.tiler.offset_tile_ids(*args)))
+
+    def test__fetch__default_keys_from_tiler(self):
+        from .aio import TileCacheFetcher
+        from .schemes import GeohashTiler
+        
+        tiler = GeohashTiler(GeoHelper(), 5)
+        fetcher = TileCacheFetcher(tiler, self.backend, self.loader)
+        
+        results = self.run_all(fetcher.fetch(43.1553, -77.6090, 14, 14))[0]
+        
+        self.assertEqual([box for box, data in results], tiler.offset_boxes(43.1553, -77.6090, 14, 14))
+        self.assertEqual(sorted(self.backend.data), sorted(tiler.tile_key(tile_id) for tile_id in tiler.offset_tile_ids(43.1553, -77.6090, 14, 14)))
+
+class BenchmarksTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def test__main__writes_results(self):
+        from . import benchmarks
+        
+        output = os.path.join(self.tmp_dir, 'results.json')
+        
+        benchmarks.main(['-b', 'distance', '--backend', 'float', '--min-time', '0', '-o', output])
+        
+        with open(output) as f:
+            results = json.load(f)['results']
+        
+        self.assertEqual(len(results), len(benchmarks.LOCATIONS))
+        
+        for params in results:
+            self.assertEqual(params['benchmark'], 'GeoHelper.distance')
+            self.assertEqual(params['backend'], 'float')
+            self.assertGreater(params['loops'], 0)
+    
+    def test__time_import(self):
+        from . import benchmarks
+        
+        self.assertGreater(benchmarks.time_import(repeat=1), 0)
+
+class CLITestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tiler = FloatGeoHelper().tiler('3')
+        self.points = [(43.1553, -77.6090), (43.1554, -77.6091), (51.5171, -0.1062), (-33.8688, 151.2093), (43.1553, -77.6090)]
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+    
+    def write_binary(self, points):
+        from struct import pack
+        
+        path = os.path.join(self.tmp_dir, 'points.f64')
+        
+        with open(path, 'wb') as f:
+            for lat, lon in points:
+                f.write(pack('<2d', lat, lon))
+        
+        return path
+    
+    def write_csv(self, points, header=True):
+        path = os.path.join(self.tmp_dir, 'points.csv')
+        
+        with open(path, 'w') as f:
+            if header:
+                f.write('lat,lon\n')
+            for lat, lon in points:
+                f.write('%r,%r\n' % (lat, lon))
+        
+        return path
+    
+    def read_csv(self, path):
+        with open(path) as f:
+            return [line.split(',') for line in f.read().splitlines()]
+    
+    def expected_boxes(self, height, width):
+        tiler = self.tiler
+        
+        return [
+            (point, tile_id,) + tuple(box)
+            for point, (lat, lon) in enumerate(self.points)
+            for tile_id, box in zip(tiler.offset_tile_ids(lat, lon, height, width), tiler.offset_boxes(lat, lon, height, width))
+        ]
+    
+    def assert_binary_results(self, command, vectorized):
+        from . import cli
+        from struct import Struct
+        
+        output = os.path.join(self.tmp_dir, 'output.bin')
+        
+        num_points = cli.run(command, self.tiler, self.write_binary(self.points), output, chunk_size=2, height=5.0, width=6.0, vectorized=vectorized)
+        
+        self.assertEqual(num_points, len(self.points))
+        
+        with open(output, 'rb') as f:
+            data = f.read()
+        
+        record = {
+            cli.COMMAND_TILE_IDS: Struct('<q'),
+            cli.COMMAND_CENTERS: Struct('<2d'),
+            cli.COMMAND_BOXES: Struct('<2q4d'),
+        }[command]
+        results = [record.unpack_from(data, offset) for offset in range(0, len(data), record.size)]
+        
+        if command == cli.COMMAND_TILE_IDS:
+            expected = [(self.tiler.get_tile_id_for_coordinates(lat, lon),) for lat, lon in self.points]
+        elif command == cli.COMMAND_CENTERS:
+            expected = [self.tiler.get_box_centerpoint_for_coordinates(lat, lon) for lat, lon in self.points]
+        else:
+            expected = self.expected_boxes(5.0, 6.0)
+        
+        self.assertEqual(results, expected)
+    
+    def test__run__binary(self):
+        from . import cli
+        
+        for command in [cli.COMMAND_TILE_IDS, cli.COMMAND_CENTERS, cli.COMMAND_BOXES]:
+            self.assert_binary_results(command, False)
+    
+    @skipIf(numpy is None, 'NumPy not installed')
+    def test__run__binary__vectorized(self):
+        from . import cli
+        
+        for command in [cli.COMMAND_TILE_IDS, cli.COMMAND_CENTERS, cli.COMMAND_BOXES]:
+            self.assert_binary_results(command, True)
+    
+    def test__run__csv(self):
+        from . import cli
+        
+        output = os.path.join(self.tmp_dir, 'output.csv')
+        
+        for header in [True, False]:
+            for vectorized in [False, True] if numpy is not None else [False]:
+                cli.run(cli.COMMAND_BOXES, self.tiler, self.write_csv(self.points, header), output, chunk_size=2, height=5.0, width=6.0, vectorized=vectorized)
+                
+                rows = self.read_csv(output)
+                
+                self.assertEqual(rows[0], cli.CSV_HEADERS[cli.COMMAND_BOXES])
+                self.assertEqual(
+                    [(int(row[0]), int(row[1]),) + tuple(float(value) for value in row[2:]) for row in rows[1:]],
+                    self.expected_boxes(5.0, 6.0)
+                )
+    
+    def test__run__empty_file(self):
+        from . import cli
+        
+        output = os.path.join(self.tmp_dir, 'output.bin')
+        
+        self.assertEqual(cli.run(cli.COMMAND_TILE_IDS, self.tiler, self.write_binary([]), output), 0)
+        self.assertEqual(os.path.getsize(output), 0)
+    
+    def test__read_binary__partial_pair(self):
+        from . import cli
+        
+        path = os.path.join(self.tmp_dir, 'points.f64')
+        
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 24)
+        
+        with self.assertRaises(ValueError):
+            list(cli.read_binary(path, vectorized=False))
+    
+    def test__main(self):
+        from . import cli
+        
+        output = os.path.join(self.tmp_dir, 'output.csv')
+        
+        cli.main(['tile-ids', '-t', '3', self.write_csv(self.points), output])
+        
+        self.assertEqual(
+            [int(row[0]) for row in self.read_csv(output)[1:]],
+            [self.tiler.get_tile_id_for_coordinates(lat, lon) for lat, lon in self.points]
+        )
+    
+    def test__main__boxes_needs_height_and_width(self):
+        from . import cli
+        
+        with self.assertRaises(SystemExit):
+            cli.main(['boxes', '-t', '3', self.write_csv(self.points), os.path.join(self.tmp_dir, 'output.csv')])
@@ -0,0 +1,275 @@
+"""
+NumPy backed batch versions of the Tiler/GeoHelper hot paths.
+
+NumPy is an optional dependency (see the 'numpy' extra in setup.py), so this
+module is only imported the first time one of the batch methods is used.
+"""
+from __future__ import division
+
+#Python imports
+import numpy
+
+def as_array(values):
+    """
+    Accepts NumPy arrays, array('d'), memoryviews, lists, etc. Doesn't copy if
+    the values are already a float64 array.
+    """
+    return numpy.asarray(values, dtype=numpy.float64)
+
+def fix_lat(geo_helper, vals):
+    return numpy.clip(vals, float(geo_helper.MIN_LAT), float(geo_helper.MAX_LAT))
+
+def fix_lon(geo_helper, vals):
+    # numpy.mod follows the same sign rules as Python's % operator, so this
+    # matches GeoHelper.fix_lon exactly.
+    max_lon = float(geo_helper.MAX_LON)
+    min_lon = float(geo_helper.MIN_LON)
+    
+    vals = numpy.where(vals > max_lon, min_lon + numpy.mod(vals, max_lon), vals)
+    return numpy.where(vals < min_lon, max_lon + numpy.mod(vals, min_lon), vals)
+
+def _lon_delta(geo_helper, vals):
+    # same as GeoHelper._lon_delta, numpy.mod is never negative here
+    max_lon = float(geo_helper.MAX_LON)
+    return numpy.mod(vals + max_lon, max_lon - float(geo_helper.MIN_LON)) - max_lon
+
+def _scalar_fallback(func, lats, lons):
+    # Decimal and other custom backends can't be represented as float64
+    # without changing the results, so just loop over the scalar path.
+    results = [func(lat, lon) for lat, lon in zip(lats, lons)]
+    
+    ret_lats = numpy.empty(len(results), dtype=object)
+    ret_lons = numpy.empty(len(results), dtype=object)
+    
+    for i, (lat, lon) in enumerate(results):
+        ret_lats[i] = lat
+        ret_lons[i] = lon
+    
+    return ret_lats, ret_lons
+
+def _row_widths(tiler, lats):
+    """
+    Returns the row index and the longitude width of the row for each
+    latitude.
+    """
+    lat_width = tiler.lat_width
+    max_lat = float(tiler.geo_helper.MAX_LAT)
+    
+    rows = numpy.floor(lats / lat_width)
+    # same edge handling as Tiler.get_row_col_for_coordinates
+    rows = numpy.where((lats >= max_lat) & (rows * lat_width >= lats), rows - 1, rows)
+    
+    # There are only as many distinct longitude widths as there are rows, so
+    # the row info is looked up once per row with the scalar math module. This
+    # is both faster and guarantees the same results as the scalar path.
+    unique_rows, row_idx = numpy.unique(rows, return_inverse=True)
+    row_info = [tiler._row_info(int(row)) for row in unique_rows.tolist()]
+    row_idx = row_idx.reshape(rows.shape)
+    
+    row_lats = numpy.array([info[0] for info in row_info], dtype=numpy.float64)[row_idx]
+    lon_widths = numpy.array([info[1] for info in row_info], dtype=numpy.float64)[row_idx]
+    
+    return rows, row_lats, lon_widths
+
+def _cols(tiler, lons, lon_widths):
+    max_lon = float(tiler.geo_helper.MAX_LON)
+    
+    cols = numpy.floor(lons / lon_widths)
+    # same edge handling as Tiler.get_row_col_for_coordinates
+    return numpy.where((lons >= max_lon) & (cols * lon_widths >= lons), cols - 1, cols)
+
+def get_box_centerpoints_for_coordinates(tiler, lats, lons):
+    geo_helper = tiler.geo_helper
+    
+    if geo_helper.num_class is not float:
+        return _scalar_fallback(tiler.get_box_centerpoint_for_coordinates, lats, lons)
+    
+    lats = as_array(lats)
+    lons = as_array(lons)
+    
+    rows, lats, lon_widths = _row_widths(tiler, lats)
+    cols = _cols(tiler, lons, lon_widths)
+    
+    # same as Tiler._col_center
+    max_lon = float(geo_helper.MAX_LON)
+    min_lon = float(geo_helper.MIN_LON)
+    
+    west = cols * lon_widths
+    east = (cols + 1) * lon_widths
+    
+    lons = numpy.where(
+        (west < min_lon) | (east > max_lon),
+        (numpy.maximum(west, min_lon) + numpy.minimum(east, max_lon)) * 0.5,
+        fix_lon(geo_helper, (cols + 0.5) * lon_widths),
+    )
+    
+    return lats, lons
+
+def get_tile_ids_for_coordinates(tiler, lats, lons):
+    if tiler.geo_helper.num_class is not float:
+        get_tile_id = tiler.get_tile_id_for_coordinates
+        return numpy.array([get_tile_id(lat, lon) for lat, lon in zip(lats, lons)], dtype=numpy.int64)
+    
+    lats = as_array(lats)
+    lons = as_array(lons)
+    
+    rows, _, lon_widths = _row_widths(tiler, lats)
+    cols = _cols(tiler, lons, lon_widths)
+    
+    # same packing as encode_tile_id
+    return (rows.astype(numpy.int64) << 32) | (cols.astype(numpy.int64) & 0xffffffff)
+
+def _bool_fallback(geo_helper, lats, lons, filter_func, *args):
+    # see _scalar_fallback
+    matches = set(
+        i for i, coors in filter_func(
+            enumerate(zip(lats, lons)), *args, coor_func=lambda item: item[1], return_items=True
+        )
+    )
+    return numpy.array([i in matches for i in range(len(lats))], dtype=bool)
+
+def _haversine(geo_helper, lats, lons, lat, lon):
+    lat1 = lats * numpy.pi / 180
+    lon1 = lons * numpy.pi / 180
+    lat2 = float(lat) * numpy.pi / 180
+    lon2 = float(lon) * numpy.pi / 180
+    
+    d = 2 * numpy.arcsin(numpy.minimum(numpy.sqrt(
+        numpy.sin((lat1 - lat2) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin((lon1 - lon2) / 2) ** 2
+    ), 1))
+    return (d * 180 * 60 / numpy.pi) * float(geo_helper.units_per_nm)
+
+def _equirectangular(geo_helper, lats, lons, lat, lon):
+    rad = float(geo_helper.RAD)
+    lat = float(lat)
+    
+    x = _lon_delta(geo_helper, float(lon) - lons) * rad * numpy.cos((lats + lat) / 2 * rad)
+    y = (lat - lats) * rad
+    
+    d = numpy.sqrt(x * x + y * y)
+    return (d * 180 * 60 / numpy.pi) * float(geo_helper.units_per_nm)
+
+def _vincenty(geo_helper, lats, lons, lat, lon):
+    # same as GeoHelper.vincenty_distance, iterating until every point has
+    # converged
+    rad = float(geo_helper.RAD)
+    a = float(geo_helper.WGS84_A)
+    b = float(geo_helper.WGS84_B)
+    f = float(geo_helper.WGS84_F)
+    tolerance = float(geo_helper.VINCENTY_TOLERANCE)
+    
+    L = _lon_delta(geo_helper, float(lon) - lons) * rad
+    U1 = numpy.arctan((1 - f) * numpy.tan(lats * rad))
+    U2 = numpy.arctan((1 - f) * numpy.tan(float(lat) * rad))
+    sin_U1 = numpy.sin(U1)
+    cos_U1 = numpy.cos(U1)
+    sin_U2 = numpy.sin(U2)
+    cos_U2 = numpy.cos(U2)
+    
+    lam = L
+    converged = numpy.zeros(lats.shape, dtype=bool)
+    
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for i in range(geo_helper.VINCENTY_ITERATIONS):
+            sin_lam = numpy.sin(lam)
+            cos_lam = numpy.cos(lam)
+            
+            sin_sigma = numpy.sqrt((cos_U2 * sin_lam) ** 2 + (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2)
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = numpy.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = numpy.where(sin_sigma == 0, 0, cos_U1 * cos_U2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = numpy.where(cos2_alpha == 0, 0, cos_sigma - 2 * sin_U1 * sin_U2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            
+            converged = numpy.abs(lam - lam_prev) < tolerance
+            
+            if converged.all():
+                break
+    
+    u2 = cos2_alpha * (a * a - b * b) / (b * b)
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    
+    meters = b * A * (sigma - delta_sigma)
+    ret = meters / float(geo_helper.METERS_PER_NM) * float(geo_helper.units_per_nm)
+    
+    # nearly antipodal points don't converge
+    if not converged.all():
+        ret = numpy.where(converged, ret, _haversine(geo_helper, lats, lons, lat, lon))
+    
+    return ret
+
+_DISTANCE_FUNCS = {
+    'haversine': _haversine,
+    'equirectangular': _equirectangular,
+    'vincenty': _vincenty,
+}
+
+def distances(geo_helper, lats, lons, lat, lon):
+    """
+    Distance from each point to (lat, lon), using the same formula as
+    GeoHelper.distance.
+    """
+    # a subclass's own distance() can't be vectorized either
+    if geo_helper.num_class is not float or geo_helper._is_overridden('distance'):
+        distance = geo_helper.distance
+        ret = numpy.empty(len(lats), dtype=object)
+        
+        for i, (p_lat, p_lon) in enumerate(zip(lats, lons)):
+            ret[i] = distance(p_lat, p_lon, lat, lon)
+        
+        return ret
+    
+    return _DISTANCE_FUNCS[geo_helper.distance_method](geo_helper, as_array(lats), as_array(lons), lat, lon)
+
+def filter_radius_mask(geo_helper, lats, lons, lat, lon, radius):
+    if geo_helper.num_class is not float:
+        return _bool_fallback(geo_helper, lats, lons, geo_helper.filter_radius, lat, lon, radius)
+    
+    lats = as_array(lats)
+    lons = as_array(lons)
+    
+    lat_north, lat_south, lon_range = geo_helper.radius_bounds(lat, lon, radius)
+    
+    # cheap bounding box check first, then the real distance for whatever's left
+    mask = (lats >= lat_south) & (lats <= lat_north)
+    
+    if lon_range is not None:
+        mask &= numpy.abs(_lon_delta(geo_helper, lons - float(lon))) <= lon_range
+    
+    candidates = numpy.flatnonzero(mask)
+    mask[candidates] = distances(geo_helper, lats[candidates], lons[candidates], lat, lon) < radius
+    
+    return mask
+
+def filter_rectangle_mask(geo_helper, lats, lons, lat, lon, height, width):
+    if geo_helper.num_class is not float:
+        return _bool_fallback(geo_helper, lats, lons, geo_helper.filter_rectangle, lat, lon, height, width)
+    
+    lats = as_array(lats)
+    lons = as_array(lons)
+    
+    lat_north, lat_south, lon_west, lon_east, cap_north, cap_south = geo_helper.rectangle_bounds(lat, lon, height, width)
+    
+    mask = (lats >= lat_south) & (lats <= lat_north)
+    
+    if lon_west is None:
+        return mask
+    
+    # same checks as GeoHelper.in_rectangle_bounds
+    if lon_west <= lon_east:
+        lon_mask = (lons > lon_west) & (lons < lon_east)
+    else:
+        lon_mask = (lons > lon_west) | (lons < lon_east)
+    
+    if cap_north is not None:
+        lon_mask |= lats >= cap_north
+    if cap_south is not None:
+        lon_mask |= lats <= cap_south
+    
+    return mask & lon_mask